@@ -136,6 +136,11 @@ def get_vibes():
     return jsonify(ai_response), 200
 
 
+@app.get("/metrics/db")
+def db_metrics():
+    return jsonify(db_pool_stats()), 200
+
+
 @app.get("/projects/check")
 def check_project():
     data = request.json
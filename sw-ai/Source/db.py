@@ -2,23 +2,24 @@ import logging
 import os
 from contextlib import contextmanager
 
-import psycopg2
 from dotenv import load_dotenv
-from psycopg2 import pool
 from psycopg2.extras import RealDictCursor
 
+from db_pool import HealthCheckedPool
 from helpers import format_messages
 
 load_dotenv()
 
-_pool: pool.ThreadedConnectionPool | None = None
+_pool: HealthCheckedPool | None = None
 
 
 def _init_pool():
     global _pool
-    _pool = pool.ThreadedConnectionPool(
+    _pool = HealthCheckedPool(
         minconn=2,
         maxconn=10,
+        idle_check=float(os.getenv("DB_IDLE_CHECK", 30)),
+        timeout=float(os.getenv("DB_POOL_TIMEOUT", 10)),
         host=os.getenv("DB_HOST", "localhost"),
         port=int(os.getenv("DB_PORT", 5432)),
         user=os.getenv("DB_USER"),
@@ -32,27 +33,13 @@ def _init_pool():
 
 
 def _acquire_conn():
-    global _pool
     if _pool is None:
         _init_pool()
-    for attempt in range(3):
-        conn = _pool.getconn()
-        if conn.closed:
-            _pool.putconn(conn, close=True)
-            continue
-        try:
-            conn.cursor().execute("SELECT 1")
-            return conn
-        except Exception as e:
-            if attempt > 0:
-                logging.error(f"DB connection validation failed (attempt {attempt + 1}): {e}")
-            _pool.putconn(conn, close=True)
-            try:
-                _pool.closeall()
-            except Exception:
-                pass
-            _init_pool()
-    raise psycopg2.OperationalError("DB connection unavailable after 3 attempts")
+    return _pool.getconn()
+
+
+def db_pool_stats():
+    return _pool.stats() if _pool else {}
 
 
 def _release_conn(conn, *, success: bool):
@@ -1,5 +1,5 @@
-import logging, requests
-import blocks, db, worker
+import logging
+import blocks, db, http_client, worker
 from cache import cache
 from globals import MACROS, STAFF_CHANNEL, SWAI_KEY, client
 
@@ -9,7 +9,7 @@ AI_HEADERS = {"X-API-Key": SWAI_KEY}
 
 def fetch(path, payload):
     try:
-        resp = requests.get(url=f"{AI_BASE_URL}{path}", headers=AI_HEADERS, json=payload, timeout=15)
+        resp = http_client.get("ai", f"{AI_BASE_URL}{path}", headers=AI_HEADERS, json=payload)
         resp.raise_for_status()
         return resp.json()
     except Exception as e:
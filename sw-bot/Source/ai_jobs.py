@@ -0,0 +1,115 @@
+import logging, queue, threading
+from time import monotonic
+import ai
+from globals import AI_JOB_QUEUE_MAX, AI_JOB_WORKERS
+
+logger = logging.getLogger("ai_jobs")
+
+
+class AIJobs:
+    """Bounded pool for SW-AI calls that post their result to a staff thread.
+
+    Jobs are keyed (kind, ticket id[, text]); submitting a key that is already
+    queued or running is a no-op, so repeated `!tldr`s or resolve clicks only
+    cost one AI round-trip. Jobs are dropped when the queue is full.
+    """
+
+    def __init__(self, workers: int, queue_max: int):
+        self.workers = max(1, workers)
+        self._queue: queue.Queue = queue.Queue(maxsize=max(1, queue_max))
+        self._lock = threading.Lock()
+        self._active: dict[tuple, float] = {}  # key -> enqueued_at, while queued or running
+        self._threads: list[threading.Thread] = []
+        self.running = 0
+        self.submitted = 0
+        self.deduped = 0
+        self.dropped = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    def _ensure_started(self):
+        if self._threads:
+            return
+        with self._lock:
+            if self._threads:
+                return
+            for i in range(self.workers):
+                t = threading.Thread(target=self._run, daemon=True, name=f"ai-job-{i}")
+                t.start()
+                self._threads.append(t)
+
+    def submit(self, key: tuple, fn, *args) -> bool:
+        self._ensure_started()
+        now = monotonic()
+        with self._lock:
+            if key in self._active:
+                self.deduped += 1
+                return False
+            try:
+                self._queue.put_nowait((key, now, fn, args))
+            except queue.Full:
+                self.dropped += 1
+                logger.warning(f"ai job queue full, dropping {key[0]} for ticket {key[1]}")
+                return False
+            self._active[key] = now
+            self.submitted += 1
+            return True
+
+    def _run(self):
+        while True:
+            key, enqueued_at, fn, args = self._queue.get()
+            waited = monotonic() - enqueued_at
+            with self._lock:
+                self.running += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+            ok = True
+            try:
+                fn(*args)
+            except Exception as e:
+                ok = False
+                logger.exception(f"ai job {key[0]} for ticket {key[1]} failed: {e}")
+            finally:
+                with self._lock:
+                    self.running -= 1
+                    self._active.pop(key, None)
+                    if ok:
+                        self.completed += 1
+                    else:
+                        self.failed += 1
+                self._queue.task_done()
+
+    def stats(self) -> dict:
+        now = monotonic()
+        with self._lock:
+            started = self.completed + self.failed + self.running
+            queued = list(self._active.values())
+            return {
+                "depth": self._queue.qsize(),
+                "running": self.running,
+                "submitted": self.submitted,
+                "deduped": self.deduped,
+                "dropped": self.dropped,
+                "completed": self.completed,
+                "failed": self.failed,
+                "wait_ms_avg": round(self.wait_total / started * 1000, 1) if started else 0,
+                "wait_ms_max": round(self.wait_max * 1000, 1),
+                "oldest_s": round(now - min(queued), 1) if queued else 0,
+            }
+
+
+jobs = AIJobs(AI_JOB_WORKERS, AI_JOB_QUEUE_MAX)
+
+
+def detect(ticket_id) -> bool:
+    return jobs.submit(("detect", ticket_id), ai.detect_ticket, ticket_id)
+
+
+def summarize(ticket_id) -> bool:
+    return jobs.submit(("summary", ticket_id), ai.summarize_ticket, ticket_id)
+
+
+def paraphrase(ticket_id, message) -> bool:
+    return jobs.submit(("paraphrase", ticket_id, message), ai.paraphrase_message, ticket_id, message)
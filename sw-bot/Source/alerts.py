@@ -1,7 +1,7 @@
 import logging, time
 import pytz
 import schedule
-import blocks, db
+import blocks, db, ratelimit
 from cache import cache
 from globals import REMINDERS_CHANNEL, STAFF_CHANNEL, client
 
@@ -10,7 +10,7 @@ scheduler = schedule.Scheduler()
 
 
 def check_unresolved_tickets():
-    stats = db.get_daily_ticket_stats()
+    stats = cache.get_daily_ticket_stats()
     if stats:
         try:
             client.chat_postMessage(
@@ -44,7 +44,6 @@ def bump_stale_tickets():
                 )
                 db.mark_ticket_bumped(ticket["id"])
                 cache.invalidate_bump_cache()
-                time.sleep(1)  # slack rate limiting
             except Exception as e:
                 logging.error(f"Bump failed for ticket {ticket.get('id')}: {e}")
     except Exception as e:
@@ -54,6 +53,7 @@ def bump_stale_tickets():
 def alerts_loop():
     scheduler.every().day.at("11:00", "UTC").do(check_unresolved_tickets)
     scheduler.every().hour.do(bump_stale_tickets)
-    while True:
-        scheduler.run_pending()
-        time.sleep(30)
+    with ratelimit.background():
+        while True:
+            scheduler.run_pending()
+            time.sleep(30)
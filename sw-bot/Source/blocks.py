@@ -434,6 +434,9 @@ def daily_ticket_alert(stats, staff_channel):
         for i, u in enumerate(stats["leaderboard"], 1)
     ]
     leaderboard_text = "\n".join(leaderboard_lines) if leaderboard_lines else "no one closed any tickets today :("
+    week_text = ", ".join(f"<@{u['slack_id']}> ({u['count']})" for u in stats["week_leaderboard"]) or "no one yet"
+    if stats["week_avg_close"]:
+        week_text += f" | tickets took {stats['week_avg_close']} to close on average"
 
     display = stats["old_tickets"][:7]
     ticket_lines = []
@@ -470,6 +473,7 @@ def daily_ticket_alert(stats, staff_channel):
         },
         {"type": "divider"},
         {"type": "section", "text": {"type": "mrkdwn", "text": f"*today's top closers* :star:\n{leaderboard_text}"}},
+        {"type": "context", "elements": [{"type": "mrkdwn", "text": f"this week: {week_text}"}]},
         {"type": "divider"},
         {
             "type": "section",
@@ -1,27 +1,42 @@
 import logging, threading
 from time import monotonic
 import db, worker
+from globals import CACHE_MAX_FEEDBACK, CACHE_MAX_METAS, CACHE_MAX_TICKETS, CACHE_MAX_USERS
+from lru_store import LRUStore
+from single_flight import SingleFlight
 
 SHIPWRIGHTS_TTL = 600.0
+DAILY_STATS_TTL = 60.0
 DEFAULT_TTL = 7200.0
 BUMP_TTL = 3300.0  # 55 min — just under the hourly poll interval
+MISSING_TS_TTL = 60.0
+MISSING_TS_MAX = 5000
+CLOSED_NOTIFIED_MAX = 5000
 
 
 class Cache:
     def __init__(self):
         self._lock = threading.RLock()
+        self._flight = SingleFlight()
         self.bot_user_id: str | None = None
         self.sticky_message_ts = None
         self.meta_sticky_ts = None
-        self.ticket_users: dict = {}
-        self.tickets: dict = {}
-        self.feedback: dict = {}
-        self.metas: dict = {}
+        self.ticket_users = LRUStore("ticket_users", CACHE_MAX_USERS, ttl=DEFAULT_TTL)
+        self.tickets = LRUStore(
+            "tickets", CACHE_MAX_TICKETS,
+            evict_first=lambda t: t.get("status") == "closed",
+            on_evict=lambda _, t: self._unindex_ticket(t),
+        )
+        self.feedback = LRUStore("feedback", CACHE_MAX_FEEDBACK, ttl=DEFAULT_TTL)
+        self.metas = LRUStore("metas", CACHE_MAX_METAS, ttl=DEFAULT_TTL)
         self.shipwrights: list = []
         self.ignorable: list = []
         self.deleted_headers: set = set()
-        self.closed_notified: dict[tuple, float] = {}
+        self.closed_notified = LRUStore("closed_notified", CLOSED_NOTIFIED_MAX)
+        self.ts_index: dict[str, int] = {}
+        self.missing_ts: dict[str, float] = {}
         self._bump_candidates: list = []
+        self._daily_stats: dict | None = None
         self.metrics: dict = {
             "cached_at": None,
             "quote_otd": None,
@@ -30,14 +45,22 @@ class Cache:
             "paused": False,
         }
         self.fetch_times: dict[str, float] = {}
+        for store in self.persisted_stores().values():
+            store.track_changes()
+
+    def persisted_stores(self) -> dict[str, LRUStore]:
+        return {"tickets": self.tickets, "ticket_users": self.ticket_users, "feedback": self.feedback, "metas": self.metas}
+
+    def stores(self) -> list[LRUStore]:
+        return [self.tickets, self.ticket_users, self.feedback, self.metas, self.closed_notified]
 
     def can_notify_closed(self, user_id: str, ticket_id, ttl: float = 30.0) -> bool:
         key = (user_id, ticket_id)
-        now = monotonic()
-        if now - self.closed_notified.get(key, 0.0) < ttl:
-            return False
-        self.closed_notified[key] = now
-        return True
+        with self._lock:
+            if key in self.closed_notified:
+                return False
+            self.closed_notified.put(key, True, ttl=ttl)
+            return True
 
     def is_stale(self, key: str, ttl: float) -> bool:
         return monotonic() - self.fetch_times.get(key, 0.0) > ttl
@@ -47,94 +70,161 @@ class Cache:
 
     def get_user_opt_in(self, user_id):
         with self._lock:
-            if user_id in self.ticket_users and not self.is_stale(f"tu:{user_id}", DEFAULT_TTL):
-                return self.ticket_users[user_id]
-            user_data = db.get_ticket_user(user_id)
-            if user_data:
-                self.ticket_users[user_data["user_id"]] = user_data["is_opted_in"]
-                self.mark_fresh(f"tu:{user_id}")
-                return self.ticket_users[user_id]
+            opted_in = self.ticket_users.get(user_id)
+        if opted_in is not None:
+            return opted_in
+        return self._flight.do(f"tu:{user_id}", lambda: self._load_user_opt_in(user_id))
+
+    def _load_user_opt_in(self, user_id):
+        user_data = db.get_ticket_user(user_id)
+        with self._lock:
+            opted_in = self.ticket_users.peek(user_id)
+            if opted_in is not None:
+                return opted_in
+            opted_in = user_data["is_opted_in"] if user_data else True
+            self.ticket_users.put(user_id, opted_in)
+        if not user_data:
             worker.enqueue(db.create_ticket_user, user_id)
-            self.ticket_users[user_id] = True
-            self.mark_fresh(f"tu:{user_id}")
-            return True
+        return opted_in
 
     def modify_user_opt(self, user_id, state=True):
         with self._lock:
-            self.ticket_users[user_id] = state
-            self.mark_fresh(f"tu:{user_id}")
+            self.ticket_users.put(user_id, state)
         worker.enqueue(db.update_ticket_user_opt, user_id, state)
 
+    def _index_ticket(self, ticket):
+        for key in ("user_thread_ts", "staff_thread_ts"):
+            ts = ticket.get(key)
+            if ts:
+                self.ts_index[ts] = ticket["id"]
+                self.missing_ts.pop(ts, None)
+
+    def _unindex_ticket(self, ticket):
+        for key in ("user_thread_ts", "staff_thread_ts"):
+            ts = ticket.get(key)
+            if ts and self.ts_index.get(ts) == ticket["id"]:
+                del self.ts_index[ts]
+
+    def _mark_missing_ts(self, ts):
+        now = monotonic()
+        if len(self.missing_ts) >= MISSING_TS_MAX:
+            self.missing_ts = {k: t for k, t in self.missing_ts.items() if now - t < MISSING_TS_TTL}
+        self.missing_ts[ts] = now
+
     def ticket_data_saver(self, ticket_data):
-        self.tickets[ticket_data["id"]] = {
-            "id": ticket_data["id"],
-            "user_id": ticket_data["user_id"],
-            "user_name": ticket_data["user_name"],
-            "user_avatar": ticket_data.get("user_avatar"),
-            "question": ticket_data["question"],
-            "user_thread_ts": ticket_data["user_thread_ts"],
-            "staff_thread_ts": ticket_data["staff_thread_ts"],
-            "status": ticket_data["status"],
-            "closed_by": ticket_data["closed_by"],
-            "open_ticket_message_ts": ticket_data.get("open_ticket_message_ts"),
-        }
+        with self._lock:
+            previous = self.tickets.peek(ticket_data["id"])
+            if previous:
+                self._unindex_ticket(previous)
+            ticket = {
+                "id": ticket_data["id"],
+                "user_id": ticket_data["user_id"],
+                "user_name": ticket_data["user_name"],
+                "user_avatar": ticket_data.get("user_avatar"),
+                "question": ticket_data["question"],
+                "user_thread_ts": ticket_data["user_thread_ts"],
+                "staff_thread_ts": ticket_data["staff_thread_ts"],
+                "status": ticket_data["status"],
+                "closed_by": ticket_data["closed_by"],
+                "open_ticket_message_ts": ticket_data.get("open_ticket_message_ts"),
+                "user_thread_link": ticket_data.get("user_thread_link"),
+                "staff_thread_link": ticket_data.get("staff_thread_link"),
+            }
+            self.tickets.put(ticket["id"], ticket)
+            self._index_ticket(ticket)
 
-    def get_ticket_by_id(self, ticket_id):
+    def _adopt_ticket(self, ticket_data):
         with self._lock:
-            if ticket_id not in self.tickets:
-                ticket_data = db.get_ticket(ticket_id)
-                if not ticket_data:
-                    return None
+            ticket = self.tickets.peek(ticket_data["id"])
+            if ticket is None:
                 self.ticket_data_saver(ticket_data)
-            return self.tickets.get(ticket_id)
+                ticket = self.tickets.peek(ticket_data["id"])
+            return ticket
 
-    def find_ticket_by_ts(self, ts):
+    def preload_tickets(self, tickets: list[dict]) -> int:
+        """Adopt bulk-loaded tickets without replacing any already cached; oldest first so the last are most recent."""
+        added = 0
         with self._lock:
-            for ticket in self.tickets.values():
-                if ticket["staff_thread_ts"] == ts or ticket["user_thread_ts"] == ts:
-                    return ticket
-            ticket_data = db.find_ticket(ts)
-            if ticket_data:
-                self.ticket_data_saver(ticket_data)
-                return self.tickets.get(ticket_data["id"])
-            return None
+            for ticket_data in tickets:
+                if self.tickets.peek(ticket_data["id"]) is None:
+                    self.ticket_data_saver(ticket_data)
+                    added += 1
+        return added
+
+    def preload_opt_ins(self, opt_ins: dict) -> int:
+        added = 0
+        with self._lock:
+            for user_id, opted_in in opt_ins.items():
+                if self.ticket_users.peek(user_id) is None:
+                    self.ticket_users.put(user_id, opted_in)
+                    added += 1
+        return added
 
     def _load_ticket(self, ticket_id):
         ticket_data = db.get_ticket(ticket_id)
+        return self._adopt_ticket(ticket_data) if ticket_data else None
+
+    def get_ticket_by_id(self, ticket_id):
+        with self._lock:
+            ticket = self.tickets.get(ticket_id)
+        if ticket is not None:
+            return ticket
+        return self._flight.do(("ticket", ticket_id), lambda: self._load_ticket(ticket_id))
+
+    def find_ticket_by_ts(self, ts):
+        if not ts:
+            return None
+        with self._lock:
+            ticket_id = self.ts_index.get(ts)
+            ticket = self.tickets.get(ticket_id) if ticket_id is not None else None
+            if ticket is not None:
+                return ticket
+            if monotonic() - self.missing_ts.get(ts, float("-inf")) < MISSING_TS_TTL:
+                return None
+        return self._flight.do(("ts", ts), lambda: self._load_ticket_by_ts(ts))
+
+    def _load_ticket_by_ts(self, ts):
+        ticket_data = db.find_ticket(ts)
         if ticket_data:
-            self.ticket_data_saver(ticket_data)
-            return True
-        logging.critical(f"ticket {ticket_id} not found in cache or db")
-        return False
+            return self._adopt_ticket(ticket_data)
+        with self._lock:
+            self._mark_missing_ts(ts)
+        return None
 
-    def open_ticket(self, ticket_id, open_ticket_message_ts=None):
+    def _mutate_ticket(self, ticket_id, **fields):
+        ticket = self.get_ticket_by_id(ticket_id)
+        if not ticket:
+            logging.critical(f"ticket {ticket_id} not found in cache or db")
+            return None
         with self._lock:
-            if ticket_id not in self.tickets and not self._load_ticket(ticket_id):
-                return
-            self.tickets[ticket_id]["status"] = "open"
-            if open_ticket_message_ts:
-                self.tickets[ticket_id]["open_ticket_message_ts"] = open_ticket_message_ts
+            ticket.update(fields)
+            self.tickets.put(ticket_id, ticket)
+            self._index_ticket(ticket)
+        return ticket
+
+    def open_ticket(self, ticket_id, open_ticket_message_ts=None):
+        fields = {"status": "open"}
+        if open_ticket_message_ts:
+            fields["open_ticket_message_ts"] = open_ticket_message_ts
+        if not self._mutate_ticket(ticket_id, **fields):
+            return
         worker.enqueue(db.open_ticket, ticket_id, open_ticket_message_ts)
 
     def close_ticket(self, ticket_id):
-        with self._lock:
-            if ticket_id not in self.tickets and not self._load_ticket(ticket_id):
-                return
-            self.tickets[ticket_id]["status"] = "closed"
-            self.tickets[ticket_id]["open_ticket_message_ts"] = None
+        if not self._mutate_ticket(ticket_id, status="closed", open_ticket_message_ts=None):
+            return
         worker.enqueue(db.close_ticket, ticket_id)
 
     def is_ticket_claimed(self, ticket_id):
-        with self._lock:
-            if ticket_id not in self.tickets and not self._load_ticket(ticket_id):
-                return None
-            return self.tickets[ticket_id]["closed_by"]
+        ticket = self.get_ticket_by_id(ticket_id)
+        if not ticket:
+            logging.critical(f"ticket {ticket_id} not found in cache or db")
+            return None
+        return ticket["closed_by"]
 
     def claim_ticket(self, ticket_id, claimer):
-        with self._lock:
-            if ticket_id not in self.tickets and not self._load_ticket(ticket_id):
-                return
-            self.tickets[ticket_id]["closed_by"] = claimer
+        if not self._mutate_ticket(ticket_id, closed_by=claimer):
+            return
         worker.enqueue(db.claim_ticket, ticket_id, claimer)
         worker.enqueue(db.add_stardust, claimer, ticket_id)
 
@@ -142,66 +232,88 @@ class Cache:
         with self._lock:
             if self.shipwrights and not self.is_stale("shipwrights", SHIPWRIGHTS_TTL):
                 return self.shipwrights
-            self.shipwrights = db.get_shipwrights()
+        return self._flight.do("shipwrights", self._load_shipwrights)
+
+    def _load_shipwrights(self):
+        shipwrights = db.get_shipwrights()
+        with self._lock:
+            self.shipwrights = shipwrights
             self.mark_fresh("shipwrights")
-            return self.shipwrights
+        return shipwrights
 
     def get_feedback(self, ticket_id):
         with self._lock:
-            if ticket_id in self.feedback and not self.is_stale(f"fb:{ticket_id}", DEFAULT_TTL):
-                return self.feedback[ticket_id]
-            feedback_data = db.get_feedback(ticket_id)
+            entries = self.feedback.get(ticket_id)
+        if entries is not None:
+            return entries
+        return self._flight.do(("fb", ticket_id), lambda: self._load_feedback(ticket_id))
+
+    def _load_feedback(self, ticket_id):
+        rows = db.get_feedback(ticket_id)
+        feedback_data = [{"rating": row["rating"], "comment": row["comment"]} for row in rows or []]
+        with self._lock:
+            entries = self.feedback.peek(ticket_id)
+            if entries is not None:
+                return entries
             if not feedback_data:
                 return None
-            self.feedback[ticket_id] = feedback_data
-            self.mark_fresh(f"fb:{ticket_id}")
-            return self.feedback[ticket_id]
+            self.feedback.put(ticket_id, feedback_data)
+            return feedback_data
 
     def save_feedback(self, ticket_id, rating, comment):
         with self._lock:
-            entry = {"rating": int(rating), "comment": comment}
-            if ticket_id in self.feedback:
-                self.feedback[ticket_id].append(entry)
-            else:
-                self.feedback[ticket_id] = [entry]
-            self.mark_fresh(f"fb:{ticket_id}")
+            entries = self.feedback.peek(ticket_id) or []
+            entries.append({"rating": int(rating), "comment": comment})
+            self.feedback.put(ticket_id, entries)
         worker.enqueue(db.save_feedback, ticket_id, int(rating), comment)
 
     def save_meta(self, text, meta_message_ts, votes_message_ts):
         with self._lock:
-            self.metas[meta_message_ts] = {
+            self.metas.put(meta_message_ts, {
                 "upvotes": 0,
                 "downvotes": 0,
                 "votes_message_ts": votes_message_ts,
                 "text": text,
                 "voters": {},
-            }
-            self.mark_fresh(f"meta:{meta_message_ts}")
+            })
         worker.enqueue(db.save_meta, text, meta_message_ts, votes_message_ts)
 
     def get_meta_by_meta_ts(self, meta_message_ts):
         with self._lock:
-            if meta_message_ts in self.metas and not self.is_stale(f"meta:{meta_message_ts}", DEFAULT_TTL):
-                return self.metas[meta_message_ts]
-            meta_data = db.find_meta_by_meta_ts(meta_message_ts)
-            if meta_data:
-                self.metas[meta_message_ts] = {
-                    "upvotes": meta_data.get("upvotes", 0),
-                    "downvotes": meta_data.get("downvotes", 0),
-                    "votes_message_ts": meta_data["votes_message_ts"],
-                    "text": meta_data["text"],
-                    "voters": {},
-                }
-                self.mark_fresh(f"meta:{meta_message_ts}")
-                return self.metas[meta_message_ts]
-            logging.critical("get_meta_by_meta_ts: meta not found in cache or db")
-            return None
+            meta = self.metas.get(meta_message_ts)
+        if meta is not None:
+            return meta
+        return self._flight.do(("meta", meta_message_ts), lambda: self._load_meta(meta_message_ts))
 
-    def add_vote(self, meta_message_ts, user_id, delta):
+    def _load_meta(self, meta_message_ts):
+        meta_data = db.find_meta_by_meta_ts(meta_message_ts)
         with self._lock:
-            meta = self.get_meta_by_meta_ts(meta_message_ts)
-            if not meta:
+            meta = self.metas.peek(meta_message_ts)
+            if meta is not None:
+                return meta
+            if not meta_data:
+                logging.critical("get_meta_by_meta_ts: meta not found in cache or db")
                 return None
+            meta = {
+                "upvotes": meta_data.get("upvotes", 0),
+                "downvotes": meta_data.get("downvotes", 0),
+                "votes_message_ts": meta_data["votes_message_ts"],
+                "text": meta_data["text"],
+                "voters": {},
+            }
+            self.metas.put(meta_message_ts, meta)
+            return meta
+
+    def add_vote(self, meta_message_ts, user_id, delta):
+        meta = self.get_meta_by_meta_ts(meta_message_ts)
+        if not meta:
+            return None
+        with self._lock:
+            current = self.metas.peek(meta_message_ts)
+            if current is None:
+                self.metas.put(meta_message_ts, meta)
+            else:
+                meta = current
             previous = meta["voters"].get(user_id)
             if previous == delta:
                 return False
@@ -217,51 +329,83 @@ class Cache:
             meta["voters"][user_id] = delta
             meta["upvotes"] = max(0, meta["upvotes"] + upvote_delta)
             meta["downvotes"] = max(0, meta["downvotes"] + downvote_delta)
+            self.metas.mark_dirty(meta_message_ts)
+            counts = (meta["upvotes"], meta["downvotes"])
         worker.enqueue(db.update_meta_votes, meta_message_ts, upvote_delta, downvote_delta)
-        return (meta["upvotes"], meta["downvotes"])
-
+        return counts
 
     def get_tickets_due_for_bump(self) -> list:
         with self._lock:
             if self._bump_candidates and not self.is_stale("bump_candidates", BUMP_TTL):
                 return self._bump_candidates
-            self._bump_candidates = db.get_tickets_due_for_bump()
+        return self._flight.do("bump_candidates", self._load_bump_candidates)
+
+    def _load_bump_candidates(self):
+        candidates = db.get_tickets_due_for_bump()
+        with self._lock:
+            self._bump_candidates = candidates
             self.mark_fresh("bump_candidates")
-            return self._bump_candidates
+        return candidates
+
+    def get_daily_ticket_stats(self):
+        with self._lock:
+            if self._daily_stats and not self.is_stale("daily_stats", DAILY_STATS_TTL):
+                return self._daily_stats
+        return self._flight.do("daily_stats", self._load_daily_stats)
+
+    def _load_daily_stats(self):
+        stats = db.get_daily_ticket_stats()
+        if stats is not None:
+            with self._lock:
+                self._daily_stats = stats
+                self.mark_fresh("daily_stats")
+        return stats
 
     def invalidate_bump_cache(self):
         with self._lock:
             self._bump_candidates = []
             self.fetch_times.pop("bump_candidates", None)
 
-    def snapshot(self) -> dict:
+    def take_changes(self, encode) -> dict:
+        """Per persisted store, the entries changed since the last call, already encoded."""
+        changes = {}
+        with self._lock:
+            for name, store in self.persisted_stores().items():
+                try:
+                    changes[name] = store.take_changes(encode)
+                except (TypeError, ValueError) as e:
+                    # The store keeps its dirty keys; the others still get flushed.
+                    logging.error(f"encoding {name} changes failed, will retry: {e}")
+        return changes
+
+    def scalars(self) -> dict:
         with self._lock:
             return {
-                "tickets": dict(self.tickets),
-                "ticket_users": dict(self.ticket_users),
-                "feedback": {k: list(v) for k, v in self.feedback.items()},
-                "metas": {k: {**v, "voters": dict(v["voters"])} for k, v in self.metas.items()},
                 "shipwrights": list(self.shipwrights),
                 "metrics": dict(self.metrics),
                 "sticky_message_ts": self.sticky_message_ts,
                 "meta_sticky_ts": self.meta_sticky_ts,
-                "fetch_times": dict(self.fetch_times),
             }
 
-    def restore(self, data: dict) -> None:
+    def merge(self, name: str, items) -> int:
+        """Restore (key, value) pairs into a store without overwriting anything loaded since startup."""
+        store = self.persisted_stores()[name]
+        merged = 0
+        with self._lock:
+            for key, value in items:
+                if store.peek(key) is not None:
+                    continue
+                store.put(key, value, dirty=False)
+                if name == "tickets":
+                    self._index_ticket(value)
+                merged += 1
+        return merged
+
+    def merge_scalars(self, data: dict) -> None:
         with self._lock:
-            self.tickets = data.get("tickets", {})
-            self.ticket_users = data.get("ticket_users", {})
-            self.feedback = data.get("feedback", {})
-            self.metas = {
-                k: {**v, "voters": dict(v.get("voters", {}))}
-                for k, v in data.get("metas", {}).items()
-            }
             self.shipwrights = data.get("shipwrights", [])
             self.metrics.update(data.get("metrics", {}))
             self.sticky_message_ts = data.get("sticky_message_ts")
             self.meta_sticky_ts = data.get("meta_sticky_ts")
-            self.fetch_times = data.get("fetch_times", {})
-
 
 cache = Cache()
@@ -1,26 +1,194 @@
-import json, logging, os
-from globals import CACHE_SNAPSHOT_PATH
+import json, logging, os, sqlite3, threading, time
+from globals import CACHE_FLUSH_INTERVAL, CACHE_SNAPSHOT_PATH, CACHE_STORE_PATH
 
+logger = logging.getLogger("cache_store")
 
-def save(cache) -> None:
-    data = cache.snapshot()
-    tmp = CACHE_SNAPSHOT_PATH + ".tmp"
-    try:
-        with open(tmp, "w", encoding="utf-8") as f:
-            json.dump(data, f)
-        os.replace(tmp, CACHE_SNAPSHOT_PATH)
-    except OSError as e:
-        logging.error(f"cache_store save failed: {e}")
+# Restore order: tickets first so ts_index is warm for relays as early as possible.
+RESTORE_ORDER = ("tickets", "ticket_users", "metas", "feedback")
+RESTORE_BATCH = 500
+SCALARS = "_scalars"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    store TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT NOT NULL,
+    updated REAL NOT NULL,
+    PRIMARY KEY (store, key)
+)
+"""
+
+
+def _encode(value) -> str:
+    return json.dumps(value, separators=(",", ":"), default=_encode_default)
+
+
+def _encode_default(value):
+    if hasattr(value, "isoformat"):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+class CacheStore:
+    """Incremental on-disk copy of the cache in SQLite.
+
+    Every CACHE_FLUSH_INTERVAL seconds only the entries the stores flagged
+    as changed are upserted or deleted, in one WAL transaction, so a crash
+    loses at most one interval and shutdown only flushes the tail. On
+    startup small scalars load inline; store entries stream back in
+    batches on a background thread while the bot is already serving, and
+    never overwrite anything fetched since startup.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: sqlite3.Connection | None = None
+        self._last_scalars: str | None = None
+        self.restored = threading.Event()
+        self.stats_data = {"flushes": 0, "upserts": 0, "deletes": 0, "last_flush_ms": 0.0, "restored": 0, "restore_ms": 0.0}
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def flush(self, cache) -> None:
+        started = time.perf_counter()
+        changes = cache.take_changes(_encode)
+        scalars = _encode(cache.scalars())
+        now = time.time()
+        upserts, deletes = [], []
+        for name, (changed, removed) in changes.items():
+            upserts += [(name, _encode(key), value, now) for key, value in changed.items()]
+            deletes += [(name, _encode(key)) for key in removed]
+        if scalars != self._last_scalars:
+            upserts.append((SCALARS, SCALARS, scalars, now))
+        if not upserts and not deletes:
+            return
+        with self._lock:
+            conn = self._connect()
+            try:
+                conn.execute("BEGIN")
+                conn.executemany(
+                    "INSERT INTO entries (store, key, value, updated) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (store, key) DO UPDATE SET value = excluded.value, updated = excluded.updated",
+                    upserts,
+                )
+                conn.executemany("DELETE FROM entries WHERE store = ? AND key = ?", deletes)
+                conn.execute("COMMIT")
+            except sqlite3.Error as e:
+                conn.execute("ROLLBACK")
+                logger.error(f"flush of {len(upserts)} upserts and {len(deletes)} deletes failed, will retry: {e}")
+                stores = cache.persisted_stores()
+                for name, (changed, removed) in changes.items():
+                    for key in [*changed, *removed]:
+                        stores[name].mark_dirty(key)
+                return
+        self._last_scalars = scalars
+        self.stats_data["flushes"] += 1
+        self.stats_data["upserts"] += len(upserts)
+        self.stats_data["deletes"] += len(deletes)
+        self.stats_data["last_flush_ms"] = round((time.perf_counter() - started) * 1000, 1)
+
+    def _migrate_json(self):
+        """One-off import of the old full-JSON snapshot into an empty store."""
+        if not os.path.exists(CACHE_SNAPSHOT_PATH):
+            return
+        try:
+            with open(CACHE_SNAPSHOT_PATH, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.error(f"legacy snapshot {CACHE_SNAPSHOT_PATH} unreadable: {e}")
+            return
+        now = time.time()
+        rows = [(SCALARS, SCALARS, _encode({k: data.get(k) for k in ("shipwrights", "metrics", "sticky_message_ts", "meta_sticky_ts")}), now)]
+        rows += [("tickets", _encode(t["id"]), _encode(t), now) for t in data.get("tickets", {}).values()]
+        rows += [("ticket_users", _encode(k), _encode(v), now) for k, v in data.get("ticket_users", {}).items()]
+        rows += [("feedback", _encode(int(k)), _encode(v), now) for k, v in data.get("feedback", {}).items()]
+        rows += [("metas", _encode(k), _encode(v), now) for k, v in data.get("metas", {}).items()]
+        with self._lock:
+            conn = self._connect()
+            conn.execute("BEGIN")
+            conn.executemany("INSERT OR REPLACE INTO entries (store, key, value, updated) VALUES (?, ?, ?, ?)", rows)
+            conn.execute("COMMIT")
+        os.replace(CACHE_SNAPSHOT_PATH, CACHE_SNAPSHOT_PATH + ".migrated")
+        logger.info(f"migrated {len(rows) - 1} entries from {CACHE_SNAPSHOT_PATH}")
+
+    def load(self, cache) -> None:
+        try:
+            with self._lock:
+                empty = self._connect().execute("SELECT 1 FROM entries LIMIT 1").fetchone() is None
+            if empty:
+                self._migrate_json()
+            with self._lock:
+                row = self._connect().execute(
+                    "SELECT value FROM entries WHERE store = ? AND key = ?", (SCALARS, SCALARS),
+                ).fetchone()
+        except sqlite3.Error as e:
+            logger.error(f"load failed, starting cold: {e}")
+            self.restored.set()
+            return
+        if row:
+            cache.merge_scalars(json.loads(row[0]))
+            self._last_scalars = row[0]
+        threading.Thread(target=self._restore, args=(cache,), daemon=True, name="cache-restore").start()
+
+    def _restore(self, cache):
+        started = time.perf_counter()
+        total = 0
+        try:
+            for name in RESTORE_ORDER:
+                after = (0.0, "")
+                while True:
+                    with self._lock:
+                        rows = self._connect().execute(
+                            "SELECT key, value, updated FROM entries WHERE store = ? AND (updated, key) > (?, ?) "
+                            "ORDER BY updated, key LIMIT ?",
+                            (name, *after, RESTORE_BATCH),
+                        ).fetchall()
+                    if not rows:
+                        break
+                    after = (rows[-1][2], rows[-1][0])
+                    total += cache.merge(name, ((json.loads(k), json.loads(v)) for k, v, _ in rows))
+                    time.sleep(0)
+        except (sqlite3.Error, ValueError) as e:
+            logger.error(f"restore stopped after {total} entries: {e}")
+        finally:
+            self.stats_data["restored"] = total
+            self.stats_data["restore_ms"] = round((time.perf_counter() - started) * 1000, 1)
+            self.restored.set()
+        logger.info(f"restored {total} entries in {self.stats_data['restore_ms']}ms")
+
+    def flush_loop(self, cache):
+        while True:
+            time.sleep(CACHE_FLUSH_INTERVAL)
+            try:
+                self.flush(cache)
+            except Exception as e:
+                logger.exception(f"flush loop error: {e}")
+
+    def close(self, cache) -> None:
+        self.flush(cache)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def stats(self) -> dict:
+        return {**self.stats_data, "restoring": not self.restored.is_set()}
+
+
+store = CacheStore(CACHE_STORE_PATH)
 
 
 def load(cache) -> None:
-    if not os.path.exists(CACHE_SNAPSHOT_PATH):
-        return
-    try:
-        with open(CACHE_SNAPSHOT_PATH, encoding="utf-8") as f:
-            data = json.load(f)
-    except (OSError, json.JSONDecodeError) as e:
-        logging.error(f"cache_store load failed: {e}")
-        return
-    cache.restore(data)
-    logging.info("cache_store: snapshot restored")
+    store.load(cache)
+
+
+def save(cache) -> None:
+    store.close(cache)
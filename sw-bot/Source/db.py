@@ -1,24 +1,27 @@
 import json
 import logging
-import math
 from contextlib import contextmanager
 from datetime import datetime, timedelta
 
 import psycopg2
 import pytz
-from psycopg2 import pool
-from psycopg2.extras import RealDictCursor
+from psycopg2.extras import RealDictCursor, execute_values
 
-from globals import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER, TICKET_PAY
+import statements
+from db_pool import HealthCheckedPool
+from statements import register
+from globals import DB_HOST, DB_IDLE_CHECK, DB_NAME, DB_PASSWORD, DB_POOL_TIMEOUT, DB_PORT, DB_USER, TICKET_PAY
 
-connection_pool: pool.ThreadedConnectionPool | None = None
+connection_pool: HealthCheckedPool | None = None
 
 
 def init_pool():
     global connection_pool
-    connection_pool = pool.ThreadedConnectionPool(
+    connection_pool = HealthCheckedPool(
         minconn=2,
         maxconn=10,
+        idle_check=DB_IDLE_CHECK,
+        timeout=DB_POOL_TIMEOUT,
         host=DB_HOST,
         port=DB_PORT,
         user=DB_USER,
@@ -32,27 +35,13 @@ def init_pool():
 
 
 def _acquire_conn() -> psycopg2.extensions.connection:
-    global connection_pool
     if connection_pool is None:
         init_pool()
-    for attempt in range(3):
-        conn = connection_pool.getconn()
-        if conn.closed:
-            connection_pool.putconn(conn, close=True)
-            continue
-        try:
-            conn.cursor().execute("SELECT 1")
-            return conn
-        except Exception as e:
-            if attempt > 0:
-                logging.error(f"DB connection validation failed (attempt {attempt + 1}): {e}")
-            connection_pool.putconn(conn, close=True)
-            try:
-                connection_pool.closeall()
-            except Exception as ce:
-                logging.warning(f"DB pool closeall failed: {ce}")
-            init_pool()
-    raise psycopg2.OperationalError("DB connection unavailable after 3 attempts")
+    return connection_pool.getconn()
+
+
+def pool_stats() -> dict:
+    return connection_pool.stats() if connection_pool else {}
 
 
 def _release_conn(conn, *, success: bool) -> None:
@@ -109,44 +98,119 @@ def est_day_range_utc(days_back=1):
 
 
 def period_filter(period):
+    """WHERE clause over the daily buckets' `day`.
+
+    Periods are calendar days including today: "day" is today so far,
+    "week" today and the 6 days before it, "month" back to the same date
+    last month (exclusive).
+    """
     p = (period or "all").lower()
     if p == "day":
-        return "closed_at >= NOW() - INTERVAL '1 day'"
+        return "day > (NOW() - INTERVAL '1 day')::date"
     if p == "week":
-        return "closed_at >= NOW() - INTERVAL '7 days'"
+        return "day > (NOW() - INTERVAL '7 days')::date"
     if p == "month":
-        return "closed_at >= NOW() - INTERVAL '1 month'"
+        return "day > (NOW() - INTERVAL '1 month')::date"
     return None
 
 
-def save_ticket(user_id, user_name, user_avatar, question, user_thread, staff_thread, open_ticket_message_ts=None):
+def _bump_day(cur, day, opened=0, closed=0, close_seconds=0.0, close_count=0):
+    cur.execute(
+        """
+        INSERT INTO ticket_metrics_daily AS m (day, opened, closed, close_seconds, close_count)
+        VALUES (%s, %s, %s, %s, %s)
+        ON CONFLICT (day) DO UPDATE SET
+            opened = m.opened + EXCLUDED.opened,
+            closed = m.closed + EXCLUDED.closed,
+            close_seconds = m.close_seconds + EXCLUDED.close_seconds,
+            close_count = m.close_count + EXCLUDED.close_count
+        """,
+        (day, opened, closed, close_seconds, close_count),
+    )
+
+
+def _tally_closed(cur, sign, created_at, closed_at, closed_by):
+    """Add (sign=1) or remove (sign=-1) one closed ticket from the daily and per-closer buckets."""
+    day = (closed_at or created_at).date()
+    timed = closed_at is not None and created_at is not None
+    seconds = (closed_at - created_at).total_seconds() if timed else 0.0
+    _bump_day(cur, day, closed=sign, close_seconds=sign * seconds, close_count=sign if timed else 0)
+    if closed_by:
+        cur.execute(
+            """
+            INSERT INTO ticket_closer_daily AS c (day, closed_by, closed) VALUES (%s, %s, %s)
+            ON CONFLICT (day, closed_by) DO UPDATE SET closed = c.closed + EXCLUDED.closed
+            """,
+            (day, closed_by, sign),
+        )
+
+
+def _transition_ticket(cur, ticket_id, assignments: str, params: tuple) -> bool:
+    """Apply `assignments` to a ticket and move its metrics from the old state to the new one.
+
+    Retallying from the before/after rows keeps the buckets right when a
+    write-behind task is replayed or a closed ticket is re-closed or re-claimed.
+    """
+    cur.execute(
+        f"""
+        WITH prev AS (
+            SELECT id, status, created_at, closed_at, closed_by FROM tickets WHERE id = %s FOR UPDATE
+        )
+        UPDATE tickets t SET {assignments}
+        FROM prev
+        WHERE t.id = prev.id
+        RETURNING prev.status, prev.created_at, prev.closed_at, prev.closed_by,
+                  t.status, t.created_at, t.closed_at, t.closed_by
+        """,
+        (ticket_id, *params),
+    )
+    row = cur.fetchone()
+    if not row:
+        return False
+    if row[0] == "closed":
+        _tally_closed(cur, -1, row[1], row[2], row[3])
+    if row[4] == "closed":
+        _tally_closed(cur, 1, row[5], row[6], row[7])
+    return True
+
+
+SAVE_TICKET = register("save_ticket", """
+    INSERT INTO tickets
+        (user_id, user_name, user_avatar, question, user_thread_ts, staff_thread_ts, status, open_ticket_message_ts, user_thread_link, staff_thread_link)
+    VALUES (%s, %s, %s, %s, %s, %s, 'open', %s, %s, %s)
+    RETURNING id, created_at::date
+""")
+
+
+def save_ticket(user_id, user_name, user_avatar, question, user_thread, staff_thread, open_ticket_message_ts=None, user_thread_link=None, staff_thread_link=None):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO tickets (user_id, user_name, user_avatar, question, user_thread_ts, staff_thread_ts, status, open_ticket_message_ts)
-                    VALUES (%s, %s, %s, %s, %s, %s, 'open', %s)
-                    RETURNING id
-                    """,
-                    (user_id, user_name, user_avatar, question, user_thread, staff_thread, open_ticket_message_ts),
+                statements.execute(
+                    cur, SAVE_TICKET,
+                    (user_id, user_name, user_avatar, question, user_thread, staff_thread, open_ticket_message_ts, user_thread_link, staff_thread_link),
                 )
-                return cur.fetchone()[0]
+                ticket_id, day = cur.fetchone()
+                _bump_day(cur, day, opened=1)
+                return ticket_id
     except psycopg2.Error as e:
         logging.error(f"save_ticket failed: {e}")
         return None
 
 
+SAVE_MESSAGE = register("save_message", """
+    INSERT INTO ticket_msgs
+        (ticket_id, sender_id, sender_name, sender_avatar, msg, files, is_staff, message_ts, origin_message_ts)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
+""")
+
+
 def save_message(ticket_id, sender_id, sender_name, sender_avatar, msg, is_staff, files=None, message_ts=None, origin_message_ts=None):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    """
-                    INSERT INTO ticket_msgs
-                        (ticket_id, sender_id, sender_name, sender_avatar, msg, files, is_staff, message_ts, origin_message_ts)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
+                statements.execute(
+                    cur, SAVE_MESSAGE,
                     (
                         ticket_id,
                         sender_id,
@@ -163,11 +227,46 @@ def save_message(ticket_id, sender_id, sender_name, sender_avatar, msg, is_staff
         logging.error(f"save_message failed: {e}")
 
 
+def save_messages(messages: list[dict]) -> bool:
+    try:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    INSERT INTO ticket_msgs
+                        (ticket_id, sender_id, sender_name, sender_avatar, msg, files, is_staff, message_ts, origin_message_ts)
+                    VALUES %s
+                    """,
+                    [
+                        (
+                            m["ticket_id"],
+                            m["sender_id"],
+                            m["sender_name"],
+                            m["sender_avatar"],
+                            m["msg"],
+                            json.dumps(m["files"]) if m["files"] else None,
+                            m["is_staff"],
+                            m["message_ts"],
+                            m["origin_message_ts"],
+                        )
+                        for m in messages
+                    ],
+                )
+        return True
+    except psycopg2.Error as e:
+        logging.error(f"save_messages failed: {e}")
+        return False
+
+
+GET_TICKET = register("get_ticket", "SELECT * FROM tickets WHERE id = %s")
+
+
 def get_ticket(ticket_id):
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM tickets WHERE id = %s", (ticket_id,))
+                statements.execute(cur, GET_TICKET, (ticket_id,))
                 row = cur.fetchone()
                 return dict(row) if row else None
     except psycopg2.Error as e:
@@ -175,14 +274,15 @@ def get_ticket(ticket_id):
         return None
 
 
+FIND_TICKET_SQL = "SELECT * FROM tickets WHERE staff_thread_ts = %s OR user_thread_ts = %s"
+FIND_TICKET = register("find_ticket", FIND_TICKET_SQL)
+
+
 def find_ticket(thread):
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    "SELECT * FROM tickets WHERE staff_thread_ts = %s OR user_thread_ts = %s",
-                    (thread, thread),
-                )
+                statements.execute(cur, FIND_TICKET, (thread, thread))
                 row = cur.fetchone()
                 return dict(row) if row else None
     except psycopg2.Error as e:
@@ -194,11 +294,7 @@ def claim_ticket(ticket_id, closer):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE tickets SET closed_by = %s WHERE id = %s",
-                    (closer, ticket_id),
-                )
-                return cur.rowcount > 0
+                return _transition_ticket(cur, ticket_id, "closed_by = %s", (closer,))
     except psycopg2.Error as e:
         logging.error(f"claim_ticket failed: {e}")
         return False
@@ -208,11 +304,9 @@ def close_ticket(ticket_id):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE tickets SET status = 'closed', closed_at = NOW(), open_ticket_message_ts = NULL WHERE id = %s",
-                    (ticket_id,),
+                return _transition_ticket(
+                    cur, ticket_id, "status = 'closed', closed_at = NOW(), open_ticket_message_ts = NULL", (),
                 )
-                return cur.rowcount > 0
     except psycopg2.Error as e:
         logging.error(f"close_ticket failed: {e}")
         return False
@@ -222,21 +316,79 @@ def open_ticket(ticket_id, open_ticket_message_ts=None):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE tickets SET status = 'open', closed_at = NULL, open_ticket_message_ts = %s WHERE id = %s",
-                    (open_ticket_message_ts, ticket_id),
+                return _transition_ticket(
+                    cur, ticket_id, "status = 'open', closed_at = NULL, open_ticket_message_ts = %s", (open_ticket_message_ts,),
                 )
-                return cur.rowcount > 0
     except psycopg2.Error as e:
         logging.error(f"open_ticket failed: {e}")
         return False
 
 
+_CACHED_TICKET_COLUMNS = """
+    id, user_id, user_name, user_avatar, question, user_thread_ts, staff_thread_ts,
+    status, closed_by, open_ticket_message_ts, user_thread_link, staff_thread_link
+"""
+
+
+def get_open_tickets():
+    try:
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(f"SELECT {_CACHED_TICKET_COLUMNS} FROM tickets WHERE status = 'open'")
+                return [dict(r) for r in cur.fetchall()]
+    except psycopg2.Error as e:
+        logging.error(f"get_open_tickets failed: {e}")
+        return []
+
+
+def get_recently_closed_tickets(days: int, limit: int):
+    try:
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                cur.execute(
+                    f"""
+                    SELECT {_CACHED_TICKET_COLUMNS} FROM tickets
+                    WHERE status = 'closed' AND closed_at >= NOW() - make_interval(days => %s)
+                    ORDER BY closed_at DESC
+                    LIMIT %s
+                    """,
+                    (days, limit),
+                )
+                return [dict(r) for r in cur.fetchall()]
+    except psycopg2.Error as e:
+        logging.error(f"get_recently_closed_tickets failed: {e}")
+        return []
+
+
+def get_ticket_user_opt_ins(user_ids: list[str]) -> dict:
+    if not user_ids:
+        return {}
+    try:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                cur.execute(
+                    "SELECT user_id, is_opted_in FROM ticket_users WHERE user_id = ANY(%s)",
+                    (list(user_ids),),
+                )
+                return {row[0]: row[1] for row in cur.fetchall()}
+    except psycopg2.Error as e:
+        logging.error(f"get_ticket_user_opt_ins failed: {e}")
+        return {}
+
+
+GET_TICKET_USER = register("get_ticket_user", "SELECT * FROM ticket_users WHERE user_id = %s")
+CREATE_TICKET_USER = register(
+    "create_ticket_user",
+    "INSERT INTO ticket_users (user_id, is_opted_in) VALUES (%s, TRUE) ON CONFLICT (user_id) DO NOTHING RETURNING user_id",
+)
+UPDATE_TICKET_USER_OPT = register("update_ticket_user_opt", "UPDATE ticket_users SET is_opted_in = %s WHERE user_id = %s")
+
+
 def get_ticket_user(user_id):
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT * FROM ticket_users WHERE user_id = %s", (user_id,))
+                statements.execute(cur, GET_TICKET_USER, (user_id,))
                 row = cur.fetchone()
                 return dict(row) if row else None
     except psycopg2.Error as e:
@@ -248,10 +400,7 @@ def create_ticket_user(user_id):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO ticket_users (user_id, is_opted_in) VALUES (%s, TRUE) ON CONFLICT (user_id) DO NOTHING RETURNING user_id",
-                    (user_id,),
-                )
+                statements.execute(cur, CREATE_TICKET_USER, (user_id,))
                 row = cur.fetchone()
                 return row[0] if row else user_id
     except psycopg2.Error as e:
@@ -263,17 +412,14 @@ def update_ticket_user_opt(user_id, state: bool):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE ticket_users SET is_opted_in = %s WHERE user_id = %s",
-                    (state, user_id),
-                )
+                statements.execute(cur, UPDATE_TICKET_USER_OPT, (state, user_id))
                 return cur.rowcount > 0
     except psycopg2.Error as e:
         logging.error(f"update_ticket_user_opt failed: {e}")
         return False
 
 
-def add_stardust(slack_id, ticket_id=None, amount=TICKET_PAY):
+def _add_stardust(cur, slack_id, ticket_id, amount):
     if not slack_id:
         return None
     try:
@@ -283,58 +429,83 @@ def add_stardust(slack_id, ticket_id=None, amount=TICKET_PAY):
     if increment <= 0:
         return None
 
+    cur.execute(
+        """
+        UPDATE users
+        SET cookie_balance = cookie_balance + %s,
+            cookies_earned = cookies_earned + %s
+        WHERE slack_id = %s
+        RETURNING id, username, role, avatar, cookie_balance
+        """,
+        (increment, increment, slack_id),
+    )
+    row = cur.fetchone()
+    if not row:
+        return None
+
+    cur.execute(
+        """
+        INSERT INTO sys_logs
+            (user_id, slack_id, username, role, action, context, status_code,
+             avatar, target_id, target_type, metadata)
+        VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+        """,
+        (
+            row["id"],
+            slack_id,
+            row.get("username"),
+            row.get("role"),
+            "ticket_stardust_payout",
+            f"Awarded {increment:.2f} stardust for claiming a ticket",
+            200,
+            row.get("avatar"),
+            str(ticket_id) if ticket_id else None,
+            "ticket" if ticket_id else "user",
+            json.dumps({"source": "sw-bot", "amount": increment, "ticketId": ticket_id}),
+        ),
+    )
+    return float(row["cookie_balance"]) if row.get("cookie_balance") is not None else 0.0
+
+
+def add_stardust(slack_id, ticket_id=None, amount=TICKET_PAY):
+    if not slack_id:
+        return None
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    """
-                    UPDATE users
-                    SET cookie_balance = cookie_balance + %s,
-                        cookies_earned = cookies_earned + %s
-                    WHERE slack_id = %s
-                    RETURNING id, username, role, avatar, cookie_balance
-                    """,
-                    (increment, increment, slack_id),
-                )
-                row = cur.fetchone()
-                if not row:
-                    return None
-
-                cur.execute(
-                    """
-                    INSERT INTO sys_logs
-                        (user_id, slack_id, username, role, action, context, status_code,
-                         avatar, target_id, target_type, metadata)
-                    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-                    """,
-                    (
-                        row["id"],
-                        slack_id,
-                        row.get("username"),
-                        row.get("role"),
-                        "ticket_stardust_payout",
-                        f"Awarded {increment:.2f} stardust for claiming a ticket",
-                        200,
-                        row.get("avatar"),
-                        str(ticket_id) if ticket_id else None,
-                        "ticket" if ticket_id else "user",
-                        json.dumps({"source": "sw-bot", "amount": increment, "ticketId": ticket_id}),
-                    ),
-                )
-                return float(row["cookie_balance"]) if row.get("cookie_balance") is not None else 0.0
+                return _add_stardust(cur, slack_id, ticket_id, amount)
     except psycopg2.Error as e:
         logging.error(f"add_stardust failed: {e}")
         return None
 
 
+def add_stardust_batch(payouts: list[dict]) -> bool:
+    try:
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                for p in payouts:
+                    _add_stardust(cur, p["slack_id"], p["ticket_id"], p["amount"])
+        return True
+    except psycopg2.Error as e:
+        logging.error(f"add_stardust_batch failed: {e}")
+        return False
+
+
+EDIT_MESSAGE_SQL = "UPDATE ticket_msgs SET msg = %s WHERE message_ts = %s"
+MESSAGE_IN_TICKET_SQL = "SELECT 1 FROM ticket_msgs WHERE (message_ts = %s OR origin_message_ts = %s) AND ticket_id = %s"
+DEST_MESSAGE_TS_SQL = "SELECT message_ts FROM ticket_msgs WHERE origin_message_ts = %s"
+ORIGIN_MESSAGE_TS_SQL = "SELECT origin_message_ts FROM ticket_msgs WHERE message_ts = %s"
+EDIT_MESSAGE = register("edit_message", EDIT_MESSAGE_SQL)
+MESSAGE_IN_TICKET = register("message_belongs_to_ticket", MESSAGE_IN_TICKET_SQL)
+DEST_MESSAGE_TS = register("dest_message_ts", DEST_MESSAGE_TS_SQL)
+ORIGIN_MESSAGE_TS = register("origin_message_ts", ORIGIN_MESSAGE_TS_SQL)
+
+
 def edit_message(message_ts, new_text):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE ticket_msgs SET msg = %s WHERE message_ts = %s",
-                    (new_text, message_ts),
-                )
+                statements.execute(cur, EDIT_MESSAGE, (new_text, message_ts))
     except psycopg2.Error as e:
         logging.error(f"edit_message failed: {e}")
 
@@ -343,10 +514,7 @@ def message_belongs_to_ticket(message_ts: str, ticket_id: int) -> bool:
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT 1 FROM ticket_msgs WHERE (message_ts = %s OR origin_message_ts = %s) AND ticket_id = %s",
-                    (message_ts, message_ts, ticket_id),
-                )
+                statements.execute(cur, MESSAGE_IN_TICKET, (message_ts, message_ts, ticket_id))
                 return cur.fetchone() is not None
     except psycopg2.Error as e:
         logging.error(f"message_belongs_to_ticket failed: {e}")
@@ -357,10 +525,7 @@ def get_dest_message_ts(message_ts):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "SELECT message_ts FROM ticket_msgs WHERE origin_message_ts = %s",
-                    (message_ts,),
-                )
+                statements.execute(cur, DEST_MESSAGE_TS, (message_ts,))
                 row = cur.fetchone()
                 return row[0] if row else None
     except psycopg2.Error as e:
@@ -372,11 +537,11 @@ def get_linked_message_ts(ts):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT message_ts FROM ticket_msgs WHERE origin_message_ts = %s", (ts,))
+                statements.execute(cur, DEST_MESSAGE_TS, (ts,))
                 row = cur.fetchone()
                 if row:
                     return row[0]
-                cur.execute("SELECT origin_message_ts FROM ticket_msgs WHERE message_ts = %s", (ts,))
+                statements.execute(cur, ORIGIN_MESSAGE_TS, (ts,))
                 row = cur.fetchone()
                 return row[0] if row else None
     except psycopg2.Error as e:
@@ -413,14 +578,17 @@ def get_monthly_feedback_winners(year: int, month: int, count: int = 3) -> list[
         return []
 
 
+SAVE_FEEDBACK = register(
+    "save_feedback", "INSERT INTO ticket_feedback (ticket_id, rating, comment) VALUES (%s, %s, %s) RETURNING id",
+)
+GET_FEEDBACK = register("get_feedback", "SELECT * FROM ticket_feedback WHERE ticket_id = %s ORDER BY created_at DESC")
+
+
 def save_feedback(ticket_id, rating, comment):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO ticket_feedback (ticket_id, rating, comment) VALUES (%s, %s, %s) RETURNING id",
-                    (ticket_id, rating, comment or ""),
-                )
+                statements.execute(cur, SAVE_FEEDBACK, (ticket_id, rating, comment or ""))
                 row = cur.fetchone()
                 return row[0] if row else None
     except psycopg2.Error as e:
@@ -432,21 +600,21 @@ def get_feedback(ticket_id):
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    "SELECT * FROM ticket_feedback WHERE ticket_id = %s ORDER BY created_at DESC",
-                    (ticket_id,),
-                )
+                statements.execute(cur, GET_FEEDBACK, (ticket_id,))
                 return [dict(r) for r in cur.fetchall()]
     except psycopg2.Error as e:
         logging.error(f"get_feedback failed: {e}")
         return []
 
 
+GET_SHIPWRIGHTS = register("get_shipwrights", "SELECT slack_id FROM users WHERE is_active = TRUE")
+
+
 def get_shipwrights():
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT slack_id FROM users WHERE is_active = TRUE")
+                statements.execute(cur, GET_SHIPWRIGHTS)
                 return [row[0] for row in cur.fetchall()]
     except psycopg2.Error as e:
         logging.error(f"get_shipwrights failed: {e}")
@@ -455,43 +623,6 @@ def get_shipwrights():
 
 
 
-def avg_close_time(period="all"):
-    try:
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                where = period_filter(period)
-                base = "SELECT AVG(EXTRACT(EPOCH FROM (closed_at - created_at))) FROM tickets WHERE status = 'closed' AND closed_at IS NOT NULL"
-                sql = f"{base} AND {where}" if where else base
-                cur.execute(sql)
-                row = cur.fetchone()
-                avg_seconds = None
-                if row and row[0] is not None:
-                    try:
-                        avg_seconds = int(math.floor(float(row[0])))
-                    except (TypeError, ValueError):
-                        avg_seconds = None
-                return format_seconds(avg_seconds or 0)
-    except psycopg2.Error as e:
-        logging.error(f"avg_close_time failed: {e}")
-        return "N/A"
-
-
-def count_tickets(status="all"):
-    try:
-        with get_db() as conn:
-            with conn.cursor() as cur:
-                s = (status or "all").lower()
-                if s == "all":
-                    cur.execute("SELECT COUNT(*) FROM tickets")
-                elif s in ("open", "closed"):
-                    cur.execute("SELECT COUNT(*) FROM tickets WHERE status = %s", (s,))
-                row = cur.fetchone()
-                return int(row[0] or 0)
-    except psycopg2.Error as e:
-        logging.error(f"count_tickets failed: {e}")
-        return 0
-
-
 def get_unresolved_tickets_past_24h():
     try:
         with get_db() as conn:
@@ -505,6 +636,19 @@ def get_unresolved_tickets_past_24h():
         return []
 
 
+DUE_FOR_BUMP_SQL = """
+    SELECT * FROM tickets
+    WHERE status = 'open'
+      AND (
+        (last_bumped_at IS NULL     AND created_at    <= NOW() - INTERVAL '1 day')
+        OR
+        (last_bumped_at IS NOT NULL AND last_bumped_at <= NOW() - INTERVAL '1 day')
+      )
+"""
+DUE_FOR_BUMP = register("tickets_due_for_bump", DUE_FOR_BUMP_SQL)
+MARK_TICKET_BUMPED = register("mark_ticket_bumped", "UPDATE tickets SET last_bumped_at = NOW() WHERE id = %s")
+
+
 def get_tickets_due_for_bump():
     """Returns open tickets that are due for a bump:
     - Never bumped and older than 24h, OR
@@ -513,17 +657,7 @@ def get_tickets_due_for_bump():
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    """
-                    SELECT * FROM tickets
-                    WHERE status = 'open'
-                      AND (
-                        (last_bumped_at IS NULL     AND created_at    <= NOW() - INTERVAL '1 day')
-                        OR
-                        (last_bumped_at IS NOT NULL AND last_bumped_at <= NOW() - INTERVAL '1 day')
-                      )
-                    """
-                )
+                statements.execute(cur, DUE_FOR_BUMP)
                 return [dict(r) for r in cur.fetchall()]
     except psycopg2.Error as e:
         logging.error(f"get_tickets_due_for_bump failed: {e}")
@@ -534,63 +668,105 @@ def mark_ticket_bumped(ticket_id: int) -> bool:
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE tickets SET last_bumped_at = NOW() WHERE id = %s",
-                    (ticket_id,),
-                )
+                statements.execute(cur, MARK_TICKET_BUMPED, (ticket_id,))
                 return cur.rowcount > 0
     except psycopg2.Error as e:
         logging.error(f"mark_ticket_bumped failed: {e}")
         return False
 
 
-def get_daily_ticket_stats():
-    try:
-        with get_db() as conn:
-            with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute("SELECT COUNT(*) AS count FROM tickets WHERE created_at >= NOW() - INTERVAL '1 day'")
-                opened_24h = cur.fetchone()["count"]
+DAILY_STATS_SQL = f"""
+    WITH counts AS (
+        SELECT
+            COUNT(*) FILTER (WHERE created_at >= NOW() - INTERVAL '1 day') AS opened_24h,
+            COUNT(*) FILTER (WHERE status = 'closed' AND closed_at >= NOW() - INTERVAL '1 day') AS closed_24h,
+            COUNT(*) FILTER (WHERE status = 'open') AS total_open
+        FROM tickets
+    ),
+    leaders AS (
+        SELECT COALESCE(json_agg(json_build_object('slack_id', slack_id, 'count', count) ORDER BY count DESC), '[]'::json) AS leaderboard
+        FROM (
+            SELECT closed_by AS slack_id, COUNT(*) AS count
+            FROM tickets
+            WHERE status = 'closed'
+              AND closed_at >= NOW() - INTERVAL '1 day'
+              AND closed_by IS NOT NULL
+            GROUP BY closed_by
+            ORDER BY count DESC
+            LIMIT 3
+        ) top
+    ),
+    week AS (
+        SELECT SUM(close_seconds) AS close_seconds, SUM(close_count) AS close_count
+        FROM ticket_metrics_daily
+        WHERE {period_filter("week")}
+    ),
+    week_leaders AS (
+        SELECT COALESCE(json_agg(json_build_object('slack_id', slack_id, 'count', count) ORDER BY count DESC), '[]'::json) AS week_leaderboard
+        FROM (
+            SELECT closed_by AS slack_id, SUM(closed) AS count
+            FROM ticket_closer_daily
+            WHERE {period_filter("week")}
+            GROUP BY closed_by
+            HAVING SUM(closed) > 0
+            ORDER BY count DESC
+            LIMIT 3
+        ) top
+    ),
+    old AS (
+        SELECT t.id, t.user_id, t.question, t.staff_thread_ts, t.created_at, m.last_reply
+        FROM tickets t
+        LEFT JOIN LATERAL (
+            SELECT created_at AS last_reply
+            FROM ticket_msgs
+            WHERE ticket_id = t.id
+            ORDER BY created_at DESC
+            LIMIT 1
+        ) m ON TRUE
+        WHERE t.status = 'open' AND t.created_at <= NOW() - INTERVAL '1 day'
+        ORDER BY t.created_at ASC
+        LIMIT 11
+    )
+    SELECT c.opened_24h, c.closed_24h, c.total_open, l.leaderboard,
+           w.close_seconds AS week_close_seconds, w.close_count AS week_close_count, wl.week_leaderboard,
+           o.id, o.user_id, o.question, o.staff_thread_ts, o.created_at, o.last_reply
+    FROM counts c
+    CROSS JOIN leaders l
+    CROSS JOIN week w
+    CROSS JOIN week_leaders wl
+    LEFT JOIN old o ON TRUE
+    ORDER BY o.created_at ASC
+"""
 
-                cur.execute(
-                    "SELECT COUNT(*) AS count FROM tickets WHERE status = 'closed' AND closed_at >= NOW() - INTERVAL '1 day'"
-                )
-                closed_24h = cur.fetchone()["count"]
 
-                cur.execute("SELECT COUNT(*) AS count FROM tickets WHERE status = 'open'")
-                total_open = cur.fetchone()["count"]
+DAILY_STATS = register("daily_ticket_stats", DAILY_STATS_SQL)
 
-                cur.execute(
-                    """
-                    SELECT closed_by AS slack_id, COUNT(*) AS count
-                    FROM tickets
-                    WHERE status = 'closed'
-                      AND closed_at >= NOW() - INTERVAL '1 day'
-                      AND closed_by IS NOT NULL
-                    GROUP BY closed_by
-                    ORDER BY count DESC
-                    LIMIT 3
-                    """
-                )
-                leaderboard = [dict(r) for r in cur.fetchall()]
 
-                cur.execute(
-                    """
-                    SELECT t.id, t.user_id, t.question, t.staff_thread_ts, t.created_at,
-                           (SELECT MAX(created_at) FROM ticket_msgs WHERE ticket_id = t.id) AS last_reply
-                    FROM tickets t
-                    WHERE t.status = 'open' AND t.created_at <= NOW() - INTERVAL '1 day'
-                    ORDER BY t.created_at ASC
-                    LIMIT 11
-                    """
-                )
-                old_tickets = [dict(r) for r in cur.fetchall()]
+def get_daily_ticket_stats():
+    """Counts, top closers, this week's close time and top closers (from
+    the daily buckets) and the oldest open tickets in one round trip.
 
+    One row per old ticket (or a single row with NULL ticket columns when
+    there are none), each carrying the same counts and leaderboard.
+    """
+    try:
+        with get_db() as conn:
+            with conn.cursor(cursor_factory=RealDictCursor) as cur:
+                statements.execute(cur, DAILY_STATS)
+                rows = cur.fetchall()
+                first = rows[0]
+                week_closed = first["week_close_count"]
                 return {
-                    "opened_24h": opened_24h,
-                    "closed_24h": closed_24h,
-                    "total_open": total_open,
-                    "leaderboard": leaderboard,
-                    "old_tickets": old_tickets,
+                    "opened_24h": first["opened_24h"],
+                    "closed_24h": first["closed_24h"],
+                    "total_open": first["total_open"],
+                    "leaderboard": first["leaderboard"],
+                    "week_avg_close": format_seconds(float(first["week_close_seconds"]) / week_closed) if week_closed else None,
+                    "week_leaderboard": first["week_leaderboard"],
+                    "old_tickets": [
+                        {k: r[k] for k in ("id", "user_id", "question", "staff_thread_ts", "created_at", "last_reply")}
+                        for r in rows if r["id"] is not None
+                    ],
                 }
     except psycopg2.Error as e:
         logging.error(f"get_daily_ticket_stats failed: {e}")
@@ -629,14 +805,40 @@ def update_meta_votes(meta_message_ts, upvote_delta, downvote_delta):
         return (None, None)
 
 
+def update_meta_votes_batch(updates: list[dict]) -> bool:
+    totals: dict[str, list[int]] = {}
+    for u in updates:
+        total = totals.setdefault(u["meta_message_ts"], [0, 0])
+        total[0] += int(u["upvote_delta"])
+        total[1] += int(u["downvote_delta"])
+    try:
+        with get_db() as conn:
+            with conn.cursor() as cur:
+                execute_values(
+                    cur,
+                    """
+                    UPDATE meta_posts AS m
+                    SET upvotes = m.upvotes + v.up, downvotes = m.downvotes + v.down
+                    FROM (VALUES %s) AS v (meta_message_ts, up, down)
+                    WHERE m.meta_message_ts = v.meta_message_ts
+                    """,
+                    [(ts, up, down) for ts, (up, down) in totals.items()],
+                    template="(%s, %s::int, %s::int)",
+                )
+        return True
+    except psycopg2.Error as e:
+        logging.error(f"update_meta_votes_batch failed: {e}")
+        return False
+
+
+FIND_META = register("find_meta_by_meta_ts", "SELECT * FROM meta_posts WHERE meta_message_ts = %s")
+
+
 def find_meta_by_meta_ts(meta_message_ts):
     try:
         with get_db() as conn:
             with conn.cursor(cursor_factory=RealDictCursor) as cur:
-                cur.execute(
-                    "SELECT * FROM meta_posts WHERE meta_message_ts = %s",
-                    (meta_message_ts,),
-                )
+                statements.execute(cur, FIND_META, (meta_message_ts,))
                 row = cur.fetchone()
                 return dict(row) if row else None
     except psycopg2.Error as e:
@@ -767,14 +969,22 @@ def find_meta_by_meta_ts(meta_message_ts):
 #         return {"slack_ids": [], "counts": []}
 
 
+MARK_FEEDBACK_REQUESTED = register(
+    "mark_feedback_requested",
+    "UPDATE tickets SET feedback_requested = TRUE WHERE id = %s AND feedback_requested = FALSE RETURNING id",
+)
+SAVE_RESOLVE_MESSAGE_TS = register("save_resolve_message_ts", "UPDATE tickets SET resolve_message_ts = %s WHERE id = %s")
+GET_RESOLVE_MESSAGE_TS = register("get_resolve_message_ts", "SELECT resolve_message_ts FROM tickets WHERE id = %s")
+SAVE_ERROR = register(
+    "save_error", "INSERT INTO error_logs (level, logger, message, full_trace) VALUES (%s, %s, %s, %s)",
+)
+
+
 def mark_feedback_requested(ticket_id) -> bool:
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE tickets SET feedback_requested = TRUE WHERE id = %s AND feedback_requested = FALSE RETURNING id",
-                    (ticket_id,),
-                )
+                statements.execute(cur, MARK_FEEDBACK_REQUESTED, (ticket_id,))
                 return cur.fetchone() is not None
     except psycopg2.Error as e:
         logging.error(f"mark_feedback_requested failed: {e}")
@@ -785,10 +995,7 @@ def save_resolve_message_ts(ticket_id, ts):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "UPDATE tickets SET resolve_message_ts = %s WHERE id = %s",
-                    (ts, ticket_id),
-                )
+                statements.execute(cur, SAVE_RESOLVE_MESSAGE_TS, (ts, ticket_id))
     except psycopg2.Error as e:
         logging.error(f"save_resolve_message_ts failed: {e}")
 
@@ -797,7 +1004,7 @@ def get_resolve_message_ts(ticket_id):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute("SELECT resolve_message_ts FROM tickets WHERE id = %s", (ticket_id,))
+                statements.execute(cur, GET_RESOLVE_MESSAGE_TS, (ticket_id,))
                 row = cur.fetchone()
                 return row[0] if row else None
     except psycopg2.Error as e:
@@ -809,9 +1016,23 @@ def save_error(level, logger, message, full_trace=None):
     try:
         with get_db() as conn:
             with conn.cursor() as cur:
-                cur.execute(
-                    "INSERT INTO error_logs (level, logger, message, full_trace) VALUES (%s, %s, %s, %s)",
-                    (level, logger, message, full_trace),
-                )
+                statements.execute(cur, SAVE_ERROR, (level, logger, message, full_trace))
     except psycopg2.Error:
         pass
+
+
+# Hot-path statements with sample parameters, EXPLAINed by `migrate.py --check-plans`.
+HOT_QUERIES = {
+    "find_ticket": (FIND_TICKET_SQL, ("0000000000.000000", "0000000000.000000")),
+    "edit_message": (EDIT_MESSAGE_SQL, ("", "0000000000.000000")),
+    "message_belongs_to_ticket": (MESSAGE_IN_TICKET_SQL, ("0000000000.000000", "0000000000.000000", 0)),
+    "get_dest_message_ts": (DEST_MESSAGE_TS_SQL, ("0000000000.000000",)),
+    "get_linked_message_ts": (ORIGIN_MESSAGE_TS_SQL, ("0000000000.000000",)),
+    "get_tickets_due_for_bump": (DUE_FOR_BUMP_SQL, ()),
+    "get_daily_ticket_stats": (DAILY_STATS_SQL, ()),
+}
+
+# Tables a hot query is expected to read in full (the daily counts aggregate all tickets).
+HOT_QUERY_FULL_SCANS = {
+    "get_daily_ticket_stats": {"tickets"},
+}
@@ -0,0 +1,134 @@
+# Same module as sw-ai/Source/db_pool.py (each service builds from its own
+# directory, see the README); change both together.
+import logging, threading
+from time import monotonic
+import psycopg2
+from psycopg2 import pool
+
+
+class HealthCheckedPool:
+    """ThreadedConnectionPool that only pings connections that sat idle.
+
+    A connection handed back less than `idle_check` seconds ago is trusted
+    (keepalives cover the socket); older ones get a `SELECT 1`. A dead
+    connection is discarded on its own and the next one, idle or freshly
+    opened, is tried instead. Checkouts block up to `timeout` for a free
+    slot rather than failing outright when all `maxconn` are in use.
+    """
+
+    def __init__(self, minconn: int, maxconn: int, idle_check: float, timeout: float, **dsn):
+        self.maxconn = maxconn
+        self.idle_check = idle_check
+        self.timeout = timeout
+        self._pool = pool.ThreadedConnectionPool(minconn, maxconn, **dsn)
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._returned: dict[int, float] = {}  # id(conn) -> monotonic time it was put back, idle ones only
+        self.in_use = 0
+        self.checkouts = 0
+        self.validations = 0
+        self.failed_validations = 0
+        self.reconnects = 0
+        self.timeouts = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        # Cycle the connections the pool opened up front so they are tracked as idle.
+        for conn in [self._pool.getconn() for _ in range(minconn)]:
+            self._returned[id(conn)] = monotonic()
+            self._pool.putconn(conn)
+
+    def _healthy(self, conn, force: bool) -> bool:
+        with self._lock:
+            returned = self._returned.pop(id(conn), None)
+        if conn.closed:
+            return False
+        if returned is None or (not force and monotonic() - returned < self.idle_check):
+            return True  # freshly opened, or used recently enough
+        with self._lock:
+            self.validations += 1
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error as e:
+            with self._lock:
+                self.failed_validations += 1
+            logging.warning(f"DB connection idle {monotonic() - returned:.0f}s failed validation: {e}")
+            return False
+
+    def getconn(self):
+        started = monotonic()
+        if not self._slots.acquire(timeout=self.timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise pool.PoolError(f"no DB connection free after {self.timeout:.0f}s")
+        waited = monotonic() - started
+        try:
+            force = False
+            for _ in range(self.maxconn + 1):
+                conn = self._pool.getconn()
+                if self._healthy(conn, force):
+                    break
+                # One dead connection usually means its idle siblings are too.
+                force = True
+                self._discard(conn)
+                with self._lock:
+                    self.reconnects += 1
+            else:
+                raise psycopg2.OperationalError("no healthy DB connection")
+        except BaseException:
+            self._slots.release()
+            raise
+        with self._lock:
+            self.in_use += 1
+            self.checkouts += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return conn
+
+    def _discard(self, conn):
+        with self._lock:
+            self._returned.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except pool.PoolError as e:
+            logging.warning(f"DB pool discard failed: {e}")
+
+    def putconn(self, conn, close: bool = False):
+        try:
+            if close or conn.closed:
+                self._discard(conn)
+            else:
+                with self._lock:
+                    self._returned[id(conn)] = monotonic()
+                self._pool.putconn(conn)
+                if conn.closed:
+                    # Above minconn the pool closes returned connections instead of keeping them.
+                    with self._lock:
+                        self._returned.pop(id(conn), None)
+        finally:
+            with self._lock:
+                self.in_use -= 1
+            self._slots.release()
+
+    def closeall(self):
+        with self._lock:
+            self._returned.clear()
+        self._pool.closeall()
+
+    def stats(self) -> dict:
+        with self._lock:
+            checkouts = self.checkouts
+            return {
+                "in_use": self.in_use,
+                "idle": len(self._returned),
+                "max": self.maxconn,
+                "checkouts": checkouts,
+                "validations": self.validations,
+                "failed_validations": self.failed_validations,
+                "reconnects": self.reconnects,
+                "timeouts": self.timeouts,
+                "wait_ms_avg": round(self.wait_total / checkouts * 1000, 2) if checkouts else 0,
+                "wait_ms_max": round(self.wait_max * 1000, 1),
+            }
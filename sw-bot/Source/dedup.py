@@ -0,0 +1,72 @@
+import json, logging, os, threading, time
+from collections import OrderedDict
+
+
+class Dedup:
+    """Remembers ids for `ttl` seconds in arrival order.
+
+    Entries live in an OrderedDict oldest-first, so expiry and the
+    `max_entries` cap only ever pop from the head: amortized O(1) per check.
+    Timestamps are wall-clock so `save`/`load` survive a restart, which is
+    when Slack redelivers events we already relayed.
+    """
+
+    def __init__(self, ttl: float, max_entries: int, path: str | None = None):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.path = path
+        self._seen: OrderedDict[str, float] = OrderedDict()
+        self._lock = threading.Lock()
+        self.duplicates = 0
+
+    def _prune(self, now: float):
+        seen = self._seen
+        while seen:
+            t = next(iter(seen.values()))
+            if now - t <= self.ttl and len(seen) <= self.max_entries:
+                break
+            seen.popitem(last=False)
+
+    def seen(self, key: str) -> bool:
+        now = time.time()
+        with self._lock:
+            self._prune(now)
+            if key in self._seen:
+                self.duplicates += 1
+                return True
+            self._seen[key] = now
+            return False
+
+    def __len__(self) -> int:
+        return len(self._seen)
+
+    def save(self):
+        if not self.path:
+            return
+        with self._lock:
+            self._prune(time.time())
+            entries = list(self._seen.items())
+        tmp = self.path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(entries, f)
+            os.replace(tmp, self.path)
+        except OSError as e:
+            logging.error(f"dedup save to {self.path} failed: {e}")
+
+    def load(self):
+        if not self.path or not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.error(f"dedup load from {self.path} failed: {e}")
+            return
+        now = time.time()
+        with self._lock:
+            for key, t in sorted(entries, key=lambda e: e[1]):
+                if now - t <= self.ttl and key not in self._seen:
+                    self._seen[key] = t
+            self._seen = OrderedDict(sorted(self._seen.items(), key=lambda e: e[1]))
+            self._prune(now)
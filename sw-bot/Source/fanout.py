@@ -0,0 +1,115 @@
+import logging, threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from time import perf_counter
+from globals import FANOUT_WORKERS
+
+_pool = ThreadPoolExecutor(max_workers=FANOUT_WORKERS, thread_name_prefix="fanout")
+_stats_lock = threading.Lock()
+_stats: dict[str, dict] = {}
+
+
+class DependencyFailed(Exception):
+    pass
+
+
+class FanOut:
+    """Runs a handler's Slack calls concurrently, ordering only declared dependencies.
+
+    `add(key, fn, after=(...))` schedules `fn` once every key in `after` has
+    finished; `fn` reads their results with `result(key)`. A step whose
+    dependency failed is skipped. Keys in `settled` only order the step: it
+    runs once they finish, whether or not they succeeded. Steps never wait
+    on each other from inside the pool, so nested handlers can't starve it.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self.started = perf_counter()
+        self._lock = threading.Lock()
+        self._futures: dict[str, Future] = {}
+        self._busy = 0.0
+
+    def add(self, key: str, fn, after: tuple = (), settled: tuple = ()) -> Future:
+        future = Future()
+        with self._lock:
+            unknown = [dep for dep in (*after, *settled) if dep not in self._futures]
+            if unknown:
+                raise KeyError(f"{self.name}.{key} depends on unknown steps {unknown}")
+            required = [self._futures[dep] for dep in after]
+            deps = required + [self._futures[dep] for dep in settled]
+            self._futures[key] = future
+        remaining = [len(deps)]
+
+        def launch():
+            failed = [d for d in required if d.exception() is not None]
+            if failed:
+                future.set_exception(DependencyFailed(f"{self.name}.{key} skipped: dependency failed"))
+            else:
+                _pool.submit(self._run, fn, future)
+
+        def on_dep_done(_):
+            with self._lock:
+                remaining[0] -= 1
+                ready = remaining[0] == 0
+            if ready:
+                launch()
+
+        if not deps:
+            launch()
+        for dep in deps:
+            dep.add_done_callback(on_dep_done)
+        return future
+
+    def _run(self, fn, future: Future):
+        if not future.set_running_or_notify_cancel():
+            return
+        started = perf_counter()
+        try:
+            future.set_result(fn())
+        except BaseException as e:
+            future.set_exception(e)
+        finally:
+            with self._lock:
+                self._busy += perf_counter() - started
+
+    def result(self, key: str):
+        return self._futures[key].result()
+
+    def wait(self):
+        """Block until every step settles, record latency, then re-raise the first real failure."""
+        error = None
+        for key, future in list(self._futures.items()):
+            e = future.exception()
+            if e is None or isinstance(e, DependencyFailed):
+                continue
+            if error is None:
+                error = e
+            else:
+                logging.warning(f"{self.name}.{key} failed: {e}")
+        _record(self.name, perf_counter() - self.started, self._busy)
+        if error is not None:
+            raise error
+
+
+def _record(name: str, elapsed: float, busy: float):
+    with _stats_lock:
+        st = _stats.setdefault(name, {"count": 0, "total": 0.0, "max": 0.0, "busy": 0.0, "last": 0.0})
+        st["count"] += 1
+        st["total"] += elapsed
+        st["busy"] += busy
+        st["max"] = max(st["max"], elapsed)
+        st["last"] = elapsed
+
+
+def stats() -> dict:
+    with _stats_lock:
+        return {
+            name: {
+                "count": st["count"],
+                "avg_ms": round(st["total"] / st["count"] * 1000),
+                "max_ms": round(st["max"] * 1000),
+                "last_ms": round(st["last"] * 1000),
+                "serial_ms": round(st["busy"] / st["count"] * 1000),
+            }
+            for name, st in _stats.items()
+        }
@@ -1,14 +1,19 @@
 import os
 import sys
-from slack_sdk import WebClient
 from dotenv import load_dotenv
+from ratelimit import RateLimitedClient
 
 load_dotenv()
 
 BOT_TOKEN = os.getenv("SLACK_BOT_TOKEN")
 SIGNING_SECRET = os.getenv("SLACK_SIGNING_SECRET")
 
-client = WebClient(token=BOT_TOKEN)
+client = RateLimitedClient(token=BOT_TOKEN)
+try:
+    from slack_sdk.web.async_client import AsyncWebClient
+    async_client = AsyncWebClient(token=BOT_TOKEN)
+except ImportError:  # aiohttp not installed; views are opened through the sync client instead
+    async_client = None
 REMINDERS_CHANNEL = os.getenv("REMINDER_CHANNEL_ID", "C09TTRZH94Z")
 APP_ID = os.getenv("APP_ID")
 ANNOUNCE_META = os.getenv("ANNOUNCE_META", "false").lower() == "true"
@@ -23,12 +28,48 @@ DB_PASSWORD = os.getenv("DB_PASSWORD")
 DB_USER = os.getenv("DB_USER")
 DB_PORT = int(os.getenv("DB_PORT", "5432"))
 DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_IDLE_CHECK = float(os.getenv("DB_IDLE_CHECK", "30"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+# Server-side prepared statements need a direct or session-pooled connection; turn off behind pgbouncer in transaction mode.
+DB_PREPARED_STATEMENTS = os.getenv("DB_PREPARED_STATEMENTS", "true").lower() == "true"
 ENVIRONMENT = os.getenv("ENVIRONMENT", "PRODUCTION")
 OPEN_TICKET_REACTION = os.getenv("OPEN_TICKET_REACTION", "frog-diabolical")
 ERROR_DM_USER = os.getenv("ERROR_DM_USER", "")
 TASK_JOURNAL_PATH = os.getenv("TASK_JOURNAL_PATH", "task_journal.jsonl")
+TASK_JOURNAL_FSYNC = os.getenv("TASK_JOURNAL_FSYNC", "interval").lower()
+TASK_JOURNAL_FSYNC_INTERVAL = float(os.getenv("TASK_JOURNAL_FSYNC_INTERVAL", "1.0"))
+TASK_JOURNAL_SEGMENT_BYTES = int(os.getenv("TASK_JOURNAL_SEGMENT_BYTES", str(4 * 1024 * 1024)))
+TASK_JOURNAL_COMPACT_BYTES = int(os.getenv("TASK_JOURNAL_COMPACT_BYTES", str(16 * 1024 * 1024)))
+TASK_JOURNAL_COMPACT_AGE = float(os.getenv("TASK_JOURNAL_COMPACT_AGE", "3600"))
 CACHE_SNAPSHOT_PATH = os.getenv("CACHE_SNAPSHOT_PATH", "cache_snapshot.json")
+CACHE_STORE_PATH = os.getenv("CACHE_STORE_PATH", "cache_store.db")
+CACHE_FLUSH_INTERVAL = float(os.getenv("CACHE_FLUSH_INTERVAL", "5"))
+PRELOAD_CLOSED_DAYS = int(os.getenv("PRELOAD_CLOSED_DAYS", "7"))
+PRELOAD_CLOSED_MAX = int(os.getenv("PRELOAD_CLOSED_MAX", "1000"))
+CACHE_MAX_TICKETS = int(os.getenv("CACHE_MAX_TICKETS", "5000"))
+CACHE_MAX_USERS = int(os.getenv("CACHE_MAX_USERS", "10000"))
+CACHE_MAX_FEEDBACK = int(os.getenv("CACHE_MAX_FEEDBACK", "2000"))
+CACHE_MAX_METAS = int(os.getenv("CACHE_MAX_METAS", "1000"))
+PROFILE_CACHE_MAX = int(os.getenv("PROFILE_CACHE_MAX", "5000"))
+PROFILE_CACHE_TTL = float(os.getenv("PROFILE_CACHE_TTL", "3600"))
+PERMALINK_CACHE_MAX = int(os.getenv("PERMALINK_CACHE_MAX", "2000"))
 PORT = int(os.getenv("PORT", "3000"))
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "20"))
+AI_JOB_WORKERS = int(os.getenv("AI_JOB_WORKERS", "4"))
+AI_JOB_QUEUE_MAX = int(os.getenv("AI_JOB_QUEUE_MAX", "200"))
+FILE_RELAY_WORKERS = int(os.getenv("FILE_RELAY_WORKERS", "4"))
+FANOUT_WORKERS = int(os.getenv("FANOUT_WORKERS", "16"))
+PURGE_CONCURRENCY = int(os.getenv("PURGE_CONCURRENCY", "4"))
+PURGE_CHECKPOINT_PATH = os.getenv("PURGE_CHECKPOINT_PATH", "purge_checkpoint.json")
+SEEN_EVENTS_PATH = os.getenv("SEEN_EVENTS_PATH", "seen_events.json")
+SEEN_EVENTS_MAX = int(os.getenv("SEEN_EVENTS_MAX", "50000"))
+INGRESS_LANES = int(os.getenv("INGRESS_LANES", "8"))
+INGRESS_WORKERS = int(os.getenv("INGRESS_WORKERS", "8"))
+INGRESS_QUEUE_MAX = int(os.getenv("INGRESS_QUEUE_MAX", "500"))
+INGRESS_DRAIN_TIMEOUT = float(os.getenv("INGRESS_DRAIN_TIMEOUT", "20"))
+FILE_RELAY_MEMORY_MAX = int(os.getenv("FILE_RELAY_MEMORY_MAX", str(20 * 1024 * 1024)))
+WRITE_WORKERS = int(os.getenv("WRITE_WORKERS", "4"))
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "100"))
 
 MACROS = {
     "fraud": "Hey there!\nThe shipwrights team cannot help you with this query. Please forward any related questions to <@U091HC53CE8>.",
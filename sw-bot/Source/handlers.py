@@ -1,15 +1,17 @@
 import json
 import logging
 from time import monotonic
-import ai, blocks, db, errors, relay, views, worker
+import ai_jobs, blocks, cache_store, db, errors, fanout, http_client, permalinks, preload, relay, statements, task_journal, views, worker
 from slack_sdk.errors import SlackApiError
 from cache import cache
+from ingress import ingress
+from profiles import profiles
 from globals import (
     ADMINS, CANNOT_CLOSE_OWN, ALREADY_CLAIMED, ERROR_DM_USER, META_CHANNEL,
-    OPEN_TICKET_REACTION, STAFF_CHANNEL, TICKET_CLAIMED, USER_CHANNEL, client,
+    OPEN_TICKET_REACTION, STAFF_CHANNEL, TICKET_CLAIMED, USER_CHANNEL, async_client, client,
 )
 from helpers import (
-    get_user_info, is_shipwright, respond,
+    get_user_info, is_shipwright, respond, seen_events,
     show_edit_modal, show_feedback_modal, show_unauthorized_close,
 )
 
@@ -26,24 +28,48 @@ def _handle_admin_dm(event: dict) -> None:
         )
 
 
-def handle_cache_dump_view(payload: dict) -> None:
+def _cache_dump_data() -> dict:
     now = monotonic()
-    data = {
+    return {
         "bot_user_id": cache.bot_user_id,
         "sticky_message_ts": cache.sticky_message_ts,
         "meta_sticky_ts": cache.meta_sticky_ts,
-        "tickets": dict(cache.tickets),
-        "ticket_users": dict(cache.ticket_users),
-        "feedback": {k: len(v) for k, v in cache.feedback.items()},
+        "tickets": cache.tickets.to_dict(),
+        "ticket_users": cache.ticket_users.to_dict(),
+        "feedback": {k: len(v) for k, v in cache.feedback.to_dict().items()},
         "meta_count": len(cache.metas),
         "shipwrights": list(cache.shipwrights),
         "ignorable_count": len(cache.ignorable),
         "deleted_headers_count": len(cache.deleted_headers),
         "closed_notified_count": len(cache.closed_notified),
+        "ts_index_count": len(cache.ts_index),
+        "missing_ts_count": len(cache.missing_ts),
+        "seen_events_count": len(seen_events),
+        "duplicate_events": seen_events.duplicates,
         "metrics": dict(cache.metrics),
         "fetch_ages": {k: int(now - t) for k, t in cache.fetch_times.items()},
+        "stores": {**{store.name: store.stats() for store in cache.stores()}, "profiles": profiles.stats(), "permalinks": permalinks.stats()},
+        "write_queue": worker.writer.stats(),
+        "journal": task_journal.journal.stats(),
+        "db_pool": db.pool_stats(),
+        "db_statements": statements.stats(),
+        "snapshot": cache_store.store.stats(),
+        "preload": preload.stats(),
+        "http": http_client.stats(),
+        "ai_jobs": ai_jobs.jobs.stats(),
+        "file_relay": relay.file_relay_stats(),
+        "handlers": fanout.stats(),
+        "slack": client.rate_stats(),
+        "ingress": ingress.stats(),
     }
-    client.views_open(trigger_id=payload["trigger_id"], view=views.cache_dump(data))
+
+
+def handle_cache_dump_view(payload: dict) -> None:
+    client.views_open(trigger_id=payload["trigger_id"], view=views.cache_dump(_cache_dump_data()))
+
+
+async def handle_cache_dump_view_async(payload: dict) -> None:
+    await async_client.views_open(trigger_id=payload["trigger_id"], view=views.cache_dump(_cache_dump_data()))
 
 
 def handle_message(event: dict) -> None:
@@ -79,7 +105,7 @@ def handle_message(event: dict) -> None:
 def handle_send_paraphrased(payload: dict) -> None:
     action_value = json.loads(payload["actions"][0]["value"])
     user_id = payload["user"]["id"]
-    user_info = get_user_info(client, user_id)
+    user_info = get_user_info(user_id)
     ticket_id = action_value["ticket_id"]
     paraphrased = action_value["paraphrased"]
     ticket = cache.get_ticket_by_id(ticket_id)
@@ -137,7 +163,7 @@ def handle_resolve_detected(payload: dict) -> None:
     ticket = cache.get_ticket_by_id(ticket_id)
     if not ticket:
         return
-    user_info = get_user_info(client, user_id)
+    user_info = get_user_info(user_id)
     if ticket["status"] != "open":
         show_unauthorized_close(client, payload, "closing")
         return
@@ -150,7 +176,7 @@ def handle_resolve_detected(payload: dict) -> None:
     client.chat_postMessage(channel=STAFF_CHANNEL, thread_ts=ticket["staff_thread_ts"], text=reply, username=f"{user_info['username']} | AI Auto Detection", icon_url=user_info["pfp"])
     relay.swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION)
     if cache.get_user_opt_in(ticket["user_id"]):
-        ai.summarize_ticket(ticket_id)
+        ai_jobs.summarize(ticket_id)
 
 
 def handle_resolve_ticket(payload: dict) -> None:
@@ -174,7 +200,7 @@ def handle_resolve_ticket(payload: dict) -> None:
         relay.post_resolve_messages(client, ticket, ticket_id, user_id)
         relay.swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION)
         if cache.get_user_opt_in(ticket["user_id"]):
-            ai.summarize_ticket(ticket_id)
+            ai_jobs.summarize(ticket_id)
         return
     if is_owner and not is_sw:
         relay.delete_open_ticket_message(ticket)
@@ -182,7 +208,7 @@ def handle_resolve_ticket(payload: dict) -> None:
         relay.post_resolve_messages(client, ticket, ticket_id, user_id)
         relay.swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION)
         if cache.get_user_opt_in(ticket["user_id"]):
-            ai.summarize_ticket(ticket_id)
+            ai_jobs.summarize(ticket_id)
         client.chat_postMessage(channel=STAFF_CHANNEL, thread_ts=ticket["staff_thread_ts"], text="", blocks=blocks.claim_ticket_prompt(ticket_id))
         return
     show_unauthorized_close(client, payload, "closing")
@@ -338,3 +364,9 @@ def handle_view_error(payload: dict) -> None:
     error_id = payload["actions"][0]["value"]
     full = errors.error_store.get(error_id, "Error details not found (may have been cleared on restart).")
     client.views_open(trigger_id=payload["trigger_id"], view=blocks.error_modal(full))
+
+
+async def handle_view_error_async(payload: dict) -> None:
+    error_id = payload["actions"][0]["value"]
+    full = errors.error_store.get(error_id, "Error details not found (may have been cleared on restart).")
+    await async_client.views_open(trigger_id=payload["trigger_id"], view=blocks.error_modal(full))
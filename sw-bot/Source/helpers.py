@@ -1,31 +1,23 @@
-import re, requests as http_requests
+import re
 from collections import defaultdict
 from datetime import datetime, timedelta
 from threading import Lock
-from time import monotonic
-import views
-from globals import APP_ID
+import http_client, views
+from dedup import Dedup
+from globals import APP_ID, SEEN_EVENTS_MAX, SEEN_EVENTS_PATH
+from profiles import profiles
 
 rate_limits: defaultdict = defaultdict(list)
 rate_lock = Lock()
 MAX_REQS = 30
 WINDOW = 60
 
-seen_events: dict[str, float] = {}
-seen_lock = Lock()
 SEEN_TTL = 300.0
+seen_events = Dedup(SEEN_TTL, SEEN_EVENTS_MAX, SEEN_EVENTS_PATH)
 
 
 def seen_already(event_id: str) -> bool:
-    now = monotonic()
-    with seen_lock:
-        if event_id in seen_events:
-            return True
-        seen_events[event_id] = now
-        expired = [k for k, t in seen_events.items() if now - t > SEEN_TTL]
-        for k in expired:
-            del seen_events[k]
-        return False
+    return seen_events.seen(event_id)
 
 
 def check_rate(ip: str) -> bool:
@@ -50,14 +42,9 @@ def show_feedback_modal(client, body, ticket_id):
     client.views_open(trigger_id=body["trigger_id"], view=views.show_rating_form(ticket_id))
 
 
-def get_user_info(client, user_id):
-    result = client.users_info(user=user_id)
-    if result["ok"]:
-        profile = result["user"]["profile"]
-        username = profile.get("display_name") or profile.get("real_name") or result["user"].get("name")
-        pfp = profile.get("image_192")
-        return {"username": username, "pfp": pfp}
-    return None
+def get_user_info(user_id):
+    profile = profiles.get(user_id)
+    return {"username": profile["name"], "pfp": profile["image_192"]}
 
 
 def is_shipwright(user_id) -> bool:
@@ -94,4 +81,4 @@ def parse_slack_link(link: str):
 
 
 def respond(response_url: str, text: str) -> None:
-    http_requests.post(response_url, json={"text": text, "response_type": "ephemeral"}, timeout=5)
+    http_client.post("response_url", response_url, json={"text": text, "response_type": "ephemeral"})
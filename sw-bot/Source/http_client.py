@@ -0,0 +1,184 @@
+import logging, random, threading, time
+from bisect import bisect_left
+from time import monotonic, perf_counter
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import NewConnectionError
+from globals import HTTP_POOL_SIZE
+
+logger = logging.getLogger("http_client")
+
+LATENCY_BUCKETS_MS = (10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000)
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS"}
+
+
+class CircuitOpenError(requests.RequestException):
+    pass
+
+
+class Endpoint:
+    """Per-upstream settings: (connect, read) timeout, retry budget and breaker thresholds."""
+
+    def __init__(
+        self, name: str, connect_timeout: float, read_timeout: float, retries: int = 2,
+        backoff: float = 0.25, failure_threshold: int = 5, cooldown: float = 30.0,
+    ):
+        self.name = name
+        self.timeout = (connect_timeout, read_timeout)
+        self.retries = retries
+        self.backoff = backoff
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._lock = threading.Lock()
+        self.failures = 0
+        self.opened_at: float | None = None
+        self.probing = False
+        self.trips = 0
+        self.calls = 0
+        self.errors = 0
+        self.retried = 0
+        self.rejected = 0
+        self.buckets = [0] * (len(LATENCY_BUCKETS_MS) + 1)
+        self.latency_total = 0.0
+
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half_open" if monotonic() - self.opened_at >= self.cooldown else "open"
+
+    def allow(self) -> bool:
+        """Closed: let everything through. Half-open: a single trial request at a time."""
+        with self._lock:
+            state = self.state()
+            if state == "open" or (state == "half_open" and self.probing):
+                self.rejected += 1
+                return False
+            self.probing = state == "half_open"
+            return True
+
+    def record(self, elapsed: float, ok: bool):
+        ms = elapsed * 1000
+        with self._lock:
+            self.probing = False
+            self.calls += 1
+            self.latency_total += ms
+            self.buckets[bisect_left(LATENCY_BUCKETS_MS, ms)] += 1
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.errors += 1
+            self.failures += 1
+            if self.failures >= self.failure_threshold and self.state() != "open":
+                if self.opened_at is None:
+                    logger.warning(f"circuit for {self.name} opened after {self.failures} failures")
+                self.opened_at = monotonic()
+                self.trips += 1
+
+    def percentile(self, q: float) -> int | None:
+        total = sum(self.buckets)
+        if not total:
+            return None
+        target = total * q
+        seen = 0
+        for i, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return LATENCY_BUCKETS_MS[i] if i < len(LATENCY_BUCKETS_MS) else None
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            calls = self.calls
+            return {
+                "state": self.state(),
+                "calls": calls,
+                "errors": self.errors,
+                "retried": self.retried,
+                "rejected": self.rejected,
+                "trips": self.trips,
+                "avg_ms": round(self.latency_total / calls, 1) if calls else 0,
+                "p50_ms": self.percentile(0.5),
+                "p99_ms": self.percentile(0.99),
+                "histogram": dict(zip([f"<={b}" for b in LATENCY_BUCKETS_MS] + ["inf"], self.buckets)),
+            }
+
+
+ENDPOINTS = {
+    "ai": Endpoint("ai", 3.05, 15),
+    "slack_files": Endpoint("slack_files", 3.05, 60),
+    "response_url": Endpoint("response_url", 3.05, 5, retries=1),
+}
+
+session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=len(ENDPOINTS), pool_maxsize=HTTP_POOL_SIZE, max_retries=0)
+session.mount("https://", _adapter)
+session.mount("http://", _adapter)
+
+
+def _not_sent(error: Exception | None) -> bool:
+    """True if the request failed before it could have reached the server."""
+    if isinstance(error, requests.ConnectTimeout):
+        return True
+    return isinstance(error, requests.ConnectionError) and \
+        isinstance(getattr(error.args[0] if error.args else None, "reason", None), NewConnectionError)
+
+
+def _retryable(method: str, error: Exception | None, status: int | None) -> bool:
+    if method not in IDEMPOTENT_METHODS:
+        # A dropped connection may come after the server got the POST; only retry what it never saw.
+        return _not_sent(error) or status == 429
+    return isinstance(error, (requests.ConnectionError, requests.Timeout)) or status in RETRY_STATUSES
+
+
+def request(endpoint: str, method: str, url: str, **kwargs) -> requests.Response:
+    """Send a request through the shared keep-alive session.
+
+    Retries with full-jitter backoff: connection failures, timeouts and 5xx
+    for idempotent methods, but only failures to connect (and 429) for
+    anything else. Raises CircuitOpenError without touching the network
+    while the endpoint's breaker is open, and lets a single trial request
+    through once it is half-open.
+    """
+    ep = ENDPOINTS[endpoint]
+    method = method.upper()
+    kwargs.setdefault("timeout", ep.timeout)
+    for attempt in range(ep.retries + 1):
+        if not ep.allow():
+            raise CircuitOpenError(f"{endpoint} circuit open")
+        started = perf_counter()
+        error = None
+        resp = None
+        try:
+            resp = session.request(method, url, **kwargs)
+        except requests.RequestException as e:
+            error = e
+        status = resp.status_code if resp is not None else None
+        ep.record(perf_counter() - started, error is None and (status is None or status < 500))
+        if attempt < ep.retries and _retryable(method, error, status):
+            delay = random.uniform(0, ep.backoff * (2 ** attempt))
+            retry_after = resp.headers.get("Retry-After", "") if resp is not None else ""
+            if retry_after.isdigit():
+                delay = max(delay, int(retry_after))
+            if resp is not None:
+                resp.close()
+            with ep._lock:
+                ep.retried += 1
+            time.sleep(delay)
+            continue
+        if error is not None:
+            raise error
+        return resp
+
+
+def get(endpoint: str, url: str, **kwargs) -> requests.Response:
+    return request(endpoint, "GET", url, **kwargs)
+
+
+def post(endpoint: str, url: str, **kwargs) -> requests.Response:
+    return request(endpoint, "POST", url, **kwargs)
+
+
+def stats() -> dict:
+    return {name: ep.stats() for name, ep in ENDPOINTS.items()}
@@ -0,0 +1,251 @@
+import asyncio, json, logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from cache import cache
+from globals import INGRESS_DRAIN_TIMEOUT, INGRESS_LANES, INGRESS_QUEUE_MAX, INGRESS_WORKERS, USER_CHANNEL
+
+logger = logging.getLogger("ingress")
+
+# Block actions whose value names a ticket, so they serialize with that ticket's messages.
+TICKET_ACTIONS = {"resolve_ticket", "reopen_ticket", "claim_ticket", "submit_feedback", "resolve_detected"}
+
+
+# Lane keys are the ticket's user thread ts. That thread is its own root from
+# the very first message, before the ticket exists, so the key never changes
+# once the ticket is created or indexed. Staff threads and ticket actions are
+# mapped onto it through the ticket, which may mean a DB lookup: both key
+# functions must run off the event loop.
+
+def event_key(event: dict):
+    ts = event.get("thread_ts") or event.get("previous_message", {}).get("thread_ts") or \
+        event.get("previous_message", {}).get("ts") or event.get("ts")
+    if ts and event.get("channel") != USER_CHANNEL:
+        ticket = cache.find_ticket_by_ts(ts)
+        if ticket and ticket.get("user_thread_ts"):
+            ts = ticket["user_thread_ts"]
+    return ("thread", ts)
+
+
+def action_key(payload: dict):
+    action = payload["actions"][0]
+    if action["action_id"] not in TICKET_ACTIONS:
+        return None
+    try:
+        value = json.loads(action["value"])
+    except (KeyError, ValueError):
+        return None
+    ticket_id = value.get("ticket_id") if isinstance(value, dict) else value
+    if ticket_id is None:
+        return None
+    ticket = cache.get_ticket_by_id(ticket_id)
+    if ticket and ticket.get("user_thread_ts"):
+        return ("thread", ticket["user_thread_ts"])
+    return ("ticket", ticket_id)
+
+
+class _Kind:
+    __slots__ = ("count", "failed", "wait_total", "run_total", "run_max")
+
+    def __init__(self):
+        self.count = 0
+        self.failed = 0
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+
+class _Lane:
+    __slots__ = ("queue", "handled", "busy", "wait_total", "run_total", "run_max")
+
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.handled = 0
+        self.busy = False
+        self.wait_total = 0.0
+        self.run_total = 0.0
+        self.run_max = 0.0
+
+
+class Ingress:
+    """Bounded asyncio pipeline between the Slack endpoints and the handlers.
+
+    Keyed jobs (one ticket, or one thread before it has a ticket) are hashed
+    onto INGRESS_LANES ordered lanes, each drained by a single worker, so a
+    ticket's events run one at a time in arrival order while different
+    tickets run in parallel. Unkeyed jobs go to a shared queue drained by
+    INGRESS_WORKERS. Jobs whose lane needs a lookup go through `route`,
+    which keeps them in arrival order. Endpoints ack as soon as `submit` or
+    `route` accepts a job; once INGRESS_QUEUE_MAX jobs are pending they
+    return False so they can answer 503 and let Slack retry. `stop` does
+    the same for new jobs while it drains the ones already acked.
+    """
+
+    def __init__(self, lanes: int, workers: int, queue_max: int):
+        self.lane_count = max(1, lanes)
+        self.workers = max(1, workers)
+        self.queue_max = max(1, queue_max)
+        self._lanes: list[_Lane] = []
+        self._shared: asyncio.Queue | None = None
+        self._routing: asyncio.Queue | None = None
+        self._pool = ThreadPoolExecutor(max_workers=self.lane_count + self.workers, thread_name_prefix="ingress")
+        self._tasks: list[asyncio.Task] = []
+        self._stats_lock = threading.Lock()
+        self._kinds: dict[str, _Kind] = {}
+        self._stopping = False
+        self.rejected = 0
+
+    def start(self):
+        if self._tasks:
+            return
+        self._lanes = [_Lane() for _ in range(self.lane_count)]
+        self._shared = asyncio.Queue()
+        self._routing = asyncio.Queue()
+        self._tasks = [asyncio.create_task(self._sequence())]
+        self._tasks += [asyncio.create_task(self._drain(lane.queue, lane)) for lane in self._lanes]
+        self._tasks += [asyncio.create_task(self._drain(self._shared, None)) for _ in range(self.workers)]
+
+    async def stop(self, timeout: float = INGRESS_DRAIN_TIMEOUT):
+        self._stopping = True
+        if self._shared is not None:
+            deadline = monotonic() + timeout
+            try:
+                # Routing first: routed jobs move onto the shared queue or their lanes from there.
+                for queue in [self._routing, self._shared, *(lane.queue for lane in self._lanes)]:
+                    await asyncio.wait_for(queue.join(), max(0.0, deadline - monotonic()))
+            except asyncio.TimeoutError:
+                pass
+            dropped = self.depth()
+            if dropped:
+                logger.warning(f"ingress stopped after {timeout:g}s with {dropped} acked jobs still queued, dropping them")
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await asyncio.to_thread(self._pool.shutdown, wait=True)
+
+    def _admit(self, kind: str) -> bool:
+        if self._shared is None:
+            raise RuntimeError("ingress not started")
+        if self._stopping:
+            self.rejected += 1
+            return False
+        if self.depth() >= self.queue_max:
+            self.rejected += 1
+            logger.warning(f"ingress queue full ({self.queue_max}), rejecting {kind}")
+            return False
+        return True
+
+    def _put(self, kind: str, handler, payload, key, enqueued_at: float):
+        queue = self._shared if key is None else self._lanes[hash(key) % self.lane_count].queue
+        queue.put_nowait((kind, handler, payload, enqueued_at))
+
+    def submit(self, kind: str, handler, payload, key=None) -> bool:
+        if not self._admit(kind):
+            return False
+        self._put(kind, handler, payload, key, monotonic())
+        return True
+
+    def route(self, kind: str, payload, resolve) -> bool:
+        """Queue a job whose handler and key need parsing or a lookup.
+
+        `resolve(payload)` runs on a thread and returns (handler, payload,
+        key), or None to drop the job. Lookups run concurrently, but a single
+        sequencer hands jobs to their lanes in the order `route` accepted
+        them, so a slow lookup can't let a later event for the same ticket
+        overtake an earlier one.
+        """
+        if not self._admit(kind):
+            return False
+        lookup = asyncio.ensure_future(asyncio.to_thread(resolve, payload))
+        self._routing.put_nowait((kind, lookup, monotonic()))
+        return True
+
+    async def _sequence(self):
+        while True:
+            kind, lookup, enqueued_at = await self._routing.get()
+            try:
+                job = await lookup
+            except Exception as e:
+                job = None
+                logger.exception(f"routing {kind} failed: {e}")
+                self._record(kind, None, monotonic() - enqueued_at, 0.0, False)
+            if job is not None:
+                handler, payload, key = job
+                self._put(kind, handler, payload, key, enqueued_at)
+            self._routing.task_done()
+
+    async def _drain(self, queue: asyncio.Queue, lane: _Lane | None):
+        loop = asyncio.get_running_loop()
+        while True:
+            kind, handler, payload, enqueued_at = await queue.get()
+            started = monotonic()
+            ok = True
+            if lane:
+                lane.busy = True
+            try:
+                if asyncio.iscoroutinefunction(handler):
+                    await handler(payload)
+                else:
+                    await loop.run_in_executor(self._pool, handler, payload)
+            except Exception as e:
+                ok = False
+                logger.exception(f"{kind} handler {getattr(handler, '__name__', handler)} failed: {e}")
+            finally:
+                queue.task_done()
+            self._record(kind, lane, started - enqueued_at, monotonic() - started, ok)
+
+    def _record(self, kind: str, lane: _Lane | None, waited: float, ran: float, ok: bool):
+        with self._stats_lock:
+            st = self._kinds.setdefault(kind, _Kind())
+            st.count += 1
+            st.failed += 0 if ok else 1
+            st.wait_total += waited
+            st.run_total += ran
+            st.run_max = max(st.run_max, ran)
+            if lane:
+                lane.busy = False
+                lane.handled += 1
+                lane.wait_total += waited
+                lane.run_total += ran
+                lane.run_max = max(lane.run_max, ran)
+
+    def depth(self) -> int:
+        shared = self._shared.qsize() if self._shared else 0
+        routing = self._routing.qsize() if self._routing else 0
+        return shared + routing + sum(lane.queue.qsize() for lane in self._lanes)
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            kinds = {
+                kind: {
+                    "count": st.count,
+                    "failed": st.failed,
+                    "wait_ms_avg": round(st.wait_total / st.count * 1000, 1),
+                    "run_ms_avg": round(st.run_total / st.count * 1000, 1),
+                    "run_ms_max": round(st.run_max * 1000, 1),
+                }
+                for kind, st in sorted(self._kinds.items())
+            }
+            lanes = [
+                {
+                    "depth": lane.queue.qsize(),
+                    "busy": lane.busy,
+                    "handled": lane.handled,
+                    "wait_ms_avg": round(lane.wait_total / lane.handled * 1000, 1) if lane.handled else 0,
+                    "run_ms_max": round(lane.run_max * 1000, 1),
+                }
+                for lane in self._lanes
+            ]
+        return {
+            "depth": self.depth(),
+            "max": self.queue_max,
+            "workers": self.workers,
+            "shared_depth": self._shared.qsize() if self._shared else 0,
+            "routing_depth": self._routing.qsize() if self._routing else 0,
+            "lanes": lanes,
+            "rejected": self.rejected,
+            "kinds": kinds,
+        }
+
+
+ingress = Ingress(INGRESS_LANES, INGRESS_WORKERS, INGRESS_QUEUE_MAX)
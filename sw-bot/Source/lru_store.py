@@ -0,0 +1,173 @@
+import sys, threading
+from collections import OrderedDict
+from time import monotonic
+
+
+def approx_size(obj, depth: int = 0) -> int:
+    size = sys.getsizeof(obj)
+    if depth >= 4:
+        return size
+    if isinstance(obj, dict):
+        size += sum(approx_size(k, depth + 1) + approx_size(v, depth + 1) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(approx_size(item, depth + 1) for item in obj)
+    return size
+
+
+class LRUStore:
+    """Size-capped LRU map with optional per-entry TTL.
+
+    Entries matching `evict_first` (e.g. closed tickets) are evicted before
+    anything else once the store is over `max_entries`. With `track_changes`
+    every key written or dropped since the last `take_changes` is remembered,
+    so snapshots only persist what changed.
+    """
+
+    def __init__(self, name: str, max_entries: int, ttl: float | None = None, evict_first=None, on_evict=None):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.evict_first = evict_first
+        self.on_evict = on_evict
+        self._dirty: set | None = None
+        self._lock = threading.RLock()
+        self._entries: OrderedDict = OrderedDict()  # key -> [value, expires_at, size]
+        self._preferred: OrderedDict = OrderedDict()  # keys to evict first, LRU order
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def track_changes(self):
+        with self._lock:
+            if self._dirty is None:
+                self._dirty = set()
+
+    def mark_dirty(self, key):
+        """Flag an entry whose value was mutated in place."""
+        if self._dirty is not None:
+            with self._lock:
+                self._dirty.add(key)
+
+    def take_changes(self, encode) -> tuple[dict, list]:
+        """Return ({key: encode(value)}, [removed keys]) since the last call and reset."""
+        with self._lock:
+            if not self._dirty:
+                return {}, []
+            dirty, self._dirty = self._dirty, set()
+            now = monotonic()
+            upserts, removed = {}, []
+            try:
+                for key in dirty:
+                    entry = self._entries.get(key)
+                    if entry is None or (entry[1] is not None and now >= entry[1]):
+                        removed.append(key)
+                    else:
+                        upserts[key] = encode(entry[0])
+            except Exception:
+                self._dirty |= dirty
+                raise
+            return upserts, removed
+
+    def _drop(self, key):
+        value, _, size = self._entries.pop(key)
+        self._preferred.pop(key, None)
+        self.bytes -= size
+        if self._dirty is not None:
+            self._dirty.add(key)
+        if self.on_evict:
+            self.on_evict(key, value)
+        return value
+
+    def _live(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and monotonic() >= entry[1]:
+            self._drop(key)
+            self.expirations += 1
+            return None
+        return entry
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._live(key)
+            if entry is None:
+                self.misses += 1
+                return default
+            self.hits += 1
+            self._entries.move_to_end(key)
+            if key in self._preferred:
+                self._preferred.move_to_end(key)
+            return entry[0]
+
+    def peek(self, key, default=None):
+        with self._lock:
+            entry = self._live(key)
+            return default if entry is None else entry[0]
+
+    def put(self, key, value, ttl: float | None = None, dirty: bool = True):
+        ttl = self.ttl if ttl is None else ttl
+        size = approx_size(value)
+        with self._lock:
+            if dirty and self._dirty is not None:
+                self._dirty.add(key)
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.bytes -= old[2]
+            self._entries[key] = [value, monotonic() + ttl if ttl is not None else None, size]
+            self.bytes += size
+            if self.evict_first and self.evict_first(value):
+                self._preferred[key] = None
+                self._preferred.move_to_end(key)
+            else:
+                self._preferred.pop(key, None)
+            while len(self._entries) > self.max_entries:
+                victim = next(iter(self._preferred)) if self._preferred else next(iter(self._entries))
+                self._drop(victim)
+                self.evictions += 1
+
+    def pop(self, key, default=None):
+        with self._lock:
+            if key not in self._entries:
+                return default
+            value, _, size = self._entries.pop(key)
+            self._preferred.pop(key, None)
+            self.bytes -= size
+            if self._dirty is not None:
+                self._dirty.add(key)
+            return value
+
+    def clear(self):
+        with self._lock:
+            if self._dirty is not None:
+                self._dirty.update(self._entries)
+            self._entries.clear()
+            self._preferred.clear()
+            self.bytes = 0
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return self._live(key) is not None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def to_dict(self) -> dict:
+        with self._lock:
+            now = monotonic()
+            return {k: e[0] for k, e in self._entries.items() if e[1] is None or now < e[1]}
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else None,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "bytes": self.bytes,
+        }
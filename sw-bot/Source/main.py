@@ -1,20 +1,22 @@
 import json, logging, os, threading
 from contextlib import asynccontextmanager
 from urllib.parse import parse_qs
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException, Request
+import asyncio
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.responses import JSONResponse
-from slack_sdk.signature import SignatureVerifier
-import alerts, cache_store, errors, raffle, summary, worker
+import alerts, cache_store, errors, permalinks, preload, purge, raffle, relay, signing, summary, task_journal, worker
 from cache import cache
-from globals import ENVIRONMENT, ERROR_DM_USER, PORT, SIGNING_SECRET, client
+from profiles import profiles
+from globals import ENVIRONMENT, ERROR_DM_USER, PORT, SIGNING_SECRET, async_client, client
 from handlers import (
-    handle_cache_dump_view, handle_claim_ticket, handle_create_meta, handle_delete_message,
+    handle_cache_dump_view, handle_cache_dump_view_async, handle_claim_ticket, handle_create_meta, handle_delete_message,
     handle_delete_meta, handle_edit_message, handle_edited_message, handle_message,
     handle_meta_command, handle_modify_opt, handle_modify_votes, handle_open_create_meta,
     handle_rating_form, handle_reopen_ticket, handle_resolve_detected, handle_resolve_ticket,
-    handle_send_paraphrased, handle_submit_feedback, handle_view_error,
+    handle_send_paraphrased, handle_submit_feedback, handle_view_error, handle_view_error_async,
 )
-from helpers import seen_already
+from ingress import TICKET_ACTIONS, action_key, event_key, ingress
+from helpers import seen_already, seen_events
 
 logging.basicConfig(
     level=logging.INFO,
@@ -25,7 +27,7 @@ dm_handler = errors.SlackDMErrorHandler(level=logging.ERROR)
 dm_handler.setFormatter(logging.Formatter("%(asctime)s %(name)s: %(message)s"))
 logging.getLogger().addHandler(dm_handler)
 
-verifier = SignatureVerifier(SIGNING_SECRET)
+verifier = signing.Verifier(SIGNING_SECRET)
 
 COMMAND_HANDLERS = {
     "/metasw" if ENVIRONMENT == "PRODUCTION" else "/metastaging": handle_meta_command,
@@ -48,6 +50,13 @@ ACTION_HANDLERS = {
     "view_error": handle_view_error,
 }
 
+# Handlers that only open a modal: awaited straight on the event loop through
+# AsyncWebClient so the 3s trigger_id never waits behind queued relays.
+ASYNC_ACTION_HANDLERS = {
+    "open_cache_dump": handle_cache_dump_view_async,
+    "view_error": handle_view_error_async,
+} if async_client else {}
+
 VIEW_HANDLERS = {
     "edited_message": handle_edited_message,
     "rating_form": handle_rating_form,
@@ -57,14 +66,19 @@ VIEW_HANDLERS = {
 
 @asynccontextmanager
 async def lifespan(_: FastAPI):
-    cache.bot_user_id = client.auth_test()["user_id"]
+    auth = client.auth_test()
+    cache.bot_user_id = auth["user_id"]
+    permalinks.set_workspace_url(auth.get("url"))
     cache_store.load(cache)
+    preload.start(wait_for=cache_store.store.restored)
+    seen_events.load()
     if ERROR_DM_USER:
         try:
             client.chat_postMessage(channel=ERROR_DM_USER, text="Bot redeployed and online.")
         except Exception as e:
             logging.error(f"Failed to send redeploy DM: {e}")
     worker.load_and_replay()
+    purge.resume_pending(relay.finish_purge)
     worker.task_runner.enqueue_meta_sticky_update()
     for target, name in [
         (summary.reminders_loop, "reminders"),
@@ -73,9 +87,14 @@ async def lifespan(_: FastAPI):
         (worker.task_runner.run, "worker"),
     ]:
         threading.Thread(target=target, daemon=True, name=name).start()
+    threading.Thread(target=cache_store.store.flush_loop, args=(cache,), daemon=True, name="cache-flush").start()
+    ingress.start()
     yield
+    await ingress.stop()
     cache_store.save(cache)
-    logging.info("Cache saved on shutdown")
+    seen_events.save()
+    logging.info("Cache flushed on shutdown")
+    task_journal.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -84,9 +103,9 @@ app = FastAPI(lifespan=lifespan)
 async def verified_body(request: Request) -> bytes:
     body = await request.body()
     if not verifier.is_valid(
-        body=body.decode(),
-        timestamp=request.headers.get("X-Slack-Request-Timestamp", ""),
-        signature=request.headers.get("X-Slack-Signature", ""),
+        body,
+        request.headers.get("X-Slack-Request-Timestamp"),
+        request.headers.get("X-Slack-Signature"),
     ):
         raise HTTPException(status_code=401)
     return body
@@ -97,28 +116,54 @@ async def health():
     return {"status": "ok"}
 
 
-@app.post("/slack/events")
-async def slack_events(background: BackgroundTasks, request: Request):
-    body = await request.body()
+def _accepted(ok: bool) -> JSONResponse:
+    if not ok:
+        return JSONResponse({"error": "busy"}, status_code=503)
+    return JSONResponse({})
+
+
+_spawned: set = set()
+
+
+def _spawn(kind: str, handler, payload):
+    async def run():
+        try:
+            await handler(payload)
+        except Exception as e:
+            logging.exception(f"{kind} handler {handler.__name__} failed: {e}")
+    task = asyncio.create_task(run())
+    _spawned.add(task)
+    task.add_done_callback(_spawned.discard)
+
+
+def route_event(body: bytes):
+    """Parse a verified Events API body off the event loop and pick its handler and lane."""
     payload = json.loads(body)
-    if payload.get("type") == "url_verification":
-        return JSONResponse({"challenge": payload["challenge"]})
-    if not verifier.is_valid(
-        body=body.decode(),
-        timestamp=request.headers.get("X-Slack-Request-Timestamp", ""),
-        signature=request.headers.get("X-Slack-Signature", ""),
-    ):
-        raise HTTPException(status_code=401)
     event = payload.get("event", {})
-    if event.get("type") == "message":
+    if event.get("type") == "user_change":
+        profiles.update(event.get("user", {}))
+    elif event.get("type") == "message":
         msg_id = event.get("client_msg_id") or event.get("event_ts") or ""
         if not seen_already(msg_id):
-            background.add_task(handle_message, event)
-    return JSONResponse({})
+            return handle_message, event, event_key(event)
+    return None
+
+
+def route_action(handler):
+    return lambda payload: (handler, payload, action_key(payload))
+
+
+@app.post("/slack/events")
+async def slack_events(body: bytes = Depends(verified_body)):
+    if b'"url_verification"' in body:
+        payload = json.loads(body)
+        if payload.get("type") == "url_verification":
+            return JSONResponse({"challenge": payload["challenge"]})
+    return _accepted(ingress.route("message", body, route_event))
 
 
 @app.post("/slack/actions")
-async def slack_actions(background: BackgroundTasks, body: bytes = Depends(verified_body)):
+async def slack_actions(body: bytes = Depends(verified_body)):
     try:
         form = parse_qs(body.decode())
         payload = json.loads(form["payload"][0])
@@ -127,23 +172,30 @@ async def slack_actions(background: BackgroundTasks, body: bytes = Depends(verif
         return JSONResponse({})
     ptype = payload.get("type")
     if ptype == "block_actions":
-        handler = ACTION_HANDLERS.get(payload["actions"][0]["action_id"])
+        action_id = payload["actions"][0]["action_id"]
+        if action_id in ASYNC_ACTION_HANDLERS:
+            _spawn(f"action:{action_id}", ASYNC_ACTION_HANDLERS[action_id], payload)
+            return JSONResponse({})
+        handler = ACTION_HANDLERS.get(action_id)
         if handler:
-            background.add_task(handler, payload)
+            if action_id in TICKET_ACTIONS:
+                return _accepted(ingress.route(f"action:{action_id}", payload, route_action(handler)))
+            return _accepted(ingress.submit(f"action:{action_id}", handler, payload))
     elif ptype == "view_submission":
-        handler = VIEW_HANDLERS.get(payload["view"]["callback_id"])
+        callback_id = payload["view"]["callback_id"]
+        handler = VIEW_HANDLERS.get(callback_id)
         if handler:
-            background.add_task(handler, payload)
+            return _accepted(ingress.submit(f"view:{callback_id}", handler, payload))
     return JSONResponse({})
 
 
 @app.post("/slack/command")
-async def slack_command(background: BackgroundTasks, body: bytes = Depends(verified_body)):
+async def slack_command(body: bytes = Depends(verified_body)):
     form = parse_qs(body.decode())
     data = {k: v[0] for k, v in form.items()}
     handler = COMMAND_HANDLERS.get(data.get("command", ""))
     if handler:
-        background.add_task(handler, data)
+        return _accepted(ingress.submit(f"command:{data['command']}", handler, data))
     return JSONResponse({})
 
 
@@ -0,0 +1,60 @@
+import logging, threading
+from globals import PERMALINK_CACHE_MAX, client
+from lru_store import LRUStore
+
+store = LRUStore("permalinks", PERMALINK_CACHE_MAX)
+_lock = threading.Lock()
+_stats_lock = threading.Lock()
+workspace_url: str | None = None
+synthesized = 0
+api_lookups = 0
+
+
+def set_workspace_url(url: str | None):
+    """Record the workspace base URL from auth.test, e.g. https://hackclub.slack.com/."""
+    global workspace_url
+    if url:
+        workspace_url = url if url.endswith("/") else f"{url}/"
+
+
+def _ensure_workspace_url():
+    if workspace_url:
+        return
+    with _lock:
+        if workspace_url:
+            return
+        try:
+            set_workspace_url(client.auth_test().get("url"))
+        except Exception as e:
+            logging.warning(f"permalinks: auth_test failed, falling back to chat.getPermalink: {e}")
+
+
+def build(channel: str, ts: str) -> str | None:
+    """Inverse of helpers.parse_slack_link for top-level messages."""
+    if not workspace_url:
+        return None
+    return f"{workspace_url}archives/{channel}/p{ts.replace('.', '')}"
+
+
+def get(channel: str, ts: str) -> str:
+    global synthesized, api_lookups
+    _ensure_workspace_url()
+    link = build(channel, ts)
+    if link:
+        with _stats_lock:
+            synthesized += 1
+        return link
+    key = (channel, ts)
+    link = store.get(key)
+    if link is None:
+        with _stats_lock:
+            api_lookups += 1
+        link = client.chat_getPermalink(channel=channel, message_ts=ts)["permalink"]
+        store.put(key, link)
+    return link
+
+
+def stats() -> dict:
+    with _stats_lock:
+        counters = {"synthesized": synthesized, "api_lookups": api_lookups}
+    return {**store.stats(), **counters}
@@ -0,0 +1,67 @@
+import logging, threading
+from time import perf_counter
+import db
+from cache import cache
+from globals import PRELOAD_CLOSED_DAYS, PRELOAD_CLOSED_MAX
+
+logger = logging.getLogger("preload")
+
+_stats: dict = {"state": "pending"}
+
+
+def run(wait_for: threading.Event | None = None):
+    """Warm the cache from the DB in a handful of set-based queries.
+
+    Waits for the snapshot restore first (if given) and only fills what it
+    left empty, so entries changed since the snapshot are never replaced.
+    Open tickets go in last so they're the most recently used.
+    """
+    if wait_for is not None:
+        wait_for.wait()
+    _stats["state"] = "running"
+    started = perf_counter()
+    timings = {}
+    try:
+        t = perf_counter()
+        closed = db.get_recently_closed_tickets(PRELOAD_CLOSED_DAYS, PRELOAD_CLOSED_MAX)
+        opened = db.get_open_tickets()
+        timings["tickets_ms"] = round((perf_counter() - t) * 1000)
+
+        t = perf_counter()
+        opt_ins = db.get_ticket_user_opt_ins(sorted({ticket["user_id"] for ticket in opened + closed}))
+        timings["opt_ins_ms"] = round((perf_counter() - t) * 1000)
+
+        t = perf_counter()
+        shipwrights = cache.get_shipwrights()
+        timings["shipwrights_ms"] = round((perf_counter() - t) * 1000)
+
+        added = cache.preload_tickets(list(reversed(closed)) + opened)
+        added_opt_ins = cache.preload_opt_ins(opt_ins)
+    except Exception as e:
+        _stats.update(state="failed", error=str(e))
+        logger.exception(f"preload failed: {e}")
+        return
+    _stats.update(
+        state="done",
+        ms=round((perf_counter() - started) * 1000),
+        open=len(opened),
+        closed=len(closed),
+        tickets_added=added,
+        opt_ins=len(opt_ins),
+        opt_ins_added=added_opt_ins,
+        shipwrights=len(shipwrights),
+        **timings,
+    )
+    logger.info(
+        f"preloaded {len(opened)} open and {len(closed)} closed tickets ({added} new), "
+        f"{len(opt_ins)} opt-ins ({added_opt_ins} new), {len(shipwrights)} shipwrights "
+        f"in {_stats['ms']}ms ({timings})"
+    )
+
+
+def start(wait_for: threading.Event | None = None):
+    threading.Thread(target=run, args=(wait_for,), daemon=True, name="preload").start()
+
+
+def stats() -> dict:
+    return dict(_stats)
@@ -0,0 +1,80 @@
+import logging, threading
+from concurrent.futures import ThreadPoolExecutor
+from time import monotonic
+from slack_sdk.errors import SlackApiError
+from globals import PROFILE_CACHE_MAX, PROFILE_CACHE_TTL, client
+from lru_store import LRUStore
+from single_flight import SingleFlight
+
+REFRESH_AHEAD = 0.8  # refresh in the background once an entry is 80% through its TTL
+
+
+def _profile_from_user(user: dict) -> dict:
+    profile = user.get("profile", {})
+    return {
+        "name": profile.get("display_name") or profile.get("real_name") or user.get("name"),
+        "image_48": profile.get("image_48"),
+        "image_192": profile.get("image_192"),
+        "fetched_at": monotonic(),
+    }
+
+
+class ProfileCache:
+    """users.info results keyed by user id, bounded by LRU and TTL.
+
+    Hits past REFRESH_AHEAD of the TTL are served from cache while a single
+    background refresh replaces the entry, so hot users never block on Slack.
+    """
+
+    def __init__(self, max_entries: int, ttl: float):
+        self.ttl = ttl
+        self.store = LRUStore("profiles", max_entries, ttl=ttl)
+        self._flight = SingleFlight()
+        self._refresher = ThreadPoolExecutor(max_workers=1, thread_name_prefix="profile-refresh")
+        self._refreshing: set[str] = set()
+        self._lock = threading.Lock()
+        self.refreshes = 0
+        self.invalidations = 0
+
+    def _load(self, user_id: str) -> dict:
+        profile = _profile_from_user(client.users_info(user=user_id)["user"])
+        self.store.put(user_id, profile)
+        return profile
+
+    def _refresh(self, user_id: str):
+        try:
+            self._flight.do(user_id, lambda: self._load(user_id))
+            with self._lock:
+                self.refreshes += 1
+        except SlackApiError as e:
+            logging.warning(f"profile refresh for {user_id} failed: {e}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(user_id)
+
+    def get(self, user_id: str) -> dict:
+        profile = self.store.get(user_id)
+        if profile is None:
+            return self._flight.do(user_id, lambda: self._load(user_id))
+        if monotonic() - profile["fetched_at"] >= self.ttl * REFRESH_AHEAD:
+            with self._lock:
+                if user_id in self._refreshing:
+                    return profile
+                self._refreshing.add(user_id)
+            self._refresher.submit(self._refresh, user_id)
+        return profile
+
+    def update(self, user: dict):
+        if not user.get("id") or user["id"] not in self.store:
+            return
+        with self._lock:
+            self.invalidations += 1
+        self.store.put(user["id"], _profile_from_user(user))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = {"refreshes": self.refreshes, "invalidations": self.invalidations}
+        return {**self.store.stats(), **counters}
+
+
+profiles = ProfileCache(PROFILE_CACHE_MAX, PROFILE_CACHE_TTL)
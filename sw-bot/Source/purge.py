@@ -0,0 +1,194 @@
+import json, logging, os, queue, threading, time
+from concurrent.futures import ThreadPoolExecutor
+from slack_sdk.errors import SlackApiError
+import ratelimit
+from cache import cache
+from globals import PURGE_CHECKPOINT_PATH, PURGE_CONCURRENCY, STAFF_CHANNEL, USER_CHANNEL, client
+
+PAGE_SIZE = 200
+PROGRESS_EVERY = 3.0
+MAX_PASSES = 3
+_DONE = object()
+
+_checkpoint_lock = threading.Lock()
+_active: set = set()
+_active_lock = threading.Lock()
+
+
+def _load_checkpoints() -> dict:
+    try:
+        with open(PURGE_CHECKPOINT_PATH, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, json.JSONDecodeError) as e:
+        logging.error(f"purge checkpoint load failed: {e}")
+        return {}
+
+
+def _save_checkpoint(ticket_id, state: dict | None):
+    with _checkpoint_lock:
+        data = _load_checkpoints()
+        if state is None:
+            data.pop(str(ticket_id), None)
+        else:
+            data[str(ticket_id)] = state
+        tmp = PURGE_CHECKPOINT_PATH + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump(data, f)
+            os.replace(tmp, PURGE_CHECKPOINT_PATH)
+        except OSError as e:
+            logging.error(f"purge checkpoint save failed: {e}")
+
+
+class Purge:
+    """Deletes every reply in a ticket's user thread.
+
+    One thread pages conversations.replies into a bounded queue while
+    PURGE_CONCURRENCY workers delete from it. All calls go through the
+    client's background lane, so they share chat.delete's Tier 3 budget and
+    yield to interactive relays. A progress message in the staff thread is
+    edited as it goes, and the running state is checkpointed so a restart
+    picks the purge back up.
+    """
+
+    def __init__(self, ticket: dict, user_id: str, event_ts: str, state: dict | None = None):
+        self.ticket = ticket
+        self.user_id = user_id
+        self.event_ts = event_ts
+        state = state or {}
+        self.deleted = state.get("deleted", 0)
+        self.failed: set = set(state.get("failed", []))
+        self.progress_ts = state.get("progress_ts")
+        self.started = time.monotonic()
+        self._lock = threading.Lock()
+        self._progress_lock = threading.Lock()
+        self._last_progress = 0.0
+
+    def state(self) -> dict:
+        return {
+            "ticket_id": self.ticket["id"],
+            "user_id": self.user_id,
+            "event_ts": self.event_ts,
+            "progress_ts": self.progress_ts,
+            "deleted": self.deleted,
+            "failed": sorted(self.failed),
+        }
+
+    def _progress(self, text: str, force: bool = False):
+        if not self._progress_lock.acquire(blocking=force):
+            return
+        try:
+            now = time.monotonic()
+            if not force and now - self._last_progress < PROGRESS_EVERY:
+                return
+            self._last_progress = now
+            try:
+                if self.progress_ts:
+                    client.chat_update(channel=STAFF_CHANNEL, ts=self.progress_ts, text=text)
+                else:
+                    self.progress_ts = client.chat_postMessage(
+                        channel=STAFF_CHANNEL, thread_ts=self.ticket["staff_thread_ts"], text=text,
+                    )["ts"]
+            except SlackApiError as e:
+                logging.warning(f"purge progress update failed: {e}")
+            _save_checkpoint(self.ticket["id"], self.state())
+        finally:
+            self._progress_lock.release()
+
+    def _status(self) -> str:
+        elapsed = time.monotonic() - self.started
+        return f":wastebasket: Purging user thread… {self.deleted} deleted, {len(self.failed)} failed ({elapsed:.0f}s)"
+
+    @ratelimit.in_background
+    def _fetch(self, pages: queue.Queue):
+        header_ts = self.ticket["user_thread_ts"]
+        cursor = None
+        try:
+            while True:
+                kwargs = {"channel": USER_CHANNEL, "ts": header_ts, "limit": PAGE_SIZE}
+                if cursor:
+                    kwargs["cursor"] = cursor
+                result = client.conversations_replies(**kwargs)
+                for msg in result.get("messages", []):
+                    if msg["ts"] != header_ts and msg["ts"] not in self.failed:
+                        pages.put(msg["ts"])
+                cursor = result.get("response_metadata", {}).get("next_cursor")
+                if not cursor:
+                    break
+        finally:
+            for _ in range(PURGE_CONCURRENCY):
+                pages.put(_DONE)
+
+    @ratelimit.in_background
+    def _delete_loop(self, pages: queue.Queue) -> int:
+        seen = 0
+        while True:
+            ts = pages.get()
+            if ts is _DONE:
+                return seen
+            seen += 1
+            try:
+                client.chat_delete(channel=USER_CHANNEL, ts=ts)
+                with self._lock:
+                    self.deleted += 1
+            except SlackApiError as e:
+                if e.response.get("error") != "message_not_found":
+                    logging.warning(f"purge: chat_delete {ts} failed: {e.response.get('error')}")
+                    with self._lock:
+                        self.failed.add(ts)
+            except Exception as e:
+                logging.warning(f"purge: chat_delete {ts} failed: {e}")
+                with self._lock:
+                    self.failed.add(ts)
+            self._progress(self._status())
+
+    def run(self):
+        self._progress(self._status(), force=True)
+        for _ in range(MAX_PASSES):
+            pages: queue.Queue = queue.Queue(maxsize=PAGE_SIZE * 2)
+            with ThreadPoolExecutor(max_workers=PURGE_CONCURRENCY + 1, thread_name_prefix="purge") as pool:
+                fetcher = pool.submit(self._fetch, pages)
+                deleters = [pool.submit(self._delete_loop, pages) for _ in range(PURGE_CONCURRENCY)]
+                fetcher.result()
+                seen = sum(d.result() for d in deleters)
+            if not seen:
+                break
+        self._progress(f":wastebasket: Purged {self.deleted} messages ({len(self.failed)} could not be deleted).", force=True)
+        _save_checkpoint(self.ticket["id"], None)
+
+
+@ratelimit.in_background
+def _run(purge: Purge, on_done):
+    ticket_id = purge.ticket["id"]
+    try:
+        purge.run()
+        on_done(purge.ticket, purge.user_id, purge.event_ts, purge.deleted)
+    except Exception as e:
+        logging.exception(f"purge of ticket {ticket_id} failed, will resume on restart: {e}")
+    finally:
+        with _active_lock:
+            _active.discard(ticket_id)
+
+
+def start(ticket: dict, user_id: str, event_ts: str, on_done, state: dict | None = None) -> bool:
+    """Purge in the background, then call on_done(ticket, user_id, event_ts, deleted)."""
+    with _active_lock:
+        if ticket["id"] in _active:
+            return False
+        _active.add(ticket["id"])
+    purge = Purge(ticket, user_id, event_ts, state)
+    _save_checkpoint(ticket["id"], purge.state())
+    threading.Thread(target=_run, args=(purge, on_done), daemon=True, name=f"purge-{ticket['id']}").start()
+    return True
+
+
+def resume_pending(on_done):
+    for ticket_id, state in _load_checkpoints().items():
+        ticket = cache.get_ticket_by_id(int(ticket_id))
+        if not ticket:
+            _save_checkpoint(ticket_id, None)
+            continue
+        logging.info(f"purge: resuming ticket {ticket_id} ({state.get('deleted', 0)} already deleted)")
+        start(ticket, state["user_id"], state["event_ts"], on_done, state)
@@ -2,7 +2,7 @@ import logging, time
 from datetime import datetime
 import schedule
 from slack_sdk.errors import SlackApiError
-import blocks, db
+import blocks, db, ratelimit
 from globals import REMINDERS_CHANNEL, client
 
 scheduler = schedule.Scheduler()
@@ -45,6 +45,7 @@ def maybe_run_raffle():
 
 def raffle_loop():
     scheduler.every().day.at("09:00").do(maybe_run_raffle)
-    while True:
-        scheduler.run_pending()
-        time.sleep(60)
+    with ratelimit.background():
+        while True:
+            scheduler.run_pending()
+            time.sleep(60)
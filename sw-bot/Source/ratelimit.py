@@ -0,0 +1,196 @@
+import logging, threading
+from contextlib import contextmanager
+from functools import wraps
+from time import monotonic
+from slack_sdk import WebClient
+from slack_sdk.errors import SlackApiError
+
+logger = logging.getLogger("ratelimit")
+
+# Requests per minute for Slack's Web API tiers, per method and workspace.
+TIERS = {1: 1, 2: 20, 3: 50, 4: 100}
+METHOD_TIERS = {
+    "auth.test": 4,
+    "chat.delete": 3,
+    "chat.getPermalink": 4,
+    "chat.postEphemeral": 4,
+    "chat.update": 3,
+    "conversations.history": 3,
+    "conversations.replies": 3,
+    "files.completeUploadExternal": 4,
+    "files.getUploadURLExternal": 4,
+    "files.info": 4,
+    "reactions.add": 3,
+    "reactions.get": 3,
+    "reactions.remove": 2,
+    "users.info": 4,
+    "views.open": 4,
+    "views.publish": 4,
+    "views.update": 4,
+}
+DEFAULT_TIER = 3
+POST_MESSAGE_PER_MIN = 60  # chat.postMessage: ~1 per second per channel, short bursts allowed
+BACKGROUND_RESERVE = 0.25  # share of each bucket background callers leave for interactive ones
+MAX_429_RETRIES = 3
+
+INTERACTIVE = "interactive"
+BACKGROUND = "background"
+_local = threading.local()
+
+
+def priority() -> str:
+    return getattr(_local, "priority", INTERACTIVE)
+
+
+@contextmanager
+def background():
+    """Run the enclosed Slack calls in the background lane (alerts, bumps, purges)."""
+    previous = priority()
+    _local.priority = BACKGROUND
+    try:
+        yield
+    finally:
+        _local.priority = previous
+
+
+def in_background(fn):
+    @wraps(fn)
+    def wrapper(*args, **kwargs):
+        with background():
+            return fn(*args, **kwargs)
+    return wrapper
+
+
+class Bucket:
+    def __init__(self, per_minute: float, burst: int):
+        self.rate = per_minute / 60.0
+        self.capacity = float(max(1, burst))
+        self.tokens = self.capacity
+        self.updated = monotonic()
+        self.paused_until = 0.0
+        self.waiting = {INTERACTIVE: 0, BACKGROUND: 0}
+        self._cond = threading.Condition()
+
+    def _refill(self, now: float):
+        if now < self.paused_until:
+            return
+        self.tokens = min(self.capacity, self.tokens + (now - max(self.updated, self.paused_until)) * self.rate)
+        self.updated = now
+
+    def acquire(self, lane: str) -> float:
+        started = monotonic()
+        with self._cond:
+            self.waiting[lane] += 1
+            try:
+                while True:
+                    now = monotonic()
+                    self._refill(now)
+                    floor = 1.0
+                    if lane == BACKGROUND:
+                        floor += self.capacity * BACKGROUND_RESERVE
+                    ready = now >= self.paused_until and self.tokens >= floor
+                    if ready and (lane == INTERACTIVE or not self.waiting[INTERACTIVE]):
+                        self.tokens -= 1
+                        return monotonic() - started
+                    if now < self.paused_until:
+                        timeout = self.paused_until - now
+                    else:
+                        timeout = max(0.01, (floor - self.tokens) / self.rate)
+                    self._cond.wait(timeout)
+            finally:
+                self.waiting[lane] -= 1
+                self._cond.notify_all()
+
+    def pause(self, seconds: float):
+        with self._cond:
+            self.paused_until = max(self.paused_until, monotonic() + seconds)
+            self.tokens = 0.0
+            self._cond.notify_all()
+
+
+class _MethodStats:
+    __slots__ = ("calls", "wait_total", "wait_max", "limited")
+
+    def __init__(self):
+        self.calls = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.limited = 0
+
+
+class RateLimitedClient(WebClient):
+    """WebClient that schedules every API call through per-method token buckets.
+
+    Buckets follow the method's Slack tier (chat.postMessage is bucketed per
+    channel). Interactive callers always go first; background callers wait
+    while interactive ones are queued and leave BACKGROUND_RESERVE of the
+    bucket untouched. 429s pause the bucket for Retry-After and are retried.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._buckets: dict[str, Bucket] = {}
+        self._buckets_lock = threading.Lock()
+        self._stats_lock = threading.Lock()
+        self._stats: dict[str, _MethodStats] = {}
+
+    def _bucket(self, api_method: str, kwargs: dict) -> Bucket:
+        key = api_method
+        if api_method == "chat.postMessage":
+            per_minute, burst = POST_MESSAGE_PER_MIN, 5
+            for source in ("json", "data", "params"):
+                channel = (kwargs.get(source) or {}).get("channel")
+                if channel:
+                    key = f"{api_method}:{channel}"
+                    break
+        else:
+            per_minute = TIERS[METHOD_TIERS.get(api_method, DEFAULT_TIER)]
+            burst = max(1, int(per_minute // 10))
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            with self._buckets_lock:
+                bucket = self._buckets.setdefault(key, Bucket(per_minute, burst))
+                self._stats.setdefault(api_method, _MethodStats())
+        return bucket
+
+    def api_call(self, api_method: str, **kwargs):
+        bucket = self._bucket(api_method, kwargs)
+        stats = self._stats[api_method]
+        lane = priority()
+        for attempt in range(MAX_429_RETRIES + 1):
+            waited = bucket.acquire(lane)
+            with self._stats_lock:
+                stats.calls += 1
+                stats.wait_total += waited
+                stats.wait_max = max(stats.wait_max, waited)
+            try:
+                return super().api_call(api_method, **kwargs)
+            except SlackApiError as e:
+                if e.response.status_code != 429 or attempt == MAX_429_RETRIES:
+                    raise
+                with self._stats_lock:
+                    stats.limited += 1
+                retry_after = float(e.response.headers.get("Retry-After", 1) or 1)
+                logger.warning(f"{api_method} rate limited, pausing {retry_after:.0f}s ({lane})")
+                bucket.pause(retry_after)
+
+    def rate_stats(self) -> dict:
+        with self._buckets_lock:
+            buckets = list(self._buckets.values())
+        with self._stats_lock:
+            methods = {name: (st.calls, st.wait_total, st.wait_max, st.limited) for name, st in self._stats.items()}
+        return {
+            "waiting": {
+                lane: sum(b.waiting[lane] for b in buckets) for lane in (INTERACTIVE, BACKGROUND)
+            },
+            "methods": {
+                name: {
+                    "calls": calls,
+                    "wait_ms_avg": round(wait_total / calls * 1000, 1) if calls else 0,
+                    "wait_ms_max": round(wait_max * 1000, 1),
+                    "limited": limited,
+                }
+                for name, (calls, wait_total, wait_max, limited) in sorted(methods.items())
+            },
+        }
+
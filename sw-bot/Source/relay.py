@@ -1,27 +1,41 @@
-import logging, os, tempfile, time
+import logging, os, tempfile, threading, time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import requests
 from slack_sdk.errors import SlackApiError
-import ai, blocks, db, worker
+import ai_jobs, blocks, db, http_client, permalinks, purge, worker
 from cache import cache
+from fanout import FanOut
+from profiles import profiles
 from globals import (
     ADMINS, BOT_TOKEN, MACROS, OPEN_TICKET_REACTION,
     RESOLVE_MESSAGES, STAFF_CHANNEL, USER_CHANNEL, client,
-    OPEN_TICKETS_CHANNEL
+    OPEN_TICKETS_CHANNEL, FILE_RELAY_MEMORY_MAX, FILE_RELAY_WORKERS
 )
 # from helpers import get_stardance_project  # ship_certs
 from helpers import is_shipwright, parse_slack_link
 
+FILE_SHARE_POLL_DELAYS = (0.25, 0.5, 1.0, 2.0, 4.0)
+file_pool = ThreadPoolExecutor(max_workers=FILE_RELAY_WORKERS, thread_name_prefix="file-relay")
+file_stats_lock = threading.Lock()
+file_stats = {"files": 0, "failed": 0, "bytes": 0, "seconds": 0.0, "recent": deque(maxlen=5)}
 
-def swap_reactions(client_inst, ticket, add_name, remove_name):
+
+def _try_reaction(method, verb, name, channel, ts):
+    try:
+        method(channel=channel, timestamp=ts, name=name)
+    except SlackApiError as e:
+        logging.warning(f"{verb} {name} failed: {e}")
+
+
+def swap_reactions(client_inst, ticket, add_name, remove_name, fan=None):
+    own = fan is None
+    fan = fan or FanOut("swap_reactions")
     for channel, ts in [(STAFF_CHANNEL, ticket["staff_thread_ts"]), (USER_CHANNEL, ticket["user_thread_ts"])]:
-        try:
-            client_inst.reactions_add(channel=channel, timestamp=ts, name=add_name)
-        except SlackApiError as e:
-            logging.warning(f"reactions_add {add_name} failed: {e}")
-        try:
-            client_inst.reactions_remove(channel=channel, timestamp=ts, name=remove_name)
-        except SlackApiError as e:
-            logging.warning(f"reactions_remove {remove_name} failed: {e}")
+        fan.add(f"add:{channel}", lambda c=channel, t=ts: _try_reaction(client_inst.reactions_add, "reactions_add", add_name, c, t))
+        fan.add(f"remove:{channel}", lambda c=channel, t=ts: _try_reaction(client_inst.reactions_remove, "reactions_remove", remove_name, c, t))
+    if own:
+        fan.wait()
 
 
 def clear_reactions(ticket):
@@ -62,44 +76,89 @@ def post_resolve_messages(client_inst, ticket, ticket_id, user_id):
         )
 
 
-def send_files(event, dest_channel, dest_ts):
-    results = []
-    for f in event.get("files") or []:
-        url = f.get("url_private_download") or f.get("url_private")
-        if not url:
-            continue
-        name = f.get("name") or "file"
-        suffix = f".{name.split('.')[-1]}" if "." in name else ""
-        tmp_path = None
-        try:
-            fd, tmp_path = tempfile.mkstemp(suffix=suffix)
-            with requests.get(url, headers={"Authorization": f"Bearer {BOT_TOKEN}"}, stream=True) as r:
-                r.raise_for_status()
+def _find_share_ts(file_id, dest_channel):
+    for delay in FILE_SHARE_POLL_DELAYS:
+        time.sleep(delay)
+        shares = client.files_info(file=file_id).get("file", {}).get("shares", {})
+        for visibility in ("public", "private"):
+            chan_dict = shares.get(visibility, {})
+            if dest_channel in chan_dict:
+                return chan_dict[dest_channel][0]["ts"]
+    logging.warning(f"send_files: share ts for {file_id} not visible after {sum(FILE_SHARE_POLL_DELAYS):.1f}s")
+    return None
+
+
+def _record_transfer(name, size, elapsed):
+    with file_stats_lock:
+        file_stats["files"] += 1
+        file_stats["bytes"] += size
+        file_stats["seconds"] += elapsed
+        file_stats["recent"].append({"name": name, "bytes": size, "ms": round(elapsed * 1000), "mbps": round(size / elapsed / 1e6, 2) if elapsed else 0})
+
+
+def _relay_file(f, dest_channel, dest_ts):
+    url = f.get("url_private_download") or f.get("url_private")
+    name = f.get("name") or "file"
+    suffix = f".{name.split('.')[-1]}" if "." in name else ""
+    in_memory = (f.get("size") or FILE_RELAY_MEMORY_MAX + 1) <= FILE_RELAY_MEMORY_MAX
+    tmp_path = None
+    started = time.perf_counter()
+    try:
+        with http_client.get("slack_files", url, headers={"Authorization": f"Bearer {BOT_TOKEN}"}, stream=True) as r:
+            r.raise_for_status()
+            if in_memory:
+                payload = r.content
+                size = len(payload)
+            else:
+                fd, tmp_path = tempfile.mkstemp(suffix=suffix)
+                size = 0
                 with os.fdopen(fd, "wb") as fout:
-                    for chunk in r.iter_content(chunk_size=8192):
+                    for chunk in r.iter_content(chunk_size=65536):
                         fout.write(chunk)
-            up = client.files_upload_v2(channel=dest_channel, thread_ts=dest_ts, filename=name, file=tmp_path)
-            new_ts = None
-            file_id = up.get("file", {}).get("id")
-            if file_id:
-                time.sleep(2)
-                info = client.files_info(file=file_id)
-                shares = info.get("file", {}).get("shares", {})
-                for visibility in ("public", "private"):
-                    chan_dict = shares.get(visibility, {})
-                    if dest_channel in chan_dict:
-                        new_ts = chan_dict[dest_channel][0]["ts"]
-                        break
-            results.append(new_ts)
-        except (OSError, requests.RequestException, SlackApiError) as e:
-            logging.error(f"send_files upload failed: {e}")
-        finally:
-            if tmp_path and os.path.exists(tmp_path):
-                try:
-                    os.unlink(tmp_path)
-                except OSError as e:
-                    logging.error(f"send_files unlink failed: {e}")
-    return results
+                        size += len(chunk)
+                payload = tmp_path
+        downloaded = time.perf_counter()
+        up = client.files_upload_v2(channel=dest_channel, thread_ts=dest_ts, filename=name, file=payload)
+        uploaded = time.perf_counter()
+        _record_transfer(name, size, uploaded - started)
+        logging.info(
+            f"send_files {name}: {size} bytes, download {(downloaded - started) * 1000:.0f}ms, "
+            f"upload {(uploaded - downloaded) * 1000:.0f}ms, {size / (uploaded - started) / 1e6:.2f} MB/s"
+            f"{'' if in_memory else ' (spooled to disk)'}"
+        )
+        file_id = up.get("file", {}).get("id")
+        return _find_share_ts(file_id, dest_channel) if file_id else None
+    except (OSError, requests.RequestException, SlackApiError) as e:
+        with file_stats_lock:
+            file_stats["failed"] += 1
+        logging.error(f"send_files upload failed: {e}")
+        return False
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            try:
+                os.unlink(tmp_path)
+            except OSError as e:
+                logging.error(f"send_files unlink failed: {e}")
+
+
+def file_relay_stats():
+    with file_stats_lock:
+        return {
+            "files": file_stats["files"],
+            "failed": file_stats["failed"],
+            "mb": round(file_stats["bytes"] / 1e6, 2),
+            "mbps": round(file_stats["bytes"] / file_stats["seconds"] / 1e6, 2) if file_stats["seconds"] else 0,
+            "recent": list(file_stats["recent"]),
+        }
+
+
+def send_files(event, dest_channel, dest_ts):
+    files = [f for f in event.get("files") or [] if f.get("url_private_download") or f.get("url_private")]
+    if len(files) == 1:
+        results = [_relay_file(files[0], dest_channel, dest_ts)]
+    else:
+        results = list(file_pool.map(lambda f: _relay_file(f, dest_channel, dest_ts), files))
+    return [ts for ts in results if ts is not False]
 
 
 # def post_project_block(ticket, project):  # ship_certs
@@ -186,31 +245,38 @@ def _handle_question(event, ticket, user_id, staff_name, staff_avatar, text, fil
 
 
 def _handle_macro(event, ticket, user_id, staff_name, staff_avatar, thread, macro_key):
-    resp = client.chat_postMessage(
+    fan = FanOut("macro")
+    reply = fan.add("reply", lambda: client.chat_postMessage(
         channel=USER_CHANNEL,
         thread_ts=ticket["user_thread_ts"],
         text=MACROS[macro_key],
         username=f"{staff_name} | Shipwrights Team",
         icon_url=staff_avatar,
-    )
-    dest_ts = resp["ts"]
-    worker.enqueue(db.save_message, ticket["id"], user_id, staff_name, staff_avatar, MACROS[macro_key], True, None, dest_ts, event["ts"])
-    client.chat_postEphemeral(
+    ))
+    fan.add("controls", lambda: client.chat_postEphemeral(
         channel=STAFF_CHANNEL, user=user_id, thread_ts=thread,
-        text="Message sent.", blocks=blocks.sent_message_controls(dest_ts),
-    )
-    worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
-    delete_open_ticket_message(ticket)
+        text="Message sent.", blocks=blocks.sent_message_controls(fan.result("reply")["ts"]),
+    ), after=("reply",))
+    if reply.exception() is not None:
+        fan.wait()  # records the run and re-raises the failed reply; the ticket stays open
+    # Read before close_ticket clears it on the shared cached dict.
+    open_ts = ticket.get("open_ticket_message_ts")
+    fan.add("delete_open", lambda: delete_open_post(open_ts))
     cache.close_ticket(ticket["id"])
     cache.claim_ticket(ticket["id"], user_id)
-    close_resp = client.chat_postMessage(
+    fan.add("close_notice", lambda: client.chat_postMessage(
         channel=STAFF_CHANNEL,
         thread_ts=ticket["staff_thread_ts"],
         text=f"Hey! Would you look at that, This ticket was marked as resolved by <@{user_id}>!",
-    )
+    ))
+    fan.add("feedback", lambda: _send_resolve_feedback(ticket))
+    swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION, fan=fan)
+    dest_ts = fan.result("reply")["ts"]
+    worker.enqueue(db.save_message, ticket["id"], user_id, staff_name, staff_avatar, MACROS[macro_key], True, None, dest_ts, event["ts"])
+    worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
+    close_resp = fan.result("close_notice")
     worker.enqueue(db.save_message, ticket["id"], "BOT", "Shipwrighter", None, f"ticket resolved by <@{user_id}>", True, None, close_resp["ts"])
-    _send_resolve_feedback(ticket)
-    swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION)
+    fan.wait()
 
 
 def _handle_help(ticket, user_id):
@@ -237,35 +303,36 @@ def _handle_help(ticket, user_id):
 
 def _handle_tldr(event, ticket):
     worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
-    ai.summarize_ticket(ticket["id"])
+    ai_jobs.summarize(ticket["id"])
 
 
 def _handle_ai(event, ticket, user_id, staff_name, staff_avatar, text):
     clean_text = text.strip()[len("!ai"):].strip()
     worker.enqueue(db.save_message, ticket["id"], user_id, staff_name, staff_avatar, text, True, None, event.get("ts"))
     worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
-    ai.paraphrase_message(ticket["id"], clean_text)
+    ai_jobs.paraphrase(ticket["id"], clean_text)
 
 
 def delete_open_ticket_message(ticket):
-    if not OPEN_TICKETS_CHANNEL:
-        return
-    ts = ticket.get("open_ticket_message_ts")
-    if not ts:
+    delete_open_post(ticket.get("open_ticket_message_ts"))
+
+
+def delete_open_post(ts):
+    if not OPEN_TICKETS_CHANNEL or not ts:
         return
     try:
         client.chat_delete(channel=OPEN_TICKETS_CHANNEL, ts=ts)
     except SlackApiError as e:
         if e.response.get("error") != "message_not_found":
-            logging.warning(f"delete_open_ticket_message failed: {e}")
+            logging.warning(f"delete_open_post failed: {e}")
 
 
 def post_reopen_open_channel(ticket):
     if not OPEN_TICKETS_CHANNEL:
         return None
     try:
-        user_thread_link = client.chat_getPermalink(channel=USER_CHANNEL, message_ts=ticket["user_thread_ts"])["permalink"]
-        staff_thread_link = client.chat_getPermalink(channel=STAFF_CHANNEL, message_ts=ticket["staff_thread_ts"])["permalink"]
+        user_thread_link = ticket.get("user_thread_link") or permalinks.get(USER_CHANNEL, ticket["user_thread_ts"])
+        staff_thread_link = ticket.get("staff_thread_link") or permalinks.get(STAFF_CHANNEL, ticket["staff_thread_ts"])
         resp = client.chat_postMessage(
             channel=OPEN_TICKETS_CHANNEL,
             text=ticket.get("question", ""),
@@ -288,38 +355,45 @@ def post_reopen_open_channel(ticket):
 def _handle_reopen(event, ticket, user_id):
     if ticket["status"] != "closed":
         return
-    ts = post_reopen_open_channel(ticket)
-    cache.open_ticket(ticket["id"], ts)
-    client.chat_postMessage(
+    fan = FanOut("reopen")
+    fan.add("open_post", lambda: post_reopen_open_channel(ticket))
+    fan.add("user_notice", lambda: client.chat_postMessage(
         channel=USER_CHANNEL,
         thread_ts=ticket["user_thread_ts"],
         text=f"Hey it seems that this ticket was reopened by <@{user_id}>!",
-    )
-    resp = client.chat_postMessage(
+    ))
+    fan.add("staff_notice", lambda: client.chat_postMessage(
         channel=STAFF_CHANNEL,
         thread_ts=ticket["staff_thread_ts"],
         text=f"<@{user_id}> has reopened this ticket.",
-    )
+    ))
+    swap_reactions(client, ticket, OPEN_TICKET_REACTION, "checks-passed-octicon", fan=fan)
+    cache.open_ticket(ticket["id"], fan.result("open_post"))
+    resp = fan.result("staff_notice")
     worker.enqueue(db.save_message, ticket["id"], "BOT", "Shipwrighter", None, f"<@{user_id}> has reopened this ticket", True, None, resp["ts"])
     worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
-    swap_reactions(client, ticket, OPEN_TICKET_REACTION, "checks-passed-octicon")
+    fan.wait()
 
 
 def _handle_resolve(event, ticket, user_id):
     if ticket["status"] != "open":
         return
-    delete_open_ticket_message(ticket)
+    fan = FanOut("resolve")
+    open_ts = ticket.get("open_ticket_message_ts")
+    fan.add("delete_open", lambda: delete_open_post(open_ts))
     cache.close_ticket(ticket["id"])
     cache.claim_ticket(ticket["id"], user_id)
-    swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION)
-    resp = client.chat_postMessage(
+    swap_reactions(client, ticket, "checks-passed-octicon", OPEN_TICKET_REACTION, fan=fan)
+    fan.add("close_notice", lambda: client.chat_postMessage(
         channel=STAFF_CHANNEL,
         thread_ts=ticket["staff_thread_ts"],
         text=f"Hey! Would you look at that, This ticket was marked as resolved by <@{user_id}>!",
-    )
+    ))
+    fan.add("feedback", lambda: _send_resolve_feedback(ticket))
+    resp = fan.result("close_notice")
     worker.enqueue(db.save_message, ticket["id"], "BOT", "Shipwrighter", None, f"ticket closed by <@{user_id}>", True, None, resp["ts"])
     worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
-    _send_resolve_feedback(ticket)
+    fan.wait()
 
 
 def _handle_purge(event, ticket, user_id):
@@ -329,30 +403,19 @@ def _handle_purge(event, ticket, user_id):
             user=user_id, text="Only admins can use !purge.",
         )
         return
-    header_ts = ticket["user_thread_ts"]
-    deleted = 0
-    cursor = None
-    while True:
-        kwargs = {"channel": USER_CHANNEL, "ts": header_ts, "limit": 200}
-        if cursor:
-            kwargs["cursor"] = cursor
-        result = client.conversations_replies(**kwargs)
-        for msg in result.get("messages", []):
-            if msg["ts"] == header_ts:
-                continue
-            try:
-                client.chat_delete(channel=USER_CHANNEL, ts=msg["ts"])
-                deleted += 1
-            except SlackApiError:
-                pass
-        cursor = result.get("response_metadata", {}).get("next_cursor")
-        if not cursor:
-            break
+    if not purge.start(ticket, user_id, event["ts"], finish_purge):
+        client.chat_postEphemeral(
+            channel=STAFF_CHANNEL, thread_ts=ticket["staff_thread_ts"],
+            user=user_id, text="A purge is already running for this ticket.",
+        )
+
+
+def finish_purge(ticket, user_id, event_ts, deleted):
     delete_open_ticket_message(ticket)
     cache.close_ticket(ticket["id"])
     cache.claim_ticket(ticket["id"], user_id)
     clear_reactions(ticket)
-    worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event["ts"], name="white_check_mark")
+    worker.enqueue(client.reactions_add, channel=STAFF_CHANNEL, timestamp=event_ts, name="white_check_mark")
     client.chat_postEphemeral(
         channel=STAFF_CHANNEL, thread_ts=ticket["staff_thread_ts"],
         user=user_id, text=f"Purged {deleted} messages and closed ticket.",
@@ -432,9 +495,9 @@ def handle_staff_reply(event):
         return
 
     user_id = event["user"]
-    user_info_resp = client.users_info(user=user_id)
-    staff_name = user_info_resp["user"]["profile"].get("display_name") or user_info_resp["user"]["profile"].get("real_name")
-    staff_avatar = user_info_resp["user"]["profile"]["image_48"]
+    profile = profiles.get(user_id)
+    staff_name = profile["name"]
+    staff_avatar = profile["image_48"]
 
     # check_stardance(text, ticket)  # ship_certs
 
@@ -490,9 +553,9 @@ def handle_client_reply(event):
 
 
 
-    user_info_resp = client.users_info(user=user_id)
-    user_name = user_info_resp["user"]["profile"].get("display_name") or user_info_resp["user"]["profile"].get("real_name")
-    user_avatar = user_info_resp["user"]["profile"]["image_48"]
+    profile = profiles.get(user_id)
+    user_name = profile["name"]
+    user_avatar = profile["image_48"]
 
     file_info = [{"name": f.get("name"), "url": f.get("url_private"), "mimetype": f.get("mimetype"), "size": f.get("size")} for f in files] if files else None
 
@@ -514,6 +577,24 @@ def handle_client_reply(event):
     return True
 
 
+def _post_open_ticket(text, user_name, user_avatar, user_thread_link, staff_link):
+    if not OPEN_TICKETS_CHANNEL:
+        return None
+    try:
+        return client.chat_postMessage(
+            channel=OPEN_TICKETS_CHANNEL,
+            text=text,
+            username=user_name,
+            icon_url=user_avatar,
+            unfurl_links=False,
+            unfurl_media=False,
+            blocks=blocks.open_ticket_message_blocks(ticket_text=text, ticket_user_thread_link=user_thread_link, ticket_staff_thread_link=staff_link)
+        )["ts"]
+    except SlackApiError as e:
+        logging.warning(f"create_ticket: failed to post to open tickets channel: {e}")
+        return None
+
+
 def create_ticket(event):
     if event.get("thread_ts"):
         return
@@ -524,44 +605,40 @@ def create_ticket(event):
         return
 
     user_opt_in = cache.get_user_opt_in(user_id)
-    user_info_resp = client.users_info(user=user_id)
-    user_name = user_info_resp["user"]["profile"].get("display_name") or user_info_resp["user"]["profile"].get("real_name")
-    user_avatar = user_info_resp["user"]["profile"]["image_48"]
+    profile = profiles.get(user_id)
+    user_name = profile["name"]
+    user_avatar = profile["image_48"]
 
-    user_thread_link = client.chat_getPermalink(channel=USER_CHANNEL, message_ts=event["ts"])["permalink"]
+    user_thread_link = permalinks.get(USER_CHANNEL, event["ts"])
 
-    staff_msg = client.chat_postMessage(
+    fan = FanOut("create_ticket")
+    fan.add("staff_msg", lambda: client.chat_postMessage(
         channel=STAFF_CHANNEL,
         text=text,
         username=user_name,
         icon_url=user_avatar,
         blocks=blocks.ticket_staff_header(text, user_id, user_thread_link),
-    )
-
+    ))
     if files:
-        send_files(event, STAFF_CHANNEL, staff_msg["ts"])
-
-    staff_link = client.chat_getPermalink(channel=STAFF_CHANNEL, message_ts=staff_msg["ts"])["permalink"]
-
-    open_ticket_ts = None
-    if OPEN_TICKETS_CHANNEL:
-        try:
-            open_ticket_message = client.chat_postMessage(
-                channel=OPEN_TICKETS_CHANNEL,
-                text=text,
-                username=user_name,
-                icon_url=user_avatar,
-                unfurl_links=False,
-                unfurl_media=False,
-                blocks=blocks.open_ticket_message_blocks(ticket_text=text, ticket_user_thread_link=user_thread_link, ticket_staff_thread_link=staff_link)
-            )
-            open_ticket_ts = open_ticket_message["ts"]
-        except SlackApiError as e:
-            logging.warning(f"create_ticket: failed to post to open tickets channel: {e}")
-
-    ticket_id = db.save_ticket(user_id, user_name, user_avatar, text or "📎 attachment", event["ts"], staff_msg["ts"], open_ticket_ts)
+        fan.add("files", lambda: send_files(event, STAFF_CHANNEL, fan.result("staff_msg")["ts"]), after=("staff_msg",))
+    fan.add("staff_reaction", lambda: client.reactions_add(
+        channel=STAFF_CHANNEL, timestamp=fan.result("staff_msg")["ts"], name=OPEN_TICKET_REACTION,
+    ), after=("staff_msg",))
+    fan.add("open_post", lambda: _post_open_ticket(
+        text, user_name, user_avatar, user_thread_link, permalinks.get(STAFF_CHANNEL, fan.result("staff_msg")["ts"]),
+    ), after=("staff_msg",))
+
+    staff_msg = fan.result("staff_msg")
+    staff_link = permalinks.get(STAFF_CHANNEL, staff_msg["ts"])
+    open_ticket_ts = fan.result("open_post")
+
+    ticket_id = db.save_ticket(
+        user_id, user_name, user_avatar, text or "📎 attachment", event["ts"], staff_msg["ts"], open_ticket_ts,
+        user_thread_link, staff_link,
+    )
 
     if not ticket_id:
+        fan.wait()
         client.chat_delete(channel=STAFF_CHANNEL, ts=staff_msg["ts"])
         if open_ticket_ts:
             client.chat_delete(channel=OPEN_TICKETS_CHANNEL, ts=open_ticket_ts)
@@ -578,37 +655,39 @@ def create_ticket(event):
         "status": "open",
         "closed_by": None,
         "open_ticket_message_ts": open_ticket_ts,
+        "user_thread_link": user_thread_link,
+        "staff_thread_link": staff_link,
     })
 
-    client.chat_postMessage(
+    fan.add("controls", lambda: client.chat_postMessage(
         channel=STAFF_CHANNEL,
         thread_ts=staff_msg["ts"],
         text="New ticket!",
         blocks=blocks.ticket_staff_controls(ticket_id),
-    )
+    ), after=("staff_msg",), settled=("files",) if files else ())
 
-    client.chat_postMessage(
+    fan.add("user_ack", lambda: client.chat_postMessage(
         channel=USER_CHANNEL,
         thread_ts=event["ts"],
         text="Hey there! We have received your question, and someone from Shipwrights Team will get back to you shortly!",
         unfurl_links=False,
         unfurl_media=False,
         blocks=blocks.ticket_user_ack(ticket_id, staff_link),
-    )
+    ))
 
-    client.chat_postEphemeral(
+    fan.add("ai_notice", lambda: client.chat_postEphemeral(
         channel=USER_CHANNEL,
         thread_ts=event["ts"],
         text="AI Notice.",
         blocks=blocks.ai_opt_notice(user_opt_in, event["ts"]),
         user=user_id,
-    )
+    ))
 
     if user_opt_in:
-        ai.detect_ticket(ticket_id)
+        ai_jobs.detect(ticket_id)
 
-    client.reactions_add(channel=STAFF_CHANNEL, timestamp=staff_msg["ts"], name=OPEN_TICKET_REACTION)
-    client.reactions_add(channel=USER_CHANNEL, timestamp=event["ts"], name=OPEN_TICKET_REACTION)
+    fan.add("user_reaction", lambda: client.reactions_add(channel=USER_CHANNEL, timestamp=event["ts"], name=OPEN_TICKET_REACTION))
+    fan.wait()
 
 
 def edit_message(event):
@@ -631,7 +710,7 @@ def edit_message(event):
         return
 
     if event.get("message", {}).get("thread_ts") == event.get("message", {}).get("ts"):
-        user_thread_link = client.chat_getPermalink(channel=USER_CHANNEL, message_ts=message_ts)["permalink"]
+        user_thread_link = ticket.get("user_thread_link") or permalinks.get(USER_CHANNEL, message_ts)
         client.chat_update(
             channel=STAFF_CHANNEL,
             ts=ticket["staff_thread_ts"],
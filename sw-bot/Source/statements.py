@@ -0,0 +1,139 @@
+import logging, re, threading, weakref
+from time import perf_counter
+import psycopg2
+from psycopg2 import errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE
+from globals import DB_PREPARED_STATEMENTS
+
+logger = logging.getLogger("statements")
+
+_PLACEHOLDER = re.compile(r"%s")
+
+
+class Statement:
+    __slots__ = ("name", "sql", "prepare_sql", "execute_sql", "calls", "plain", "prepares", "total", "max")
+
+    def __init__(self, name: str, sql: str):
+        arity = sql.count("%s")
+        count = iter(range(1, arity + 1))
+        self.name = f"sw_{name}"
+        self.sql = sql
+        self.prepare_sql = f"PREPARE {self.name} AS {_PLACEHOLDER.sub(lambda _: f'${next(count)}', sql)}"
+        self.execute_sql = f"EXECUTE {self.name} ({', '.join(['%s'] * arity)})" if arity else f"EXECUTE {self.name}"
+        self.calls = 0
+        self.plain = 0
+        self.prepares = 0
+        self.total = 0.0
+        self.max = 0.0
+
+
+REGISTRY: dict[str, Statement] = {}
+_lock = threading.Lock()
+# conn -> names prepared on it, or None once the connection has fallen back to plain SQL.
+_prepared: "weakref.WeakKeyDictionary" = weakref.WeakKeyDictionary()
+
+
+def register(name: str, sql: str) -> Statement:
+    stmt = REGISTRY[name] = Statement(name, sql)
+    return stmt
+
+
+def _fall_back(conn, reason):
+    with _lock:
+        _prepared[conn] = None
+    logger.warning(f"prepared statements unavailable on this connection, sending plain SQL: {reason}")
+
+
+def _prepare(cur, stmt: Statement) -> bool:
+    """PREPARE `stmt` on the cursor's connection; only called with no transaction open."""
+    conn = cur.connection
+    try:
+        cur.execute(stmt.prepare_sql)
+    except errors.DuplicatePreparedStatement:
+        conn.rollback()  # prepared earlier on this session and forgotten here; still usable
+    except psycopg2.Error as e:
+        conn.rollback()
+        _fall_back(conn, e)
+        return False
+    with _lock:
+        names = _prepared.get(conn)
+        if names is not None:
+            names.add(stmt.name)
+        stmt.prepares += 1
+    return True
+
+
+def _run_plain(cur, stmt: Statement, params):
+    cur.execute(stmt.sql, params)
+    with _lock:
+        stmt.plain += 1
+
+
+def execute(cur, stmt: Statement, params: tuple = ()):
+    """Run `stmt` as a server-side prepared statement, preparing it on first use per connection.
+
+    Statements are only prepared when no transaction is open, so a failed
+    PREPARE never takes earlier work down with it. A connection where they
+    turn out not to work (e.g. "prepared statement does not exist" behind a
+    transaction-pooling proxy) sends plain SQL from then on; with
+    DB_PREPARED_STATEMENTS off every connection does.
+    """
+    conn = cur.connection
+    started = perf_counter()
+    try:
+        if not DB_PREPARED_STATEMENTS:
+            _run_plain(cur, stmt, params)
+            return
+        with _lock:
+            names = _prepared.setdefault(conn, set())
+            ready = names is not None and stmt.name in names
+        idle = conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+        if names is None or (not ready and not (idle and _prepare(cur, stmt))):
+            _run_plain(cur, stmt, params)
+            return
+        try:
+            cur.execute(stmt.execute_sql, params)
+        except errors.InvalidSqlStatementName as e:
+            _fall_back(conn, e)
+            if not idle:
+                raise  # earlier statements in this transaction are gone with it
+            conn.rollback()
+            _run_plain(cur, stmt, params)
+        except errors.FeatureNotSupported as e:
+            if "cached plan" not in str(e) or not idle:
+                raise
+            # A table changed shape under a SELECT *: drop the plan and re-prepare on next use.
+            conn.rollback()
+            with _lock:
+                names.discard(stmt.name)
+            cur.execute(f"DEALLOCATE {stmt.name}")
+            _run_plain(cur, stmt, params)
+    finally:
+        elapsed = perf_counter() - started
+        with _lock:
+            stmt.calls += 1
+            stmt.total += elapsed
+            stmt.max = max(stmt.max, elapsed)
+
+
+def stats() -> dict:
+    with _lock:
+        total = sum(s.total for s in REGISTRY.values()) or 1.0
+        states = list(_prepared.values())
+        return {
+            "enabled": DB_PREPARED_STATEMENTS,
+            "prepared_connections": sum(1 for names in states if names),
+            "plain_connections": sum(1 for names in states if names is None),
+            "statements": {
+                name: {
+                    "calls": s.calls,
+                    "plain": s.plain,
+                    "prepares": s.prepares,
+                    "avg_ms": round(s.total / s.calls * 1000, 2) if s.calls else 0,
+                    "max_ms": round(s.max * 1000, 1),
+                    "total_ms": round(s.total * 1000),
+                    "share": round(s.total / total, 3),
+                }
+                for name, s in sorted(REGISTRY.items(), key=lambda item: -item[1].total)
+            },
+        }
@@ -1,93 +1,438 @@
-import json, logging, os, threading
-from datetime import datetime, timezone
-from globals import TASK_JOURNAL_PATH
+import json, logging, os, re, threading, time
+from time import monotonic
+from globals import (
+    TASK_JOURNAL_COMPACT_AGE, TASK_JOURNAL_COMPACT_BYTES, TASK_JOURNAL_FSYNC, TASK_JOURNAL_FSYNC_INTERVAL,
+    TASK_JOURNAL_PATH, TASK_JOURNAL_SEGMENT_BYTES,
+)
 
-lock = threading.RLock()
+PENDING, STARTED, DONE = "p", "s", "d"
+STATUS_NAMES = {PENDING: "pending", STARTED: "in_progress", DONE: "done"}
+LEGACY_STATUSES = {"pending": PENDING, "in_progress": STARTED, "done": DONE}
+FSYNC_MODES = ("always", "interval", "never")
+CHECKPOINT_INTERVAL = 30.0
+COMPACT_CHECK_INTERVAL = 10.0
 
 
-def now() -> str:
-    return datetime.now(timezone.utc).isoformat()
+def _encode(record: dict) -> bytes:
+    return (json.dumps(record, separators=(",", ":")) + "\n").encode()
 
 
-def append(record: dict):
-    with lock:
+class Journal:
+    """Append-only task journal split into numbered segment files.
+
+    Records are compact JSON lines: {"i": id, "s": status} plus fn/args/kwargs
+    ("f"/"a"/"k") and an enqueue time ("t") on the first record of a task.
+    One flusher thread owns the open segment and writes everything appended
+    since its last pass in a single write, so concurrent appends share the
+    syscall and the fsync. `fsync` picks the durability policy:
+      always   - append() blocks until its record is fsynced
+      interval - fsync at most every `interval` seconds
+      never    - leave it to the OS
+    Segments are deleted from the oldest end once every task enqueued in them
+    is done, so only live segments are ever scanned.
+
+    A checkpoint file holds the outstanding tasks and the segment offset they
+    were taken at, so startup only reads the checkpoint plus the tail written
+    after it. When live segments grow past `compact_bytes`, or the oldest one
+    is older than `compact_age` seconds, the flusher re-appends the tasks that
+    pin them to the active segment and drops them.
+    """
+
+    def __init__(
+        self, path: str, fsync: str = "interval", interval: float = 1.0, segment_bytes: int = 4 << 20,
+        compact_bytes: int = 16 << 20, compact_age: float = 3600.0,
+    ):
+        if fsync not in FSYNC_MODES:
+            raise ValueError(f"fsync must be one of {FSYNC_MODES}, got {fsync!r}")
+        self.path = path
+        self.fsync = fsync
+        self.interval = interval
+        self.segment_bytes = segment_bytes
+        self.compact_bytes = compact_bytes
+        self.compact_age = compact_age
+        self.checkpoint_path = f"{path}.ckpt"
+        self._cond = threading.Condition()
+        self._io_lock = threading.RLock()
+        self._buffer: list[tuple[dict, bytes]] = []
+        self._appended = 0
+        self._committed = 0
+        self._closed = False
+        self._flusher: threading.Thread | None = None
+        self._file = None
+        self._segment = 0
+        self._segment_size = 0
+        self._dirty = False
+        self._last_fsync = monotonic()
+        self._loaded = False
+        self._live: dict[int, set[str]] = {}
+        self._task_segment: dict[str, int] = {}
+        self._pending: dict[str, dict] = {}
+        self._sizes: dict[int, int] = {}
+        self._born: dict[int, float] = {}
+        self._last_checkpoint = monotonic()
+        self._last_compact_check = monotonic()
+        self._since_checkpoint = 0
+        self.writes = 0
+        self.fsyncs = 0
+        self.checkpoints = 0
+        self.compactions = 0
+        self.replayed_from_checkpoint = False
+
+    def _segment_path(self, seq: int) -> str:
+        return self.path if seq == 0 else f"{self.path}.{seq:08d}"
+
+    def _segments(self) -> list[int]:
+        directory = os.path.dirname(self.path) or "."
+        pattern = re.compile(re.escape(os.path.basename(self.path)) + r"\.(\d{8})$")
+        try:
+            names = os.listdir(directory)
+        except OSError:
+            return []
+        return sorted(int(m.group(1)) for m in map(pattern.match, names) if m)
+
+    def _apply(self, record: dict, seq: int):
+        task_id = record.get("i")
+        if not task_id:
+            return
+        status = record.get("s")
+        if "f" in record:
+            self._pending[task_id] = dict(record)
+            self._live.setdefault(seq, set()).add(task_id)
+            self._task_segment[task_id] = seq
+        elif task_id in self._pending:
+            if status == DONE:
+                del self._pending[task_id]
+                self._live.get(self._task_segment.pop(task_id, None), set()).discard(task_id)
+            else:
+                self._pending[task_id]["s"] = status
+
+    def _read_segment(self, seq: int, offset: int = 0):
+        path = self._segment_path(seq)
+        self._live.setdefault(seq, set())
+        self._sizes[seq] = os.path.getsize(path)
+        self._born[seq] = os.path.getctime(path)
+        with open(path, "rb") as f:
+            f.seek(offset)
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except (json.JSONDecodeError, UnicodeDecodeError):
+                    continue
+                if seq == 0:
+                    record = {
+                        "i": record.get("id"),
+                        "s": LEGACY_STATUSES.get(record.get("status"), PENDING),
+                        **({"f": record["fn"], "a": record.get("args", []), "k": record.get("kwargs", {})} if "fn" in record else {}),
+                    }
+                self._apply(record, seq)
+
+    def _ensure_loaded(self):
+        with self._io_lock:
+            if self._loaded:
+                return
+            self._loaded = True
+            seqs = ([0] if os.path.isfile(self.path) else []) + self._segments()
+            checkpoint = self._read_checkpoint()
+            if checkpoint:
+                self.replayed_from_checkpoint = True
+                for seq, record in checkpoint["pending"]:
+                    self._apply(record, seq)
+            for seq in seqs:
+                offset = 0
+                if checkpoint:
+                    if seq < checkpoint["segment"]:
+                        self._live.setdefault(seq, set())
+                        try:
+                            self._sizes[seq] = os.path.getsize(self._segment_path(seq))
+                            self._born[seq] = os.path.getctime(self._segment_path(seq))
+                        except OSError:
+                            pass
+                        continue
+                    if seq == checkpoint["segment"]:
+                        offset = checkpoint["offset"]
+                try:
+                    self._read_segment(seq, offset)
+                except OSError as e:
+                    logging.error(f"task_journal load of {self._segment_path(seq)} failed: {e}")
+            self._segment = max(seqs, default=0)
+
+    def _read_checkpoint(self) -> dict | None:
         try:
-            with open(TASK_JOURNAL_PATH, "a", encoding="utf-8") as f:
-                f.write(json.dumps(record) + "\n")
+            with open(self.checkpoint_path, encoding="utf-8") as f:
+                checkpoint = json.load(f)
+            checkpoint["segment"], checkpoint["offset"], checkpoint["pending"]
+            return checkpoint
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logging.warning(f"task_journal checkpoint unreadable, scanning all segments: {e}")
+            return None
+
+    def _checkpoint(self):
+        self._fsync()
+        tmp = self.checkpoint_path + ".tmp"
+        try:
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({
+                    "segment": self._segment,
+                    "offset": self._segment_size,
+                    "pending": [[self._task_segment.get(tid, self._segment), record] for tid, record in self._pending.items()],
+                }, f, separators=(",", ":"))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp, self.checkpoint_path)
         except OSError as e:
-            logging.error(f"task_journal append failed: {e}")
+            logging.error(f"task_journal checkpoint failed: {e}")
+            return
+        self._last_checkpoint = monotonic()
+        self._since_checkpoint = 0
+        self.checkpoints += 1
+
+    def _maybe_compact(self):
+        self._last_compact_check = monotonic()
+        old = [seq for seq in self._live if seq < self._segment]
+        if not old or self._file is None:
+            return
+        live_bytes = sum(self._sizes.get(seq, 0) for seq in self._live)
+        oldest_age = time.time() - self._born.get(min(old), time.time())
+        if live_bytes < self.compact_bytes and oldest_age < self.compact_age:
+            return
+        moved = [tid for tid, seq in self._task_segment.items() if seq < self._segment]
+        data = b"".join(_encode({**self._pending[tid], "s": PENDING}) for tid in moved)
+        self._file.write(data)
+        self._file.flush()
+        self._segment_size += len(data)
+        self._sizes[self._segment] = self._segment_size
+        self._dirty = True
+        self._fsync()
+        for tid in moved:
+            self._live[self._task_segment[tid]].discard(tid)
+            self._live[self._segment].add(tid)
+            self._task_segment[tid] = self._segment
+        self._drop_dead_segments()
+        self._checkpoint()
+        self.compactions += 1
+        logging.info(f"task_journal compacted {len(old)} segments, relocated {len(moved)} pending tasks")
+
+    def _rotate(self):
+        if self._file:
+            self._fsync()
+            self._file.close()
+        self._segment += 1
+        self._file = open(self._segment_path(self._segment), "ab")
+        self._segment_size = 0
+        self._sizes[self._segment] = 0
+        self._born[self._segment] = time.time()
+        self._live.setdefault(self._segment, set())
+        self._since_checkpoint += 1
+
+    def _fsync(self):
+        if self._file and self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+            self._last_fsync = monotonic()
+            self.fsyncs += 1
+
+    def _drop_dead_segments(self):
+        for seq in sorted(self._live):
+            if seq >= self._segment or self._live[seq]:
+                break
+            try:
+                os.remove(self._segment_path(seq))
+            except FileNotFoundError:
+                pass
+            except OSError as e:
+                logging.error(f"task_journal could not remove segment {seq}: {e}")
+                break
+            del self._live[seq]
+            self._sizes.pop(seq, None)
+            self._born.pop(seq, None)
+
+    def _write(self, batch: list[tuple[dict, bytes]]):
+        with self._io_lock:
+            self._ensure_loaded()
+            try:
+                if batch:
+                    if self._file is None or self._segment_size >= self.segment_bytes:
+                        self._rotate()
+                    data = b"".join(line for _, line in batch)
+                    self._file.write(data)
+                    self._file.flush()
+                    self._segment_size += len(data)
+                    self._sizes[self._segment] = self._segment_size
+                    self._dirty = True
+                    self.writes += 1
+                    self._since_checkpoint += len(batch)
+                    for record, _ in batch:
+                        self._apply(record, self._segment)
+                    self._drop_dead_segments()
+                if self.fsync == "always" or (
+                    self.fsync == "interval" and monotonic() - self._last_fsync >= self.interval
+                ):
+                    self._fsync()
+                now = monotonic()
+                if now - self._last_compact_check >= COMPACT_CHECK_INTERVAL:
+                    self._maybe_compact()
+                if self._since_checkpoint and now - self._last_checkpoint >= CHECKPOINT_INTERVAL:
+                    self._checkpoint()
+            except OSError as e:
+                logging.error(f"task_journal append failed: {e}")
+                self._file = None
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._buffer and not self._closed:
+                    timeout = self.interval if self.fsync == "interval" and self._dirty else None
+                    if not self._cond.wait(timeout):
+                        break
+                batch, self._buffer = self._buffer, []
+                upto = self._appended
+                closing = self._closed
+            self._write(batch)
+            with self._cond:
+                self._committed = upto
+                self._cond.notify_all()
+            if closing and not self._buffer:
+                return
+
+    def _ensure_started(self):
+        if self._flusher is None:
+            self._flusher = threading.Thread(target=self._run, daemon=True, name="task-journal")
+            self._flusher.start()
+
+    def append(self, record: dict):
+        line = _encode(record)
+        with self._cond:
+            if self._closed:
+                logging.debug("task_journal append after close, dropping record")
+                return
+            self._ensure_started()
+            self._buffer.append((record, line))
+            self._appended += 1
+            seq = self._appended
+            self._cond.notify_all()
+            if self.fsync == "always":
+                while self._committed < seq:
+                    self._cond.wait()
+
+    def flush(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._ensure_started()
+            target = self._appended
+            self._cond.notify_all()
+            while self._committed < target:
+                self._cond.wait()
+
+    def close(self):
+        with self._cond:
+            if self._closed:
+                return
+            self._closed = True
+            self._cond.notify_all()
+            flusher = self._flusher
+        if flusher:
+            flusher.join()
+        with self._io_lock:
+            try:
+                if self._loaded:
+                    self._checkpoint()
+                if self._file:
+                    self._file.close()
+            except OSError as e:
+                logging.error(f"task_journal close failed: {e}")
+            self._file = None
+
+    def load_pending(self) -> list[dict]:
+        self.flush()
+        with self._io_lock:
+            self._ensure_loaded()
+            return [
+                {
+                    "id": task_id,
+                    "fn": record["f"],
+                    "args": record.get("a", []),
+                    "kwargs": record.get("k", {}),
+                    "status": STATUS_NAMES.get(record.get("s"), "pending"),
+                }
+                for task_id, record in self._pending.items()
+            ]
+
+    def compact(self):
+        self.flush()
+        with self._io_lock:
+            self._ensure_loaded()
+            try:
+                self._rotate()
+                data = b"".join(_encode({**record, "s": PENDING}) for record in self._pending.values())
+                self._file.write(data)
+                self._file.flush()
+                self._segment_size = len(data)
+                self._sizes[self._segment] = self._segment_size
+                self._dirty = True
+                self._fsync()
+            except OSError as e:
+                logging.error(f"task_journal compact failed: {e}")
+                self._file = None
+                return
+            self._live[self._segment] = set(self._pending)
+            self._task_segment = {task_id: self._segment for task_id in self._pending}
+            for seq in [s for s in self._live if s < self._segment]:
+                self._live[seq] = set()
+            self._drop_dead_segments()
+            self._checkpoint()
+            self.compactions += 1
+
+    def stats(self) -> dict:
+        with self._io_lock:
+            return {
+                "pending": len(self._pending),
+                "segments": len(self._live),
+                "writes": self.writes,
+                "fsyncs": self.fsyncs,
+                "fsync_mode": self.fsync,
+                "checkpoints": self.checkpoints,
+                "compactions": self.compactions,
+            }
+
+
+journal = Journal(
+    TASK_JOURNAL_PATH,
+    fsync=TASK_JOURNAL_FSYNC,
+    interval=TASK_JOURNAL_FSYNC_INTERVAL,
+    segment_bytes=TASK_JOURNAL_SEGMENT_BYTES,
+    compact_bytes=TASK_JOURNAL_COMPACT_BYTES,
+    compact_age=TASK_JOURNAL_COMPACT_AGE,
+)
 
 
 def record_enqueue(task_id: str, fn_name: str, args: tuple, kwargs: dict):
     try:
-        serialized_args = list(args)
-        json.dumps(serialized_args)
+        journal.append({"i": task_id, "s": PENDING, "f": fn_name, "a": list(args), "k": kwargs, "t": round(time.time(), 3)})
     except (TypeError, ValueError) as e:
         logging.error(f"task_journal: cannot serialize args for {fn_name}: {e}")
-        return
-    append({
-        "id": task_id,
-        "fn": fn_name,
-        "args": serialized_args,
-        "kwargs": kwargs,
-        "status": "pending",
-        "ts": now(),
-    })
 
 
 def record_start(task_id: str):
-    append({"id": task_id, "status": "in_progress", "ts": now()})
+    journal.append({"i": task_id, "s": STARTED})
 
 
 def record_done(task_id: str):
-    append({"id": task_id, "status": "done", "ts": now()})
+    journal.append({"i": task_id, "s": DONE})
 
 
 def load_pending() -> list[dict]:
-    if not os.path.exists(TASK_JOURNAL_PATH):
-        return []
-    full_records: dict[str, dict] = {}
-    latest_status: dict[str, str] = {}
-    with lock:
-        try:
-            with open(TASK_JOURNAL_PATH, encoding="utf-8") as f:
-                for line in f:
-                    line = line.strip()
-                    if not line:
-                        continue
-                    try:
-                        record = json.loads(line)
-                    except json.JSONDecodeError:
-                        continue
-                    task_id = record.get("id")
-                    if not task_id:
-                        continue
-                    if "fn" in record:
-                        full_records[task_id] = record
-                    latest_status[task_id] = record["status"]
-        except OSError as e:
-            logging.error(f"task_journal load failed: {e}")
-            return []
-    return [
-        {**full_records[tid], "status": latest_status[tid]}
-        for tid in full_records
-        if latest_status.get(tid) != "done"
-    ]
+    return journal.load_pending()
 
 
 def compact():
-    pending = load_pending()
-    with lock:
-        try:
-            with open(TASK_JOURNAL_PATH, "w", encoding="utf-8") as f:
-                for task in pending:
-                    f.write(json.dumps({
-                        "id": task["id"],
-                        "fn": task["fn"],
-                        "args": task["args"],
-                        "kwargs": task.get("kwargs", {}),
-                        "status": "pending",
-                        "ts": now(),
-                    }) + "\n")
-        except OSError as e:
-            logging.error(f"task_journal compact failed: {e}")
+    journal.compact()
+
+
+def close():
+    journal.close()
@@ -98,6 +98,15 @@ def show_rating_form(ticket_id):
     }
 
 
+def _preload_line(p: dict) -> str:
+    if p["state"] != "done":
+        return f"*Preload:* {p['state']}" + (f" ({p['error']})" if p.get("error") else "")
+    return (
+        f"*Preload:* {p['open']} open + {p['closed']} closed tickets ({p['tickets_added']} new), "
+        f"{p['opt_ins']} opt-ins, {p['shipwrights']} shipwrights in {p['ms']}ms"
+    )
+
+
 def cache_dump(data: dict) -> dict:
     def section(text):
         return {"type": "section", "text": {"type": "mrkdwn", "text": str(text)[:3000]}}
@@ -160,10 +169,103 @@ def cache_dump(data: dict) -> dict:
         b.append(section("_no cached keys_"))
     b.append(divider)
 
+    stores = data["stores"]
+    b.append(header("Cache Stores"))
+    lines = [
+        f"`{name}` — {st['size']}/{st['max']}, hit rate {st['hit_rate'] if st['hit_rate'] is not None else 'n/a'}, "
+        f"{st['evictions']} evicted, {st['expirations']} expired, ~{st['bytes'] // 1024} KB"
+        + (f", {st['refreshes']} refreshed ahead, {st['invalidations']} user_change" if "refreshes" in st else "")
+        + (f", {st['synthesized']} built locally, {st['api_lookups']} via API" if "synthesized" in st else "")
+        for name, st in stores.items()
+    ]
+    b += [section("\n".join(lines) or "_none_"), divider]
+
+    wq = data["write_queue"]
+    dp = data["db_pool"]
+    b += [header("Write Queue"), section(
+        f"*Depth:* {wq['depth']} (lanes: {', '.join(str(d) for d in wq['lane_depths'])})\n"
+        f"*Tasks:* {wq['tasks']} in {wq['batches']} batches (avg {wq['avg_batch']}, max {wq['max_batch']})\n"
+        f"*Commit:* avg {wq['commit_ms_avg']}ms, max {wq['commit_ms_max']}ms, last {wq['commit_ms_last']}ms\n"
+        f"*Journal:* {data['journal']['pending']} pending in {data['journal']['segments']} segments, "
+        f"{data['journal']['writes']} writes, {data['journal']['fsyncs']} fsyncs ({data['journal']['fsync_mode']})\n"
+        + (f"*DB Pool:* {dp['in_use']}/{dp['max']} in use, {dp['idle']} idle | {dp['checkouts']} checkouts, "
+           f"wait avg {dp['wait_ms_avg']}ms max {dp['wait_ms_max']}ms | {dp['validations']} validations, "
+           f"{dp['reconnects']} reconnects, {dp['timeouts']} timeouts\n" if dp else "")
+        + f"*Snapshot:* {data['snapshot']['flushes']} flushes ({data['snapshot']['upserts']} upserts, "
+        f"{data['snapshot']['deletes']} deletes), last {data['snapshot']['last_flush_ms']}ms | "
+        + ("restoring…" if data['snapshot']['restoring'] else
+           f"restored {data['snapshot']['restored']} in {data['snapshot']['restore_ms']}ms")
+    ), divider]
+
+    ds = data["db_statements"]
+    lines = [
+        f"`{name}` — {st['calls']} calls ({st['plain']} plain, {st['prepares']} prepares) | "
+        f"avg {st['avg_ms']}ms, max {st['max_ms']}ms, {st['share']:.0%} of DB time"
+        for name, st in list(ds["statements"].items())[:8] if st["calls"]
+    ]
+    b += [header("DB Statements"), section(
+        (f"*Prepared on:* {ds['prepared_connections']} connections, {ds['plain_connections']} fell back to plain SQL\n"
+         if ds["enabled"] else "*Prepared statements:* off (DB_PREPARED_STATEMENTS)\n")
+        + ("\n".join(lines) or "_no calls yet_")
+    ), divider]
+
+    lines = [
+        f"*{name}:* {st['state']}, {st['calls']} calls, {st['errors']} errors, {st['retried']} retries, "
+        f"{st['rejected']} rejected | avg {st['avg_ms']}ms, p50 ≤{st['p50_ms']}ms, p99 ≤{st['p99_ms']}ms"
+        for name, st in data["http"].items()
+    ]
+    b += [header("HTTP"), section("\n".join(lines)), divider]
+
+    aj = data["ai_jobs"]
+    b += [header("AI Jobs"), section(
+        f"*Queue:* {aj['depth']} queued, {aj['running']} running, oldest {aj['oldest_s']}s\n"
+        f"*Jobs:* {aj['submitted']} submitted, {aj['completed']} done, {aj['failed']} failed, "
+        f"{aj['deduped']} deduped, {aj['dropped']} dropped\n"
+        f"*Wait:* avg {aj['wait_ms_avg']}ms, max {aj['wait_ms_max']}ms"
+    ), divider]
+
+    fr = data["file_relay"]
+    recent = "\n".join(f"• {f['name']}: {f['bytes']} bytes in {f['ms']}ms ({f['mbps']} MB/s)" for f in fr["recent"])
+    handler_lines = [
+        f"`{name}` — {st['count']} runs, avg {st['avg_ms']}ms (serial {st['serial_ms']}ms), max {st['max_ms']}ms, last {st['last_ms']}ms"
+        for name, st in data["handlers"].items()
+    ]
+    ig = data["ingress"]
+    lines = [
+        f"*Queue:* {ig['depth']}/{ig['max']}, {ig['rejected']} rejected | routing {ig['routing_depth']} | shared {ig['shared_depth']} ({ig['workers']} workers)",
+        "*Lanes:* " + ", ".join(
+            f"{i}:{lane['depth']}{'*' if lane['busy'] else ''} ({lane['handled']}, ~{lane['wait_ms_avg']}ms wait)"
+            for i, lane in enumerate(ig["lanes"])
+        ),
+    ] + [
+        f"`{kind}` — {st['count']} handled, {st['failed']} failed, wait avg {st['wait_ms_avg']}ms, "
+        f"run avg {st['run_ms_avg']}ms / max {st['run_ms_max']}ms"
+        for kind, st in ig["kinds"].items()
+    ]
+    b += [header("Ingress"), section("\n".join(lines)[:3000]), divider]
+
+    sl = data["slack"]
+    lines = [f"*Waiting:* {sl['waiting']['interactive']} interactive, {sl['waiting']['background']} background"] + [
+        f"`{name}` — {st['calls']} calls, wait avg {st['wait_ms_avg']}ms / max {st['wait_ms_max']}ms, {st['limited']} × 429"
+        for name, st in sl["methods"].items()
+    ]
+    b += [header("Slack Rate Limits"), section("\n".join(lines)), divider]
+
+    b += [header("Handler Latency"), section("\n".join(handler_lines) or "_none_"), divider]
+
+    b += [header("File Relay"), section(
+        f"*Files:* {fr['files']} relayed, {fr['failed']} failed, {fr['mb']} MB at avg {fr['mbps']} MB/s"
+        + (f"\n{recent}" if recent else "")
+    ), divider]
+
     b += [header("Misc"), section(
         f"*Ignorable:* {data['ignorable_count']}\n"
         f"*Deleted Headers:* {data['deleted_headers_count']}\n"
-        f"*Closed Notified:* {data['closed_notified_count']}"
+        f"*Closed Notified:* {data['closed_notified_count']}\n"
+        f"*Thread TS Index:* {data['ts_index_count']}\n"
+        f"*Unknown Thread TS:* {data['missing_ts_count']}\n"
+        f"*Seen Events:* {data['seen_events_count']} ({data['duplicate_events']} duplicates dropped)\n"
+        + _preload_line(data["preload"])
     )]
 
     return {
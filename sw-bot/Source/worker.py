@@ -1,15 +1,14 @@
-import logging, uuid, queue
+import logging, time, uuid
 from typing import Callable
 from slack_sdk.errors import SlackApiError
 import blocks, cache, db, task_journal
-from globals import META_CHANNEL, client
+from globals import META_CHANNEL, WRITE_BATCH_MAX, WRITE_WORKERS, client
 from helpers import find_meta_sticky_from_history
+from write_behind import WriteBehind
 # from helpers import find_sticky_from_history  # user sticky
 
 logger = logging.getLogger("worker")
 
-write_queue: queue.Queue = queue.Queue()
-
 TASK_REGISTRY: dict[str, Callable] = {
     f"db.{name}": getattr(db, name)
     for name in (
@@ -22,24 +21,50 @@ TASK_REGISTRY: dict[str, Callable] = {
 }
 
 
+def _ticket_key(args, kwargs):
+    return ("ticket", args[0] if args else kwargs["ticket_id"])
+
+
+# tasks with the same key run in enqueue order; everything else is ordered per function
+ORDER_KEYS: dict[str, Callable] = {
+    **{
+        f"db.{name}": _ticket_key
+        for name in (
+            "save_message", "close_ticket", "open_ticket", "claim_ticket",
+            "save_feedback", "save_resolve_message_ts", "mark_feedback_requested",
+        )
+    },
+    "db.add_stardust": lambda args, kwargs: ("ticket", args[1] if len(args) > 1 else kwargs["ticket_id"]),
+    "db.update_meta_votes": lambda args, kwargs: ("meta", args[0]),
+    "db.save_meta": lambda args, kwargs: ("meta", args[1] if len(args) > 1 else kwargs["meta_message_ts"]),
+    "db.create_ticket_user": lambda args, kwargs: ("user", args[0]),
+    "db.update_ticket_user_opt": lambda args, kwargs: ("user", args[0]),
+}
+
+BATCHERS: dict[Callable, Callable] = {
+    db.save_message: db.save_messages,
+    db.update_meta_votes: db.update_meta_votes_batch,
+    db.add_stardust: db.add_stardust_batch,
+}
+
+writer = WriteBehind(WRITE_WORKERS, WRITE_BATCH_MAX, ORDER_KEYS, BATCHERS)
+
+
 def enqueue(fn: Callable, *args, **kwargs):
     task_id = str(uuid.uuid4())
     task_journal.record_enqueue(task_id, f"{fn.__module__}.{fn.__name__}", args, kwargs)
-    write_queue.put((task_id, fn, args, kwargs))
+    writer.submit(task_id, fn, args, kwargs)
 
 
 def load_and_replay():
-    pending = task_journal.load_pending()
-    task_journal.compact()
     replayed = 0
-    for task in pending:
+    for task in task_journal.load_pending():
         fn = TASK_REGISTRY.get(task["fn"])
         if fn is None:
             logger.warning(f"load_and_replay: unknown function {task['fn']!r}, skipping")
+            task_journal.record_done(task["id"])
             continue
-        task_id = str(uuid.uuid4())
-        task_journal.record_enqueue(task_id, task["fn"], task["args"], task.get("kwargs", {}))
-        write_queue.put((task_id, fn, task["args"], task.get("kwargs", {})))
+        writer.submit(task["id"], fn, task["args"], task.get("kwargs", {}))
         replayed += 1
     if replayed:
         logger.info(f"Replayed {replayed} pending tasks from journal")
@@ -100,28 +125,19 @@ class Worker:
             logger.error(f"Failed to post meta sticky error={e.response['error']}")
 
     def run(self):
+        writer.start()
         while True:
-            try:
-                task_id, fn, args, kwargs = write_queue.get(timeout=0.1)
-                task_journal.record_start(task_id)
+            time.sleep(0.1)
+            working_copy, self.tasks = self.tasks, []
+            for task in working_copy:
                 try:
-                    fn(*args, **kwargs)
+                    # if task == "update_sticky_message":  # user sticky
+                    #     self.update_sticky_message()
+                    if task == "update_meta_sticky":
+                        pass
+                        #self.update_meta_sticky()
                 except Exception as e:
-                    logger.exception(f"write task {fn.__name__} failed: {e}")
-                finally:
-                    task_journal.record_done(task_id)
-                    write_queue.task_done()
-            except queue.Empty:
-                working_copy, self.tasks = self.tasks, []
-                for task in working_copy:
-                    try:
-                        # if task == "update_sticky_message":  # user sticky
-                        #     self.update_sticky_message()
-                        if task == "update_meta_sticky":
-                            pass
-                            #self.update_meta_sticky()
-                    except Exception as e:
-                        logger.exception(f"Unhandled error in task={task}: {e}")
+                    logger.exception(f"Unhandled error in task={task}: {e}")
 
 
 task_runner = Worker()
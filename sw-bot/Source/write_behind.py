@@ -0,0 +1,138 @@
+import inspect, logging, queue, threading
+from time import perf_counter
+from typing import Callable
+import task_journal
+
+logger = logging.getLogger("write_behind")
+
+
+class WriteBehind:
+    """Runs queued write tasks on N ordered lanes.
+
+    Tasks sharing an ordering key (usually the ticket id) always land on the
+    same lane, so they run in enqueue order. Consecutive tasks of the same
+    function on a lane are handed to its batch function in one transaction
+    when one is registered, falling back to one call per task if it fails.
+    """
+
+    def __init__(self, workers: int, batch_max: int, keys: dict[str, Callable], batchers: dict[Callable, Callable]):
+        self.lanes = [queue.Queue() for _ in range(max(1, workers))]
+        self.batch_max = max(1, batch_max)
+        self.keys = keys
+        self.batchers = batchers
+        self._threads: list[threading.Thread] = []
+        self._stats_lock = threading.Lock()
+        self.tasks = 0
+        self.batches = 0
+        self.max_batch = 0
+        self.commit_total = 0.0
+        self.commit_max = 0.0
+        self.commit_last = 0.0
+
+    def _lane_for(self, fn_name: str, args: tuple, kwargs: dict) -> queue.Queue:
+        key_fn = self.keys.get(fn_name)
+        key = fn_name
+        if key_fn:
+            try:
+                key = key_fn(args, kwargs)
+            except (IndexError, KeyError):
+                pass
+        return self.lanes[hash(key) % len(self.lanes)]
+
+    def submit(self, task_id: str, fn: Callable, args: tuple, kwargs: dict):
+        fn_name = f"{fn.__module__}.{fn.__name__}"
+        self._lane_for(fn_name, args, kwargs).put((task_id, fn, args, kwargs))
+
+    def start(self):
+        if self._threads:
+            return
+        for i, lane in enumerate(self.lanes):
+            t = threading.Thread(target=self._run_lane, args=(lane,), daemon=True, name=f"writer-{i}")
+            t.start()
+            self._threads.append(t)
+
+    def _run_lane(self, lane: queue.Queue):
+        while True:
+            batch = [lane.get()]
+            while len(batch) < self.batch_max:
+                try:
+                    batch.append(lane.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                for group in self._group(batch):
+                    self._execute(group)
+            finally:
+                for _ in batch:
+                    lane.task_done()
+
+    def _group(self, batch: list) -> list[list]:
+        groups: list[list] = []
+        for task in batch:
+            fn = task[1]
+            if groups and fn in self.batchers and groups[-1][0][1] is fn:
+                groups[-1].append(task)
+            else:
+                groups.append([task])
+        return groups
+
+    def _execute(self, group: list):
+        fn = group[0][1]
+        for task_id, *_ in group:
+            task_journal.record_start(task_id)
+        started = perf_counter()
+        try:
+            if len(group) > 1 and self._run_batch(fn, group):
+                return
+            for _, task_fn, args, kwargs in group:
+                try:
+                    task_fn(*args, **kwargs)
+                except Exception as e:
+                    logger.exception(f"write task {task_fn.__name__} failed: {e}")
+        finally:
+            self._record(len(group), perf_counter() - started)
+            for task_id, *_ in group:
+                task_journal.record_done(task_id)
+
+    def _run_batch(self, fn: Callable, group: list) -> bool:
+        try:
+            signature = inspect.signature(fn)
+            rows = []
+            for _, _, args, kwargs in group:
+                bound = signature.bind(*args, **kwargs)
+                bound.apply_defaults()
+                rows.append(dict(bound.arguments))
+            return bool(self.batchers[fn](rows))
+        except Exception as e:
+            logger.exception(f"batched {fn.__name__} x{len(group)} failed, running one by one: {e}")
+            return False
+
+    def _record(self, size: int, elapsed: float):
+        with self._stats_lock:
+            self.tasks += size
+            self.batches += 1
+            self.max_batch = max(self.max_batch, size)
+            self.commit_total += elapsed
+            self.commit_max = max(self.commit_max, elapsed)
+            self.commit_last = elapsed
+
+    def depth(self) -> int:
+        return sum(lane.qsize() for lane in self.lanes)
+
+    def join(self):
+        for lane in self.lanes:
+            lane.join()
+
+    def stats(self) -> dict:
+        with self._stats_lock:
+            return {
+                "depth": self.depth(),
+                "lane_depths": [lane.qsize() for lane in self.lanes],
+                "tasks": self.tasks,
+                "batches": self.batches,
+                "avg_batch": round(self.tasks / self.batches, 2) if self.batches else 0,
+                "max_batch": self.max_batch,
+                "commit_ms_avg": round(self.commit_total / self.batches * 1000, 1) if self.batches else 0,
+                "commit_ms_max": round(self.commit_max * 1000, 1),
+                "commit_ms_last": round(self.commit_last * 1000, 1),
+            }
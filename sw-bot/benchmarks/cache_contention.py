@@ -0,0 +1,101 @@
+"""
+Cache lock contention under injected DB latency.
+Run: python benchmarks/cache_contention.py [--threads 32] [--seconds 3]
+
+Hot lookups (cached tickets) run alongside a trickle of cold misses whose
+db.* calls sleep for the injected latency. With the lock only guarding the
+in-memory maps, hot-path latency should stay flat as DB latency grows.
+"""
+import argparse, os, random, statistics, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Source"))
+for key in ("SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_ID", "USER_CHANNEL_ID", "STAFF_CHANNEL_ID",
+            "META_CHANNEL_ID", "DB_NAME", "DB_USER", "DB_PASSWORD"):
+    os.environ.setdefault(key, "bench")
+
+import cache as cache_module, db, worker
+
+HOT_TICKETS = 200
+
+
+def ticket_row(ticket_id):
+    return {
+        "id": ticket_id, "user_id": "U1", "user_name": "bench", "question": "q",
+        "user_thread_ts": f"{ticket_id}.1", "staff_thread_ts": f"{ticket_id}.2",
+        "status": "open", "closed_by": None,
+    }
+
+
+def inject_latency(latency):
+    def slow(fn):
+        def wrapper(*args, **kwargs):
+            time.sleep(latency)
+            return fn(*args, **kwargs)
+        return wrapper
+    db.get_ticket = slow(ticket_row)
+    db.find_ticket = slow(lambda ts: ticket_row(int(ts.split(".")[0])))
+    db.get_ticket_user = slow(lambda user_id: {"user_id": user_id, "is_opted_in": True})
+    db.get_shipwrights = slow(lambda: ["U1"])
+    worker.enqueue = lambda *args, **kwargs: None
+
+
+def run(latency, threads, seconds):
+    inject_latency(latency)
+    c = cache_module.Cache()
+    for i in range(1, HOT_TICKETS + 1):
+        c.ticket_data_saver(ticket_row(i))
+    c.ticket_users.put("U1", True)
+    hot, cold = [], []
+    stop = time.monotonic() + seconds
+    next_cold = [HOT_TICKETS + 1]
+    cold_lock = threading.Lock()
+
+    def handler():
+        rng = random.Random()
+        while time.monotonic() < stop:
+            if rng.random() < 0.05:
+                with cold_lock:
+                    ticket_id = next_cold[0]
+                    next_cold[0] += 1
+                started = time.perf_counter()
+                c.find_ticket_by_ts(f"{ticket_id}.1")
+                cold.append(time.perf_counter() - started)
+            else:
+                started = time.perf_counter()
+                c.find_ticket_by_ts(f"{rng.randint(1, HOT_TICKETS)}.2")
+                c.get_user_opt_in("U1")
+                hot.append(time.perf_counter() - started)
+
+    workers = [threading.Thread(target=handler) for _ in range(threads)]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return hot, cold
+
+
+def pct(samples, q):
+    if not samples:
+        return 0.0
+    samples = sorted(samples)
+    return samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=32)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    parser.add_argument("--latencies", default="0,0.005,0.05,0.2")
+    args = parser.parse_args()
+    print(f"{'db latency':>10} | {'hot ops/s':>10} {'hot p50':>9} {'hot p99':>9} | {'cold p50':>9} {'cold p99':>9}")
+    for latency in (float(x) for x in args.latencies.split(",")):
+        hot, cold = run(latency, args.threads, args.seconds)
+        print(
+            f"{latency * 1000:>8.0f}ms | {len(hot) / args.seconds:>10.0f} "
+            f"{pct(hot, 0.5):>7.3f}ms {pct(hot, 0.99):>7.3f}ms | "
+            f"{(statistics.median(cold) * 1000 if cold else 0):>7.1f}ms {pct(cold, 0.99):>7.1f}ms"
+        )
+
+
+if __name__ == "__main__":
+    main()
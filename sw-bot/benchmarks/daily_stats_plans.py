@@ -0,0 +1,127 @@
+"""
+get_daily_ticket_stats: five sequential queries vs the single FILTER/LATERAL query.
+Run: python benchmarks/daily_stats_plans.py [--tickets 50000] [--msgs 20] [--runs 20] [--plans]
+
+Needs a reachable Postgres (DB_* env vars). Seeds a throwaway schema with
+synthetic tickets and ticket_msgs, times both versions and, with --plans,
+prints EXPLAIN (ANALYZE, BUFFERS) for each. The schema is dropped afterwards.
+"""
+import argparse, importlib.util, os, statistics, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Source"))
+for key in ("SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_ID", "USER_CHANNEL_ID", "STAFF_CHANNEL_ID",
+            "META_CHANNEL_ID"):
+    os.environ.setdefault(key, "bench")
+
+import db
+
+SCHEMA = "bench_daily_stats"
+METRICS_MIGRATION = os.path.join(os.path.dirname(__file__), "..", "migrations", "003_add_ticket_metrics.py")
+
+OLD_QUERIES = [
+    "SELECT COUNT(*) AS count FROM tickets WHERE created_at >= NOW() - INTERVAL '1 day'",
+    "SELECT COUNT(*) AS count FROM tickets WHERE status = 'closed' AND closed_at >= NOW() - INTERVAL '1 day'",
+    "SELECT COUNT(*) AS count FROM tickets WHERE status = 'open'",
+    """
+    SELECT closed_by AS slack_id, COUNT(*) AS count
+    FROM tickets
+    WHERE status = 'closed' AND closed_at >= NOW() - INTERVAL '1 day' AND closed_by IS NOT NULL
+    GROUP BY closed_by ORDER BY count DESC LIMIT 3
+    """,
+    """
+    SELECT t.id, t.user_id, t.question, t.staff_thread_ts, t.created_at,
+           (SELECT MAX(created_at) FROM ticket_msgs WHERE ticket_id = t.id) AS last_reply
+    FROM tickets t
+    WHERE t.status = 'open' AND t.created_at <= NOW() - INTERVAL '1 day'
+    ORDER BY t.created_at ASC LIMIT 11
+    """,
+]
+
+
+def seed(cur, tickets, msgs):
+    cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+    cur.execute(f"CREATE SCHEMA {SCHEMA}")
+    cur.execute(f"SET search_path TO {SCHEMA}")
+    cur.execute("""
+        CREATE TABLE tickets (
+            id SERIAL PRIMARY KEY, user_id TEXT, question TEXT, staff_thread_ts TEXT,
+            status TEXT, closed_by TEXT, created_at TIMESTAMP, closed_at TIMESTAMP
+        )
+    """)
+    cur.execute("""
+        CREATE TABLE ticket_msgs (
+            id SERIAL PRIMARY KEY, ticket_id INT REFERENCES tickets(id), msg TEXT, created_at TIMESTAMP
+        )
+    """)
+    # ~3% open, spread over a year; closers drawn from 30 shipwrights.
+    cur.execute("""
+        INSERT INTO tickets (user_id, question, staff_thread_ts, status, closed_by, created_at, closed_at)
+        SELECT 'U' || (n % 2000), 'question ' || n, n || '.000100',
+               CASE WHEN n % 33 = 0 THEN 'open' ELSE 'closed' END,
+               CASE WHEN n % 33 = 0 THEN NULL ELSE 'S' || (n % 30) END,
+               NOW() - (random() * INTERVAL '365 days'),
+               NULL
+        FROM generate_series(1, %s) n
+    """, (tickets,))
+    cur.execute("""
+        UPDATE tickets SET closed_at = created_at + random() * INTERVAL '3 days'
+        WHERE status = 'closed'
+    """)
+    cur.execute("""
+        INSERT INTO ticket_msgs (ticket_id, msg, created_at)
+        SELECT t.id, 'reply', t.created_at + random() * INTERVAL '2 days'
+        FROM tickets t, generate_series(1, %s)
+    """, (msgs,))
+    cur.execute("CREATE INDEX ON ticket_msgs (ticket_id, created_at)")
+    # The single query also reads this week's daily buckets.
+    spec = importlib.util.spec_from_file_location("metrics_migration", METRICS_MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    migration.up(cur)
+    cur.execute("ANALYZE")
+
+
+def timed(cur, queries, runs):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        for sql in queries:
+            cur.execute(sql)
+            cur.fetchall()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples), max(samples)
+
+
+def explain(cur, sql):
+    cur.execute(f"EXPLAIN (ANALYZE, BUFFERS, COSTS OFF) {sql}")
+    return "\n".join(row[0] for row in cur.fetchall())
+
+
+def main(tickets, msgs, runs, plans):
+    with db.get_db() as conn:
+        with conn.cursor() as cur:
+            print(f"seeding {tickets} tickets, {tickets * msgs} messages…")
+            seed(cur, tickets, msgs)
+            conn.commit()
+            try:
+                cur.execute(f"SET search_path TO {SCHEMA}")
+                for name, queries in (("5 queries", OLD_QUERIES), ("1 query", [db.DAILY_STATS_SQL])):
+                    median, worst = timed(cur, queries, runs)
+                    print(f"{name:>10}: median {median:.1f}ms, max {worst:.1f}ms over {runs} runs")
+                if plans:
+                    for i, sql in enumerate(OLD_QUERIES, 1):
+                        print(f"\n--- old query {i} ---\n{explain(cur, sql)}")
+                    print(f"\n--- single query ---\n{explain(cur, db.DAILY_STATS_SQL)}")
+            finally:
+                conn.rollback()
+                cur.execute(f"DROP SCHEMA IF EXISTS {SCHEMA} CASCADE")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickets", type=int, default=50000)
+    parser.add_argument("--msgs", type=int, default=20, help="messages per ticket")
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--plans", action="store_true", help="print EXPLAIN ANALYZE output")
+    args = parser.parse_args()
+    main(args.tickets, args.msgs, args.runs, args.plans)
@@ -0,0 +1,96 @@
+"""
+/slack/events ingress throughput: signed requests acked per second.
+Run: python benchmarks/events_ingress.py [--events 20000] [--size 2000]
+
+Drives the route coroutine directly with signed message events and compares
+it against the previous path (json.loads + SignatureVerifier on the decoded
+body before acking). Handlers are stubbed out; only the ack path is timed.
+"""
+import argparse, asyncio, hashlib, hmac, json, os, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Source"))
+for key in ("SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_ID", "USER_CHANNEL_ID", "STAFF_CHANNEL_ID",
+            "META_CHANNEL_ID", "DB_NAME", "DB_USER", "DB_PASSWORD"):
+    os.environ.setdefault(key, "bench")
+
+from fastapi.responses import JSONResponse
+from slack_sdk.signature import SignatureVerifier
+from starlette.requests import Request
+import main
+from ingress import ingress
+
+SECRET = os.environ["SLACK_SIGNING_SECRET"]
+
+
+def signed_request(n, size):
+    body = json.dumps({
+        "type": "event_callback",
+        "event_id": f"Ev{n}",
+        "event": {
+            "type": "message", "channel": "CU", "user": "U1", "ts": f"1712345678.{n:06d}",
+            "client_msg_id": f"msg-{n}", "text": "x" * size,
+        },
+    }).encode()
+    ts = str(int(time.time()))
+    sig = "v0=" + hmac.new(SECRET.encode(), f"v0:{ts}:".encode() + body, hashlib.sha256).hexdigest()
+    headers = [(b"x-slack-request-timestamp", ts.encode()), (b"x-slack-signature", sig.encode())]
+    return body, headers
+
+
+def make_request(body, headers):
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    scope = {"type": "http", "method": "POST", "path": "/slack/events", "headers": headers}
+    return Request(scope, receive)
+
+
+legacy_verifier = SignatureVerifier(SECRET)
+
+
+async def legacy_route(request):
+    body = await request.body()
+    payload = json.loads(body)
+    if not legacy_verifier.is_valid(
+        body=body.decode(),
+        timestamp=request.headers.get("X-Slack-Request-Timestamp", ""),
+        signature=request.headers.get("X-Slack-Signature", ""),
+    ):
+        return JSONResponse({}, status_code=401)
+    event = payload.get("event", {})
+    main.seen_already(event.get("client_msg_id", ""))
+    return JSONResponse({})
+
+
+async def fast_route(request):
+    return await main.slack_events(await main.verified_body(request))
+
+
+async def drive(route, requests):
+    started = time.perf_counter()
+    for body, headers in requests:
+        response = await route(make_request(body, headers))
+        assert response.status_code == 200, response.status_code
+    return time.perf_counter() - started
+
+
+async def run(events, size):
+    main.handle_message = lambda event: None
+    ingress.queue_max = events * 2
+    ingress.start()
+    for name, route in (("legacy", legacy_route), ("fast path", fast_route)):
+        main.seen_events._seen.clear()
+        requests = [signed_request(n, size) for n in range(events)]
+        elapsed = await drive(route, requests)
+        print(f"{name:>10}: {events / elapsed:>9.0f} acks/s  ({elapsed / events * 1e6:.1f} us/event)")
+        await asyncio.sleep(0)
+        while ingress.depth():
+            await asyncio.sleep(0.01)
+    await ingress.stop()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--size", type=int, default=2000, help="message text length in bytes")
+    args = parser.parse_args()
+    asyncio.run(run(args.events, args.size))
@@ -0,0 +1,55 @@
+"""
+Task journal throughput per fsync mode.
+Run: python benchmarks/task_journal_throughput.py [--threads 8] [--tasks 2000]
+
+Each task writes the same three records the worker does (enqueue, start,
+done). Appends from concurrent threads are group-committed by the flusher.
+"""
+import argparse, os, sys, tempfile, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Source"))
+for key in ("SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_ID", "USER_CHANNEL_ID", "STAFF_CHANNEL_ID",
+            "META_CHANNEL_ID", "DB_NAME", "DB_USER", "DB_PASSWORD"):
+    os.environ.setdefault(key, "bench")
+
+from task_journal import DONE, PENDING, STARTED, Journal
+
+
+def run(mode, threads, tasks):
+    with tempfile.TemporaryDirectory() as tmp:
+        journal = Journal(os.path.join(tmp, "journal.jsonl"), fsync=mode, interval=0.05)
+        args = [123, "U0000000", "Someone", None, "a fairly typical relayed message body", True, None, "1712345678.123456"]
+
+        def producer(offset):
+            for n in range(tasks):
+                task_id = f"{offset}-{n}"
+                journal.append({"i": task_id, "s": PENDING, "f": "db.save_message", "a": args, "k": {}, "t": time.time()})
+                journal.append({"i": task_id, "s": STARTED})
+                journal.append({"i": task_id, "s": DONE})
+
+        started = time.perf_counter()
+        workers = [threading.Thread(target=producer, args=(i,)) for i in range(threads)]
+        for t in workers:
+            t.start()
+        for t in workers:
+            t.join()
+        journal.flush()
+        elapsed = time.perf_counter() - started
+        stats = journal.stats()
+        journal.close()
+        return threads * tasks / elapsed, stats
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--threads", type=int, default=8)
+    parser.add_argument("--tasks", type=int, default=2000)
+    args = parser.parse_args()
+    print(f"{'fsync':>8} | {'tasks/s':>10} {'writes':>8} {'fsyncs':>8}")
+    for mode in ("never", "interval", "always"):
+        rate, stats = run(mode, args.threads, args.tasks)
+        print(f"{mode:>8} | {rate:>10.0f} {stats['writes']:>8} {stats['fsyncs']:>8}")
+
+
+if __name__ == "__main__":
+    main()
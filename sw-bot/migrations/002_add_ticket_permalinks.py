@@ -0,0 +1,14 @@
+"""
+Migration 002: add user_thread_link and staff_thread_link to tickets
+Applied by the runner: python migrations/migrate.py
+"""
+
+
+def up(cur):
+    cur.execute(
+        """
+        ALTER TABLE tickets
+        ADD COLUMN IF NOT EXISTS user_thread_link VARCHAR(255) DEFAULT NULL,
+        ADD COLUMN IF NOT EXISTS staff_thread_link VARCHAR(255) DEFAULT NULL;
+        """
+    )
@@ -0,0 +1,51 @@
+"""
+Migration 003: add per-day ticket metrics tables and backfill them from tickets
+Applied by the runner with the bot stopped: python migrations/migrate.py
+"""
+
+
+def up(cur):
+    cur.execute(
+        """
+        CREATE TABLE IF NOT EXISTS ticket_metrics_daily (
+            day DATE PRIMARY KEY,
+            opened INTEGER NOT NULL DEFAULT 0,
+            closed INTEGER NOT NULL DEFAULT 0,
+            close_seconds DOUBLE PRECISION NOT NULL DEFAULT 0,
+            close_count INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS ticket_closer_daily (
+            day DATE NOT NULL,
+            closed_by VARCHAR(255) NOT NULL,
+            closed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (day, closed_by)
+        );
+        TRUNCATE ticket_metrics_daily, ticket_closer_daily;
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO ticket_metrics_daily (day, opened, closed, close_seconds, close_count)
+        SELECT day, SUM(opened), SUM(closed), SUM(close_seconds), SUM(close_count)
+        FROM (
+            SELECT created_at::date AS day, 1 AS opened, 0 AS closed, 0.0 AS close_seconds, 0 AS close_count
+            FROM tickets
+            UNION ALL
+            SELECT COALESCE(closed_at, created_at)::date, 0, 1,
+                   COALESCE(EXTRACT(EPOCH FROM (closed_at - created_at)), 0),
+                   CASE WHEN closed_at IS NULL THEN 0 ELSE 1 END
+            FROM tickets
+            WHERE status = 'closed'
+        ) events
+        GROUP BY day;
+        """
+    )
+    cur.execute(
+        """
+        INSERT INTO ticket_closer_daily (day, closed_by, closed)
+        SELECT COALESCE(closed_at, created_at)::date, closed_by, COUNT(*)
+        FROM tickets
+        WHERE status = 'closed' AND closed_by IS NOT NULL
+        GROUP BY 1, 2;
+        """
+    )
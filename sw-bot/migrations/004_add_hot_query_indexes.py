@@ -0,0 +1,33 @@
+"""
+Migration 004: indexes behind the message-link lookups and the bump scan
+Applied by the runner: python migrations/migrate.py
+
+Built CONCURRENTLY so the bot keeps writing while they build, which means
+this migration can't run inside a transaction.
+"""
+
+TRANSACTIONAL = False
+
+INDEXES = {
+    # get_linked_message_ts / edit_message / message_belongs_to_ticket
+    "ticket_msgs_message_ts_idx": "ticket_msgs (message_ts) INCLUDE (origin_message_ts, ticket_id)",
+    # get_dest_message_ts / get_linked_message_ts / message_belongs_to_ticket
+    "ticket_msgs_origin_message_ts_idx": "ticket_msgs (origin_message_ts) INCLUDE (message_ts, ticket_id)",
+    # get_tickets_due_for_bump / get_daily_ticket_stats
+    "tickets_status_created_at_idx": "tickets (status, created_at)",
+}
+
+
+def up(cur):
+    for name, definition in INDEXES.items():
+        # A failed concurrent build leaves an INVALID index that IF NOT EXISTS would skip.
+        cur.execute(
+            """
+            SELECT 1 FROM pg_index i JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = %s AND NOT i.indisvalid
+            """,
+            (name,),
+        )
+        if cur.fetchone():
+            cur.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+        cur.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}")
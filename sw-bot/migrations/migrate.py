@@ -0,0 +1,169 @@
+"""
+Versioned schema migrations for sw-bot.
+Run: python migrations/migrate.py [--status | --baseline N | --check-plans]
+
+Each NNN_name.py in this directory defines `up(cur)`. Pending versions are
+applied in order and recorded in schema_migrations, each in its own
+transaction together with its bookkeeping row. Migrations that set
+`TRANSACTIONAL = False` (CONCURRENTLY index builds) run in autocommit.
+
+--baseline N records versions up to N as applied without running them, for
+databases where the old one-off scripts were already run by hand.
+--check-plans EXPLAINs db.HOT_QUERIES with seq scans disabled, so small
+tables still show the index they would use, and exits non-zero if one of
+them has to scan a table that db.HOT_QUERY_FULL_SCANS doesn't expect.
+"""
+import argparse, importlib.util, json, os, re, sys, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Source"))
+
+import psycopg2
+import db
+from globals import DB_HOST, DB_NAME, DB_PASSWORD, DB_PORT, DB_USER
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+FILENAME = re.compile(r"^(\d{3})_(\w+)\.py$")
+
+
+def connect():
+    return psycopg2.connect(host=DB_HOST, port=DB_PORT, user=DB_USER, password=DB_PASSWORD, dbname=DB_NAME)
+
+
+def discover() -> list[tuple[int, str, str]]:
+    found = []
+    for filename in sorted(os.listdir(MIGRATIONS_DIR)):
+        match = FILENAME.match(filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    versions = [v for v, _, _ in found]
+    if len(versions) != len(set(versions)):
+        sys.exit(f"duplicate migration versions in {MIGRATIONS_DIR}")
+    return found
+
+
+def load(path: str):
+    spec = importlib.util.spec_from_file_location(f"migration_{os.path.basename(path)[:-3]}", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def applied_versions(conn) -> dict[int, str]:
+    with conn.cursor() as cur:
+        cur.execute(
+            """
+            CREATE TABLE IF NOT EXISTS schema_migrations (
+                version INTEGER PRIMARY KEY,
+                name VARCHAR(255) NOT NULL,
+                applied_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                duration_ms INTEGER
+            )
+            """
+        )
+        cur.execute("SELECT version, name FROM schema_migrations")
+        rows = dict(cur.fetchall())
+    conn.commit()
+    return rows
+
+
+def record(cur, version: int, name: str, duration_ms: int | None):
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name, duration_ms) VALUES (%s, %s, %s)",
+        (version, name, duration_ms),
+    )
+
+
+def migrate(conn):
+    done = applied_versions(conn)
+    pending = [m for m in discover() if m[0] not in done]
+    if not pending:
+        print("schema is up to date")
+        return
+    for version, name, path in pending:
+        module = load(path)
+        transactional = getattr(module, "TRANSACTIONAL", True)
+        print(f"applying {version:03d}_{name}{'' if transactional else ' (autocommit)'}…", flush=True)
+        started = time.perf_counter()
+        conn.autocommit = not transactional
+        try:
+            with conn.cursor() as cur:
+                module.up(cur)
+                record(cur, version, name, round((time.perf_counter() - started) * 1000))
+            if transactional:
+                conn.commit()
+        except Exception as e:
+            if transactional:
+                conn.rollback()
+            sys.exit(f"migration {version:03d}_{name} failed: {e}")
+        finally:
+            conn.autocommit = False
+        print(f"  done in {time.perf_counter() - started:.1f}s")
+
+
+def status(conn):
+    done = applied_versions(conn)
+    for version, name, _ in discover():
+        print(f"{version:03d}_{name}: {'applied' if version in done else 'pending'}")
+
+
+def baseline(conn, upto: int):
+    done = applied_versions(conn)
+    with conn.cursor() as cur:
+        for version, name, _ in discover():
+            if version <= upto and version not in done:
+                record(cur, version, name, None)
+                print(f"marked {version:03d}_{name} as applied")
+    conn.commit()
+
+
+def _walk(node: dict):
+    yield node
+    for child in node.get("Plans", []):
+        yield from _walk(child)
+
+
+def check_plans(conn) -> int:
+    """EXPLAIN each hot query (never executed) and report its access paths."""
+    flagged = 0
+    with conn.cursor() as cur:
+        # Otherwise the planner seq-scans any table small enough, index or not.
+        cur.execute("SET LOCAL enable_seqscan = off")
+        for name, (sql, params) in db.HOT_QUERIES.items():
+            cur.execute(f"EXPLAIN (FORMAT JSON) {sql}", params)
+            raw = cur.fetchone()[0]
+            plan = (raw if isinstance(raw, list) else json.loads(raw))[0]["Plan"]
+            nodes = list(_walk(plan))
+            scans = [
+                f"{n['Node Type']} on {n['Relation Name']}" + (f" using {n['Index Name']}" if n.get("Index Name") else "")
+                for n in nodes if "Relation Name" in n
+            ]
+            expected = db.HOT_QUERY_FULL_SCANS.get(name, set())
+            seq = [n["Relation Name"] for n in nodes
+                   if n["Node Type"] == "Seq Scan" and n["Relation Name"] not in expected]
+            flagged += bool(seq)
+            print(f"{'SEQ ' if seq else 'ok  '} {name}: cost {plan['Total Cost']:.0f} | {'; '.join(scans) or plan['Node Type']}")
+    conn.rollback()
+    if flagged:
+        print(f"\n{flagged} hot queries have no usable index")
+    return 1 if flagged else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument("--status", action="store_true", help="list applied and pending migrations")
+    group.add_argument("--baseline", type=int, metavar="N", help="mark migrations up to N as applied without running them")
+    group.add_argument("--check-plans", action="store_true", help="EXPLAIN the bot's hot queries")
+    args = parser.parse_args()
+    conn = connect()
+    try:
+        if args.status:
+            status(conn)
+        elif args.baseline is not None:
+            baseline(conn, args.baseline)
+        elif args.check_plans:
+            sys.exit(check_plans(conn))
+        else:
+            migrate(conn)
+    finally:
+        conn.close()
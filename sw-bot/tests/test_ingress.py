@@ -0,0 +1,50 @@
+import asyncio, os, sys, threading, time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "Source"))
+for key in ("SLACK_BOT_TOKEN", "SLACK_SIGNING_SECRET", "APP_ID", "USER_CHANNEL_ID", "STAFF_CHANNEL_ID",
+            "META_CHANNEL_ID", "DB_NAME", "DB_USER", "DB_PASSWORD"):
+    os.environ.setdefault(key, "test")
+
+from ingress import Ingress
+
+
+def test_route_keeps_arrival_order_when_lookups_finish_out_of_order():
+    handled = []
+    second_resolved = threading.Event()
+
+    def handle(event):
+        handled.append(event["n"])
+
+    def resolve(event):
+        if event["n"] == 1:
+            # The first event's lookup only finishes after the second one's has.
+            second_resolved.wait(5)
+            time.sleep(0.05)
+        else:
+            second_resolved.set()
+        return handle, event, ("thread", event["thread_ts"])
+
+    async def run():
+        ingress = Ingress(lanes=4, workers=2, queue_max=10)
+        ingress.start()
+        assert ingress.route("message", {"n": 1, "thread_ts": "100.1"}, resolve)
+        assert ingress.route("message", {"n": 2, "thread_ts": "100.1"}, resolve)
+        await ingress.stop(timeout=5)
+
+    asyncio.run(run())
+    assert second_resolved.is_set()
+    assert handled == [1, 2]
+
+
+def test_route_drops_jobs_resolved_to_none():
+    handled = []
+
+    async def run():
+        ingress = Ingress(lanes=1, workers=1, queue_max=10)
+        ingress.start()
+        ingress.route("message", {"n": 1}, lambda event: None)
+        ingress.route("message", {"n": 2}, lambda event: (handled.append, event, None))
+        await ingress.stop(timeout=5)
+
+    asyncio.run(run())
+    assert handled == [{"n": 2}]